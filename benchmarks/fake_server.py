@@ -0,0 +1,129 @@
+"""
+Local stand-in for an IRC server, used by the benchmarks.
+
+Each client that registers (NICK/USER) gets a welcome, has its JOINs echoed back
+and its PINGs answered, and is then sent `messages` lines of traffic at `rate` lines
+per second.  Traffic is either synthetic PRIVMSGs whose body starts with the
+`time.monotonic()` time the line was sent (so the receiving side can measure
+latency), or lines replayed from a recorded file.
+"""
+import asyncio
+import itertools
+import time
+
+TICK = .01
+
+
+def synthetic_traffic(channel='#bench', users=50):
+    for i in itertools.count():
+        yield ':user{0}!user{0}@fake.server PRIVMSG {1} :{2:.6f} synthetic message {3}'.format(
+            i % users, channel, time.monotonic(), i
+        )
+
+
+def recorded_traffic(path):
+    with open(path) as f:
+        lines = [line.rstrip('\r\n') for line in f if line.strip()]
+
+    return itertools.cycle(lines)
+
+
+class FakeIrcProtocol(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.buffer = b''
+        self.nickname = None
+        self.transport = None
+        self.traffic_task = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        if self.traffic_task is not None:
+            self.traffic_task.cancel()
+
+    def send(self, line):
+        self.transport.write(line.encode('utf-8') + b'\r\n')
+
+    def data_received(self, data):
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\r\n')
+
+        for line in lines:
+            self.handle_line(line.decode('utf-8', 'replace'))
+
+    def handle_line(self, line):
+        command, _, rest = line.partition(' ')
+        command = command.upper()
+
+        if command == 'NICK':
+            self.nickname = rest
+        elif command == 'USER':
+            self.send(':fake.server 001 {0} :Welcome to the fake server {0}'.format(self.nickname))
+            self.traffic_task = asyncio.ensure_future(self.send_traffic())
+        elif command == 'PING':
+            self.send(':fake.server PONG fake.server {}'.format(rest))
+        elif command == 'JOIN':
+            for channel in rest.split(' ')[0].split(','):
+                self.send(':{0}!{0}@fake.server JOIN {1}'.format(self.nickname, channel))
+        elif command == 'QUIT':
+            self.transport.close()
+
+    async def send_traffic(self):
+        traffic = self.server.traffic_factory()
+        per_tick = max(int(self.server.rate * TICK), 1)
+        remaining = self.server.messages
+
+        while remaining > 0 and not self.transport.is_closing():
+            count = min(per_tick, remaining)
+            self.transport.write(b''.join(
+                next(traffic).encode('utf-8') + b'\r\n' for _ in range(count)
+            ))
+            remaining -= count
+            await asyncio.sleep(TICK)
+
+
+class FakeIrcServer:
+    def __init__(self, host='127.0.0.1', port=0, rate=1000, messages=10000, traffic=None):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.messages = messages
+        self.traffic = traffic
+        self.server = None
+
+    def traffic_factory(self):
+        if self.traffic:
+            return recorded_traffic(self.traffic)
+        return synthetic_traffic()
+
+    async def start(self):
+        self.server = await asyncio.get_event_loop().create_server(
+            lambda: FakeIrcProtocol(self), self.host, self.port,
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    def close(self):
+        self.server.close()
+
+
+def serve(port_queue, **kwargs):
+    """
+    Entrypoint for running the server in a separate process.  The listening port is
+    put on `port_queue` once the server is up
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    server = FakeIrcServer(**kwargs)
+    port_queue.put(loop.run_until_complete(server.start()))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.close()
@@ -0,0 +1,123 @@
+"""
+Moderation rule matching benchmark.
+
+Matches synthetic chat messages against a generated rule set, both with the
+compiled `RuleSet` used by `ModerationIrcConsumer` and naively, one rule at a time
+(`in` for phrases, a compiled regex search for regexes).  Reports messages/sec for
+each, the speedup, and how long the rule set took to compile.
+
+    python benchmarks/moderation.py --phrases 5000 --regexes 200
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels_irc.moderation import Rule, RuleSet  # noqa: E402
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def make_words(count, rng):
+    return [''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 9))) for _ in range(count)]
+
+
+def make_rules(phrases, regexes, words, rng):
+    rules = [
+        Rule('phrase{}'.format(i), ' '.join(rng.sample(words, 2))) for i in range(phrases)
+    ]
+    rules += [
+        Rule('regex{}'.format(i), r'\b{}\d+\b'.format(rng.choice(words)), regex=True)
+        for i in range(regexes)
+    ]
+    return rules
+
+
+def make_messages(count, rules, words, violation_rate, rng):
+    messages = []
+
+    for _ in range(count):
+        message = ' '.join(rng.choice(words) for _ in range(rng.randint(5, 20)))
+        if rng.random() < violation_rate:
+            rule = rng.choice(rules)
+            banned = rule.pattern if not rule.regex else rule.pattern[2:-6] + '42'
+            message = '{} {}'.format(message, banned.upper())
+        messages.append(message)
+
+    return messages
+
+
+def naive_matcher(rules):
+    checks = [
+        (rule, re.compile(rule.pattern, re.IGNORECASE) if rule.regex else rule.pattern.lower())
+        for rule in rules
+    ]
+
+    def match(text):
+        lowered = text.lower()
+        return [
+            rule for rule, check in checks
+            if (check.search(text) if rule.regex else check in lowered)
+        ]
+
+    return match
+
+
+def run(match, messages):
+    started = time.perf_counter()
+    violations = sum(1 for message in messages if match(message))
+    return violations, time.perf_counter() - started
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--phrases', type=int, default=5000, help='Number of banned phrases')
+    parser.add_argument('--regexes', type=int, default=200, help='Number of regex rules')
+    parser.add_argument('--messages', type=int, default=20000, help='Messages matched')
+    parser.add_argument('--violation-rate', type=float, default=0.05,
+                        help='Fraction of messages containing a banned phrase or regex match')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated rules and messages')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    words = make_words(2000, rng)
+    rules = make_rules(args.phrases, args.regexes, words, rng)
+    messages = make_messages(args.messages, rules, words, args.violation_rate, rng)
+
+    started = time.perf_counter()
+    rule_set = RuleSet(rules)
+    compile_time = time.perf_counter() - started
+
+    compiled_violations, compiled_time = run(rule_set.match, messages)
+    naive_violations, naive_time = run(naive_matcher(rules), messages)
+
+    if compiled_violations != naive_violations:
+        print('Compiled and naive matching disagree: {} vs {} violations'.format(
+            compiled_violations, naive_violations
+        ), file=sys.stderr)
+
+    report = {
+        'rules': len(rules),
+        'messages': len(messages),
+        'violations': compiled_violations,
+        'compile_ms': round(compile_time * 1000, 1),
+        'compiled_msgs_per_sec': round(len(messages) / compiled_time),
+        'naive_msgs_per_sec': round(len(messages) / naive_time),
+        'speedup': round(naive_time / compiled_time, 1),
+    }
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print('{:<24} {}'.format(key, value))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
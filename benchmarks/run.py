@@ -0,0 +1,173 @@
+"""
+End-to-end throughput and latency benchmark for the interface server.
+
+Starts the fake IRC server in a separate process, connects `ChannelsIRCClient`
+(or `MultiConnectionClient` with `--connections N`) to it, and delivers the traffic
+to an `AsyncIrcConsumer`.  Reports messages/sec, p50/p99 latency from the server
+writing a line to the consumer's `on_message` handler, and peak RSS.
+
+    python benchmarks/run.py --rate 20000 --messages 100000
+    python benchmarks/run.py --connections 50 --rate 500 --messages 5000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['channels', 'channels_irc'],
+        CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    )
+    django.setup()
+
+from channels.routing import ProtocolTypeRouter  # noqa: E402
+
+from channels_irc.client import ChannelsIRCClient  # noqa: E402
+from channels_irc.consumers import AsyncIrcConsumer, MultiIrcConsumer  # noqa: E402
+from channels_irc.multi import MultiConnectionClient  # noqa: E402
+
+from fake_server import serve  # noqa: E402
+
+
+class Results:
+    def __init__(self, expected):
+        self.expected = expected
+        self.received = 0
+        self.latencies = []
+        self.started = None
+        self.finished = asyncio.Event()
+
+    def record(self, body):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+
+        self.received += 1
+
+        stamp = body.split(' ', 1)[0]
+        try:
+            self.latencies.append(now - float(stamp))
+        except ValueError:
+            pass
+
+        if self.received >= self.expected:
+            self.finished.set()
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+    def report(self, elapsed):
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            rss //= 1024
+
+        return {
+            'messages': self.received,
+            'elapsed': round(elapsed, 3),
+            'messages_per_sec': round(self.received / elapsed, 1) if elapsed else None,
+            'p50_latency_ms': round(self.percentile(50) * 1000, 3) if self.latencies else None,
+            'p99_latency_ms': round(self.percentile(99) * 1000, 3) if self.latencies else None,
+            'max_rss_kb': rss,
+        }
+
+
+def make_consumer(results):
+    class BenchmarkConsumer(AsyncIrcConsumer):
+        irc_commands = ['message']
+
+        async def on_message(self, channel, user, body):
+            results.record(body)
+
+    return BenchmarkConsumer
+
+
+def make_multi_consumer(port, connections):
+    class BenchmarkMultiConsumer(MultiIrcConsumer):
+        async def on_init(self):
+            for i in range(connections):
+                await self.send_connect('127.0.0.1', port, 'bench{}'.format(i))
+
+    return BenchmarkMultiConsumer
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--connections', type=int, default=1,
+                        help='Number of connections. More than 1 uses MultiConnectionClient')
+    parser.add_argument('--rate', type=int, default=10000,
+                        help='Lines per second sent to each connection')
+    parser.add_argument('--messages', type=int, default=50000,
+                        help='Lines sent to each connection')
+    parser.add_argument('--traffic', default=None,
+                        help='File of recorded IRC lines to replay instead of synthetic traffic')
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='Give up after this many seconds')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    server = context.Process(target=serve, args=(port_queue,), kwargs={
+        'rate': args.rate, 'messages': args.messages, 'traffic': args.traffic,
+    }, daemon=True)
+    server.start()
+    port = port_queue.get(timeout=10)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    results = Results(args.messages * args.connections)
+    consumer = make_consumer(results)
+
+    if args.connections > 1:
+        application = ProtocolTypeRouter({
+            'irc': consumer.as_asgi(),
+            'irc.multi': make_multi_consumer(port, args.connections).as_asgi(),
+        })
+        client = MultiConnectionClient(application, loop=loop)
+    else:
+        client = ChannelsIRCClient(consumer.as_asgi(), loop=loop)
+        loop.run_until_complete(client.connect('127.0.0.1', port, 'bench'))
+
+    try:
+        loop.run_until_complete(asyncio.wait_for(results.finished.wait(), args.timeout))
+    except asyncio.TimeoutError:
+        print('Timed out after receiving {} of {} messages'.format(
+            results.received, results.expected
+        ), file=sys.stderr)
+
+    elapsed = time.monotonic() - results.started if results.started else 0
+    report = results.report(elapsed)
+
+    client.disconnect()
+    server.terminate()
+
+    tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    loop.close()
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print('{:<20} {}'.format(key, value))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
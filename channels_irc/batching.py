@@ -0,0 +1,36 @@
+class MessageBatcher:
+    """
+    Groups messages collected over `window` seconds, or up to `size` messages, into a
+    single `irc.receive.batch` message
+    """
+    def __init__(self, loop, send, window, size=100):
+        self.loop = loop
+        self.send = send
+        self.window = window
+        self.size = size
+
+        self.messages = []
+        self._handle = None
+
+    def add(self, msg):
+        self.messages.append(msg)
+
+        if self.size and len(self.messages) >= self.size:
+            self.flush()
+        elif self._handle is None:
+            self._handle = self.loop.call_later(self.window, self.flush)
+
+    def flush(self):
+        """
+        Sends every collected message as one batch
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if self.messages:
+            messages, self.messages = self.messages, []
+            self.send({
+                'type': 'irc.receive.batch',
+                'messages': messages,
+            })
@@ -1,12 +1,18 @@
 import sys
 import argparse
 import logging
-import importlib
 import os
 import asyncio
 
 from .client import ChannelsIRCClient
-from .multi import MultiConnectionClient
+from .groups import DEFAULT_GROUP_PREFIX
+from .membership import DEFAULT_MAX_MEMBERS
+from .metrics import Metrics, start_metrics_server
+from .multi import DEFAULT_CONNECT_CONCURRENCY, MultiConnectionClient
+from .server import OVERFLOW_POLICIES, DROP_OLDEST
+from .sharding import ShardedMultiConnectionClient
+from .subscriptions import FileSubscriptionStore
+from .utils import ASYNCIO, LOOP_TYPES, import_application, install_loop_policy
 
 logger = logging.getLogger(__name__)
 
@@ -91,9 +97,283 @@ class CLI(object):
             '--reconnect-delay',
             dest='reconnect_delay',
             type=int,
-            help='Time between reconnection attempts (in seconds). Default is 60',
+            help=(
+                'Base time between reconnection attempts (in seconds), doubled after each '
+                'failed attempt. Default is 60'
+            ),
             default=os.environ.get('CHANNELS_IRC_RECONNECT_DELAY', 60)
         )
+        self.parser.add_argument(
+            '--reconnect-max-delay',
+            dest='reconnect_max_delay',
+            type=int,
+            help='Maximum time between reconnection attempts (in seconds). Default is 600',
+            default=os.environ.get('CHANNELS_IRC_RECONNECT_MAX_DELAY', 600)
+        )
+        self.parser.add_argument(
+            '--max-concurrent-connects',
+            dest='max_concurrent_connects',
+            type=int,
+            help=(
+                'Maximum number of connection attempts in progress at once. '
+                'Default is 0 (no limit)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_MAX_CONCURRENT_CONNECTS', 0)
+        )
+        self.parser.add_argument(
+            '--workers',
+            dest='workers',
+            type=int,
+            help=(
+                'Number of worker processes to spread connections across. Only used with '
+                '--multi. Default is 1 (no worker processes)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_WORKERS', 1)
+        )
+        self.parser.add_argument(
+            '--queue-size',
+            dest='queue_size',
+            type=int,
+            help=(
+                'Maximum number of messages waiting to be received by the application. '
+                'Default is 0 (unbounded)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_QUEUE_SIZE', 0)
+        )
+        self.parser.add_argument(
+            '--overflow-policy',
+            dest='overflow_policy',
+            choices=OVERFLOW_POLICIES,
+            help=(
+                'What to do with incoming messages when the application queue is full. '
+                'Default is {}'.format(DROP_OLDEST)
+            ),
+            default=os.environ.get('CHANNELS_IRC_OVERFLOW_POLICY', DROP_OLDEST)
+        )
+        self.parser.add_argument(
+            '--send-rate',
+            dest='send_rate',
+            type=float,
+            help=(
+                'Maximum number of lines per second sent on each IRC connection. '
+                'Default is 0 (no limit)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_SEND_RATE', 0)
+        )
+        self.parser.add_argument(
+            '--send-burst',
+            dest='send_burst',
+            type=int,
+            help='Number of lines that can be sent at once before --send-rate applies. Default is 1',
+            default=os.environ.get('CHANNELS_IRC_SEND_BURST', 1)
+        )
+        self.parser.add_argument(
+            '--target-send-rate',
+            dest='target_send_rate',
+            type=float,
+            help=(
+                'Maximum number of messages per second sent to a single channel or user. '
+                'Default is 0 (no limit)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_TARGET_SEND_RATE', 0)
+        )
+        self.parser.add_argument(
+            '--target-send-burst',
+            dest='target_send_burst',
+            type=int,
+            help=(
+                'Number of messages that can be sent at once to a single channel or user '
+                'before --target-send-rate applies. Default is 1'
+            ),
+            default=os.environ.get('CHANNELS_IRC_TARGET_SEND_BURST', 1)
+        )
+        self.parser.add_argument(
+            '--join-window',
+            dest='join_window',
+            type=float,
+            help=(
+                'Time (in seconds) to collect JOIN and PART requests before sending them '
+                'as packed lines. Default is 0 (send immediately)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_JOIN_WINDOW', 0)
+        )
+        self.parser.add_argument(
+            '--forward-events',
+            dest='forward_events',
+            help=(
+                'Comma-separated list of IRC event types to send to the application. '
+                'If set, all other event types are dropped. Default is to send all events'
+            ),
+            default=os.environ.get('CHANNELS_IRC_FORWARD_EVENTS', None),
+        )
+        self.parser.add_argument(
+            '--ignore-events',
+            dest='ignore_events',
+            help='Comma-separated list of IRC event types to drop instead of sending to the application',
+            default=os.environ.get('CHANNELS_IRC_IGNORE_EVENTS', None),
+        )
+        self.parser.add_argument(
+            '--message-tags',
+            dest='message_tags',
+            action='store_true',
+            help='Request the IRCv3 `message-tags` capability, and send message tags to the application',
+        )
+        self.parser.add_argument(
+            '--tag-whitelist',
+            dest='tag_whitelist',
+            help='Comma-separated list of message tags to keep. Other tags are discarded',
+            default=os.environ.get('CHANNELS_IRC_TAG_WHITELIST', None),
+        )
+        self.parser.add_argument(
+            '--batch-window',
+            dest='batch_window',
+            type=float,
+            help=(
+                'Time (in seconds) to collect incoming messages before sending them to the '
+                'application as one `irc.receive.batch` message. Default is 0 (no batching)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_BATCH_WINDOW', 0)
+        )
+        self.parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            type=int,
+            help='Maximum number of messages in a batch. Default is 100',
+            default=os.environ.get('CHANNELS_IRC_BATCH_SIZE', 100)
+        )
+        self.parser.add_argument(
+            '--raw',
+            dest='raw',
+            action='store_true',
+            help=(
+                'Send incoming lines to the application unparsed, as `irc.receive.raw` '
+                'messages, once connected'
+            ),
+        )
+        self.parser.add_argument(
+            '--group-fanout',
+            dest='group_fanout',
+            action='store_true',
+            help=(
+                'Send `irc.receive` messages for IRC channels to a channel layer group per '
+                'channel, instead of the application instance'
+            ),
+        )
+        self.parser.add_argument(
+            '--group-prefix',
+            dest='group_prefix',
+            help='Prefix of the channel layer group names used by --group-fanout',
+            default=os.environ.get('CHANNELS_IRC_GROUP_PREFIX', DEFAULT_GROUP_PREFIX),
+        )
+        self.parser.add_argument(
+            '--group-shards',
+            dest='group_shards',
+            type=int,
+            help='Split each channel into this many groups, by the nickname of the sender',
+            default=os.environ.get('CHANNELS_IRC_GROUP_SHARDS', 0),
+        )
+        self.parser.add_argument(
+            '--pool-idle-time',
+            dest='pool_idle_time',
+            type=float,
+            help=(
+                'With --multi, keep removed connections open for this many seconds, to be '
+                'reused by a connect for the same server and nickname'
+            ),
+            default=os.environ.get('CHANNELS_IRC_POOL_IDLE_TIME', 0),
+        )
+        self.parser.add_argument(
+            '--pool-size',
+            dest='pool_size',
+            type=int,
+            help='Maximum number of idle connections kept open with --pool-idle-time',
+            default=os.environ.get('CHANNELS_IRC_POOL_SIZE', 0),
+        )
+        self.parser.add_argument(
+            '--connect-concurrency',
+            dest='connect_concurrency',
+            type=int,
+            help='With --multi, number of connections opened at once by a bulk connect',
+            default=os.environ.get('CHANNELS_IRC_CONNECT_CONCURRENCY', DEFAULT_CONNECT_CONCURRENCY),
+        )
+        self.parser.add_argument(
+            '--shared-connections',
+            dest='shared',
+            action='store_true',
+            help=(
+                'With --multi, run every connection on one reactor and send their messages '
+                'to the `irc.multi` application instance'
+            ),
+        )
+        self.parser.add_argument(
+            '--compact-messages',
+            dest='compact_messages',
+            action='store_true',
+            help=(
+                'Send `irc.receive` messages as compact mappings instead of dicts. '
+                'Only for applications running in the same process'
+            ),
+        )
+        self.parser.add_argument(
+            '--track-members',
+            dest='track_members',
+            action='store_true',
+            help='Keep the members of joined channels, for the `members` command',
+        )
+        self.parser.add_argument(
+            '--max-channel-members',
+            dest='max_channel_members',
+            type=int,
+            help='Maximum number of members kept per channel with --track-members',
+            default=os.environ.get('CHANNELS_IRC_MAX_CHANNEL_MEMBERS', DEFAULT_MAX_MEMBERS),
+        )
+        self.parser.add_argument(
+            '--rejoin',
+            dest='rejoin',
+            action='store_true',
+            help='Join the channels a connection was in again when it reconnects',
+        )
+        self.parser.add_argument(
+            '--state-file',
+            dest='state_file',
+            help=(
+                'File to keep the joined channels of each connection in, to join them again '
+                'after a restart.  Implies --rejoin'
+            ),
+            default=os.environ.get('CHANNELS_IRC_STATE_FILE', None),
+        )
+        self.parser.add_argument(
+            '--trace-messages',
+            dest='trace_messages',
+            action='store_true',
+            help=(
+                'Stamp `irc.receive` messages with when their event was read, and a sequence '
+                'number, for consumer tracing'
+            ),
+        )
+        self.parser.add_argument(
+            '--loop',
+            dest='loop',
+            choices=LOOP_TYPES,
+            help='Event loop implementation to run on',
+            default=os.environ.get('CHANNELS_IRC_LOOP', ASYNCIO),
+        )
+        self.parser.add_argument(
+            '--metrics-port',
+            dest='metrics_port',
+            type=int,
+            help=(
+                'Port to serve Prometheus metrics on. Requires the prometheus_client package. '
+                'Default is 0 (no metrics)'
+            ),
+            default=os.environ.get('CHANNELS_IRC_METRICS_PORT', 0)
+        )
+        self.parser.add_argument(
+            '--metrics-address',
+            dest='metrics_address',
+            help='Address to serve Prometheus metrics on. Default is all interfaces',
+            default=os.environ.get('CHANNELS_IRC_METRICS_ADDRESS', ''),
+        )
         self.parser.add_argument(
             '--multi',
             dest='multi',
@@ -111,6 +391,13 @@ class CLI(object):
         """
         cls().run(sys.argv[1:])
 
+    def install_loop_policy(self, args):
+        """
+        Installs the event loop policy before the event loop and client are created.
+        Override to install a custom policy
+        """
+        install_loop_policy(args.loop)
+
     def run(self, args):
         """
         Mounts the IRC interface server based on the raw arguments passed in
@@ -128,21 +415,100 @@ class CLI(object):
         )
 
         # import the channel layer
-        asgi_module, application_path = args.application.split(':', 1)
-        application_module = importlib.import_module(asgi_module)
-        for part in application_path.split('.'):
-            application = getattr(application_module, part)
+        application = import_application(args.application)
+
+        self.install_loop_policy(args)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
 
         # Parse bool flag values
         autoreconnect = os.environ.get('CHANNELS_IRC_AUTORECONNECT', '') in ['true', 'True'] or args.autoreconnect
         multi = os.environ.get('CHANNELS_IRC_MULTI', '') in ['true', 'True'] or args.multi
+        message_tags = os.environ.get('CHANNELS_IRC_MESSAGE_TAGS', '') in ['true', 'True'] or args.message_tags
+        raw = os.environ.get('CHANNELS_IRC_RAW', '') in ['true', 'True'] or args.raw
+        shared = os.environ.get('CHANNELS_IRC_SHARED_CONNECTIONS', '') in ['true', 'True'] or args.shared
+        compact_messages = (
+            os.environ.get('CHANNELS_IRC_COMPACT_MESSAGES', '') in ['true', 'True'] or args.compact_messages
+        )
+        trace_messages = (
+            os.environ.get('CHANNELS_IRC_TRACE_MESSAGES', '') in ['true', 'True'] or args.trace_messages
+        )
+        track_members = (
+            os.environ.get('CHANNELS_IRC_TRACK_MEMBERS', '') in ['true', 'True'] or args.track_members
+        )
+        rejoin = os.environ.get('CHANNELS_IRC_REJOIN', '') in ['true', 'True'] or args.rejoin
+        group_fanout = os.environ.get('CHANNELS_IRC_GROUP_FANOUT', '') in ['true', 'True'] or args.group_fanout
+
+        # Parse event type lists
+        forward_events = args.forward_events.split(',') if args.forward_events else None
+        ignore_events = args.ignore_events.split(',') if args.ignore_events else None
+        tag_whitelist = args.tag_whitelist.split(',') if args.tag_whitelist else None
 
         client_class = ChannelsIRCClient if not multi else MultiConnectionClient
+        client_kwargs = {}
+
+        if raw and (rejoin or args.state_file):
+            raise ValueError("--rejoin and --state-file can't be used with --raw, which doesn't parse JOINs")
+
+        if args.workers > 1:
+            if not multi:
+                raise ValueError("--workers can only be used with the --multi flag")
+            if args.state_file:
+                raise ValueError("--state-file can't be shared by --workers processes")
+
+            client_class = ShardedMultiConnectionClient
+            client_kwargs = {
+                'application_path': args.application,
+                'workers': args.workers,
+                'metrics_port': args.metrics_port,
+                'loop_type': args.loop,
+            }
+
+        if multi:
+            client_kwargs['pool_idle_time'] = args.pool_idle_time
+            client_kwargs['pool_size'] = args.pool_size
+            client_kwargs['shared'] = shared
+            client_kwargs['connect_concurrency'] = args.connect_concurrency
+
+        subscription_store = FileSubscriptionStore(args.state_file, loop=loop) if args.state_file else None
+
+        metrics = None
+        if args.metrics_port:
+            metrics = Metrics()
+            start_metrics_server(args.metrics_port, args.metrics_address)
 
         client = client_class(
             application,
+            **client_kwargs,
+            loop=loop,
             autoreconnect=autoreconnect,
             reconnect_delay=args.reconnect_delay,
+            queue_size=args.queue_size,
+            overflow_policy=args.overflow_policy,
+            send_rate=args.send_rate,
+            send_burst=args.send_burst,
+            target_send_rate=args.target_send_rate,
+            target_send_burst=args.target_send_burst,
+            join_window=args.join_window,
+            forward_events=forward_events,
+            ignore_events=ignore_events,
+            reconnect_max_delay=args.reconnect_max_delay,
+            max_concurrent_connects=args.max_concurrent_connects,
+            message_tags=message_tags,
+            tag_whitelist=tag_whitelist,
+            metrics=metrics,
+            batch_window=args.batch_window,
+            batch_size=args.batch_size,
+            raw=raw,
+            group_fanout=group_fanout,
+            group_prefix=args.group_prefix,
+            group_shards=args.group_shards,
+            compact_messages=compact_messages,
+            trace_messages=trace_messages,
+            track_members=track_members,
+            max_channel_members=args.max_channel_members,
+            rejoin=rejoin,
+            subscription_store=subscription_store,
         )
 
         if not multi:
@@ -155,7 +521,7 @@ class CLI(object):
 
             logger.info('Connecting to IRC Server {}:{}'.format(args.server, args.port))
 
-            client.reactor.loop.run_until_complete(client.connect(
+            loop.run_until_complete(client.connect(
                 args.server,
                 args.port,
                 args.nickname,
@@ -167,13 +533,13 @@ class CLI(object):
         try:
             client.start()
         except KeyboardInterrupt:
-            client.disconnect()
-
-            loop = client.loop
+            if multi:
+                client.disconnect()
+            else:
+                client.disconnect(reconnect=False)
 
             tasks = asyncio.gather(
-                *asyncio.Task.all_tasks(loop=loop),
-                loop=loop,
+                *asyncio.all_tasks(loop),
                 return_exceptions=True
             )
             tasks.add_done_callback(lambda t: loop.stop())
@@ -182,5 +548,7 @@ class CLI(object):
             while not tasks.done() and not loop.is_closed():
                 loop.run_forever()
         finally:
+            if subscription_store is not None:
+                subscription_store.flush()
             loop.close()
             sys.exit(0)
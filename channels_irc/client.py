@@ -1,43 +1,420 @@
 import logging
-import asyncio
+import time
 from socket import gaierror
 
 from irc.client_aio import AioSimpleIRCClient
 
-from .server import BaseServer
+from .batching import MessageBatcher
+from .coalesce import JoinCoalescer
+from .connection import IrcReactor
+from .flood import OutboundScheduler
+from .groups import DEFAULT_GROUP_PREFIX, GroupPublisher
+from .membership import DEFAULT_MAX_MEMBERS, MembershipCache
+from .messages import IrcMessage
+from .metrics import NULL_METRICS
+from .reconnect import ReconnectScheduler
+from .server import BaseServer, DROP_OLDEST
 
 logger = logging.getLogger(__name__)
 
+# Events that are always dispatched, regardless of `forward_events`/`ignore_events`
+ALWAYS_DISPATCHED = {'welcome', 'disconnect'}
+
+# Events the client tracks state from.  When filtered out, the event is still
+# tracked by its `_track_<event>` method, but not forwarded to the application
+TRACKED_EVENTS = {'join', 'part', 'kick', 'quit', 'nick', 'namreply', 'endofnames'}
+
 
 class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
-    def __init__(self, application, autoreconnect=False, reconnect_delay=60, loop=None):
+    reactor_class = IrcReactor
+
+    # Set while disconnecting on purpose, so the disconnect isn't followed by a reconnect
+    _closing = False
+
+    application_instance = None
+
+    # With `trace_messages`, when the event being dispatched was read, and its number
+    seq = 0
+    _received_at = None
+
+    # `SERVER:NICKNAME` of the current connection
+    key = None
+
+    # Set while the connection is kept warm in a pool, unused.  `irc.receive` messages,
+    # including the welcome, aren't sent to the application meanwhile
+    idle = False
+
+    def __init__(
+        self, application, autoreconnect=False, reconnect_delay=60, loop=None,
+        queue_size=0, overflow_policy=DROP_OLDEST, send_rate=0, send_burst=1,
+        target_send_rate=0, target_send_burst=1, join_window=0, forward_events=None,
+        ignore_events=None, reconnect_max_delay=600, max_concurrent_connects=0,
+        reconnect_scheduler=None, message_tags=False, tag_whitelist=None, metrics=None,
+        batch_window=0, batch_size=100, raw=False, group_fanout=False,
+        group_prefix=DEFAULT_GROUP_PREFIX, group_shards=0, channel_layer=None,
+        reactor=None, application_sender=None, compact_messages=False, trace_messages=False,
+        track_members=False, max_channel_members=DEFAULT_MAX_MEMBERS, rejoin=False,
+        subscription_store=None,
+    ):
         self.application = application
         self.autoreconnect = autoreconnect
         self.reconnect_delay = reconnect_delay
-
-        self.reactor = self.reactor_class(loop=loop)
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.forward_events = set(forward_events) if forward_events is not None else None
+        self.ignore_events = set(ignore_events or [])
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        # A shared reactor routes events to each client itself, and a shared
+        # application is sent this client's messages by `application_sender`
+        self.application_sender = application_sender
+        self.shared_reactor = reactor is not None
+        self.reactor = reactor if reactor is not None else self.reactor_class(loop=loop)
         self.connection = self.reactor.server()
         self.loop = self.reactor.loop
 
-        self.reactor.add_global_handler("all_events", self._dispatcher, -10)
-        self.loop.call_later(1, self.futures_checker)
+        if raw:
+            self.connection.raw_handler = self._handle_raw_lines
+
+        self.compact_messages = compact_messages
+        self.trace_messages = trace_messages
+        self.message_tags = message_tags
+        self.connection.message_tags = message_tags
+        self.connection.tag_whitelist = set(tag_whitelist) if tag_whitelist is not None else None
+
+        if reconnect_scheduler is None and autoreconnect:
+            reconnect_scheduler = ReconnectScheduler(
+                self.loop, base_delay=reconnect_delay, max_delay=reconnect_max_delay,
+                max_concurrent=max_concurrent_connects,
+            )
+        self.reconnect_scheduler = reconnect_scheduler
+
+        if send_rate or target_send_rate:
+            self.connection.scheduler = OutboundScheduler(
+                self.loop, self.connection.send_now, rate=send_rate, burst=send_burst,
+                target_rate=target_send_rate, target_burst=target_send_burst,
+            )
+
+        self.batcher = None
+        if batch_window:
+            self.batcher = MessageBatcher(
+                self.loop, self._send_to_application, batch_window, size=batch_size,
+            )
+
+        self.publisher = None
+        if group_fanout:
+            self.publisher = GroupPublisher(
+                self.loop, channel_layer=channel_layer, prefix=group_prefix, shards=group_shards,
+            )
+
+        self.membership = MembershipCache(max_channel_members) if track_members else None
+
+        # Channels to join again on reconnecting, with `rejoin` or a `subscription_store`
+        self.subscription_store = subscription_store
+        self.subscriptions = set() if rejoin or subscription_store is not None else None
+        self._subscriptions_key = None
+
+        self.join_coalescer = JoinCoalescer(
+            self.loop, self._send_join, self._send_part, window=join_window,
+        )
+
+        self._registered_handlers = {}
+        self._build_dispatch_table()
+
+        if not self.shared_reactor:
+            self.reactor.add_global_handler("all_events", self._dispatcher, -10)
+
+    def __str__(self):
+        return '{}:{}'.format(
+            getattr(self.connection, 'server', None), getattr(self.connection, 'nickname', None)
+        )
 
     @property
     def connected(self):
         return getattr(self.connection, 'connected', False)
 
+    def _send_application_msg(self, msg):
+        """
+        Sends a message to the application, adding `irc.receive` messages to the
+        current batch if batching is enabled.  Any other message first sends the
+        current batch, so messages arrive in order.  With group fan-out, `irc.receive`
+        messages for IRC channels go to the channel's group instead
+        """
+        if self.idle and msg['type'] == 'irc.receive':
+            return
+
+        if self._received_at is not None and msg['type'] == 'irc.receive':
+            msg['received_at'] = self._received_at
+            msg['seq'] = self.seq
+
+        if self.publisher is not None and msg['type'] == 'irc.receive' and self.publisher.publish(msg):
+            return
+
+        if self.batcher is None:
+            return self._send_to_application(msg)
+
+        if msg['type'] == 'irc.receive':
+            self.batcher.add(msg)
+        else:
+            self.batcher.flush()
+            self._send_to_application(msg)
+
+    def _send_to_application(self, msg):
+        """
+        Sends a message to this client's application instance, or to a shared one
+        with the `connection` key added
+        """
+        if self.application_sender is None:
+            return super()._send_application_msg(msg)
+
+        msg['connection'] = self.key
+        self.connection_metrics.application_message()
+        self.application_sender(msg)
+
+    def pause_reading(self):
+        """
+        Stops reading from the IRC socket until the application queue drains
+        """
+        transport = getattr(self.connection, 'transport', None)
+
+        if transport is not None:
+            logger.warning('Application queue full, pausing reads from {}:{}'.format(
+                self.connection.server, self.connection.port
+            ))
+            transport.pause_reading()
+
+    def resume_reading(self):
+        """
+        Resumes reading from the IRC socket
+        """
+        transport = getattr(self.connection, 'transport', None)
+
+        if transport is not None and not transport.is_closing():
+            logger.info('Application queue drained, resuming reads from {}:{}'.format(
+                self.connection.server, self.connection.port
+            ))
+            transport.resume_reading()
+
+    def _is_forwarded(self, event_type):
+        if event_type in ALWAYS_DISPATCHED:
+            return True
+
+        if self.forward_events is not None and event_type not in self.forward_events:
+            return False
+
+        return event_type not in self.ignore_events
+
+    def _build_dispatch_table(self):
+        """
+        Maps each event type to its handler: an `on_<event>` method, a handler added
+        with `register_handler`, or `_forward_event`.  Filtered event types map to
+        `None`, so they are dropped without building a message
+        """
+        table = {}
+
+        for name in dir(type(self)):
+            if name.startswith('on_'):
+                event_type = name[3:]
+                table[event_type] = getattr(self, name) if self._is_forwarded(event_type) else None
+
+        for event_type in self.ignore_events:
+            if not self._is_forwarded(event_type):
+                table[event_type] = None
+
+        if self.forward_events is not None:
+            for event_type in self.forward_events:
+                table.setdefault(event_type, self._forward_event)
+
+        for event_type in TRACKED_EVENTS:
+            if not self._is_forwarded(event_type):
+                table[event_type] = getattr(self, '_track_{}'.format(event_type))
+
+        table.update(self._registered_handlers)
+
+        self._dispatch_table = table
+        self._default_handler = self._forward_event if self.forward_events is None else None
+
+    def register_handler(self, event_type, handler):
+        """
+        Adds a handler for `event_type`, replacing any `on_<event>` method.  Handlers
+        are called with `(connection, event)`, and are always dispatched
+        """
+        self._registered_handlers[event_type] = handler
+        self._build_dispatch_table()
+
+    def unregister_handler(self, event_type):
+        """
+        Removes a handler added with `register_handler`
+        """
+        self._registered_handlers.pop(event_type, None)
+        self._build_dispatch_table()
+
     def _dispatcher(self, connection, event):
-        method = getattr(self, "on_" + event.type, None)
+        self.connection_metrics.event(event.type)
+        handler = self._dispatch_table.get(event.type, self._default_handler)
+
+        if handler is None:
+            return
+
+        if not self.trace_messages:
+            return handler(connection, event)
+
+        # Messages sent by the handler are stamped for tracing
+        self._received_at = time.monotonic()
+        self.seq += 1
+        try:
+            handler(connection, event)
+        finally:
+            self._received_at = None
 
-        if method is not None:
-            method(connection, event)
+    def _forward_event(self, connection, event):
+        """
+        Sends a generic `irc.receive` message for events without a specific handler
+        """
+        if self.compact_messages:
+            msg = IrcMessage(event.type, channel=event.target, body=event.arguments)
         else:
-            self._send_application_msg({
+            msg = {
                 'type': 'irc.receive',
                 'command': event.type,
                 'body': event.arguments,
                 'channel': event.target,
-            })
+            }
+        if self.message_tags:
+            msg['tags'] = connection.tags
+        self._send_application_msg(msg)
+
+    def _is_own_nick(self, nick):
+        return nick == getattr(self.connection, 'real_nickname', None)
+
+    def _track_join(self, connection, event):
+        """
+        Tracks our own joins, and channel members
+        """
+        if self._is_own_nick(event.source.nick):
+            self.join_coalescer.joined_channel(event.target)
+            self._update_subscriptions(add=event.target)
+            if self.membership is not None:
+                self.membership.track(event.target)
+
+        if self.membership is not None:
+            self.membership.joined(event.target, event.source.nick)
+
+    def _track_part(self, connection, event):
+        """
+        Tracks our own parts, and channel members
+        """
+        if self._is_own_nick(event.source.nick):
+            self.join_coalescer.left_channel(event.target)
+            self._update_subscriptions(remove=event.target)
+            if self.membership is not None:
+                self.membership.forget(event.target)
+
+        elif self.membership is not None:
+            self.membership.left(event.target, event.source.nick)
+
+    def _track_kick(self, connection, event):
+        """
+        Tracks kicks of our own nick, and channel members
+        """
+        if not event.arguments:
+            return
+
+        if self._is_own_nick(event.arguments[0]):
+            self.join_coalescer.left_channel(event.target)
+            self._update_subscriptions(remove=event.target)
+            if self.membership is not None:
+                self.membership.forget(event.target)
+
+        elif self.membership is not None:
+            self.membership.left(event.target, event.arguments[0])
+
+    def _update_subscriptions(self, add=None, remove=None):
+        """
+        Records a channel we joined or left, and saves the subscriptions
+        """
+        if self.subscriptions is None:
+            return
+
+        if add is not None:
+            self.subscriptions.add(add.lower())
+        if remove is not None:
+            self.subscriptions.discard(remove.lower())
+
+        if self.subscription_store is not None:
+            self.subscription_store.save(self.key, self.subscriptions)
+
+    def _load_subscriptions(self):
+        """
+        Loads the stored subscriptions the first time a connection key is used
+        """
+        if self.subscription_store is None or self._subscriptions_key == self.key:
+            return
+
+        self._subscriptions_key = self.key
+        self.subscriptions = set(self.subscription_store.load(self.key))
+
+    def _track_quit(self, connection, event):
+        if self.membership is not None:
+            self.membership.quit(event.source.nick)
+
+    def _track_nick(self, connection, event):
+        if self.membership is not None:
+            self.membership.nick_changed(event.source.nick, event.target)
+
+    def _track_namreply(self, connection, event):
+        if self.membership is not None and len(event.arguments) >= 3:
+            self.membership.add_names(event.arguments[1], event.arguments[2].split())
+
+    def _track_endofnames(self, connection, event):
+        if self.membership is not None and event.arguments:
+            self.membership.end_names(event.arguments[0])
+
+    def on_join(self, connection, event):
+        """
+        Tracks our own joins, and forwards the event
+        """
+        self._track_join(connection, event)
+        self._forward_event(connection, event)
+
+    def on_part(self, connection, event):
+        """
+        Tracks our own parts, and forwards the event
+        """
+        self._track_part(connection, event)
+        self._forward_event(connection, event)
+
+    def on_kick(self, connection, event):
+        """
+        Tracks kicks of our own nick, and forwards the event
+        """
+        self._track_kick(connection, event)
+        self._forward_event(connection, event)
+
+    def on_quit(self, connection, event):
+        self._track_quit(connection, event)
+        self._forward_event(connection, event)
+
+    def on_nick(self, connection, event):
+        self._track_nick(connection, event)
+        self._forward_event(connection, event)
+
+    def on_namreply(self, connection, event):
+        self._track_namreply(connection, event)
+        self._forward_event(connection, event)
+
+    def on_endofnames(self, connection, event):
+        self._track_endofnames(connection, event)
+        self._forward_event(connection, event)
+
+    def _handle_raw_lines(self, lines):
+        """
+        Sends the raw lines from a read to the application, when in raw mode
+        """
+        self._send_application_msg({
+            'type': 'irc.receive.raw',
+            'lines': lines,
+        })
 
     def on_welcome(self, connection, event):
         """
@@ -45,13 +422,49 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
         """
         logger.info('Connected to IRC Server {}:{}'.format(connection.server, connection.port))
 
+        if self.reconnect_scheduler is not None:
+            self.reconnect_scheduler.connected(self)
+
+        # Switches the connection to raw mode, if enabled
+        connection.registered = True
+
+        if self.message_tags:
+            connection.cap('REQ', 'message-tags')
+
+        if self.subscriptions:
+            logger.info('Joining {} channel(s) again'.format(len(self.subscriptions)))
+            self.join_coalescer.join_many(sorted(self.subscriptions))
+
+        self._send_welcome(event.target)
+
+    def _send_welcome(self, target):
         msg = {
             'type': 'irc.receive',
             'command': 'welcome',
-            'channel': event.target,
+            'channel': target,
         }
         self._send_application_msg(msg)
 
+    def deactivate(self):
+        """
+        Parts every joined channel, and stops sending `irc.receive` messages to the
+        application, while the connection is kept in a pool
+        """
+        self.idle = True
+
+        for channel in list(self.join_coalescer.joined):
+            self.join_coalescer.part(channel)
+
+    def activate(self):
+        """
+        Takes the connection out of a pool.  If it is already registered, the
+        application is sent a welcome again, so it can set the connection up
+        """
+        self.idle = False
+
+        if self.connected and self.connection.registered:
+            self._send_welcome(self.connection.real_nickname)
+
     def on_privmsg(self, connection, event):
         """
         Sends message to `irc.receive` with incoming info
@@ -68,26 +481,46 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
         """
         Sends message type `irc.disconnected` with disconnected server info
         """
+        self.join_coalescer.reset()
+        if self.membership is not None:
+            self.membership.reset()
+
         msg = {
             'type': 'irc.on.disconnect',
             'server': [connection.server, connection.port],
         }
         self._send_application_msg(msg)
 
+        if self.autoreconnect and not self._closing:
+            self.reconnect_scheduler.schedule(self)
+
     def _handle_on_message(self, connection, event):
-        msg = {
-            'type': 'irc.receive',
-            'command': 'message',
-            'user': event.source.nick,
-            'channel': event.target,
-            'body': event.arguments[0],
-        }
+        if self.compact_messages:
+            msg = IrcMessage(
+                'message', channel=event.target, user=event.source.nick, body=event.arguments[0],
+            )
+        else:
+            msg = {
+                'type': 'irc.receive',
+                'command': 'message',
+                'user': event.source.nick,
+                'channel': event.target,
+                'body': event.arguments[0],
+            }
+        if self.message_tags:
+            msg['tags'] = connection.tags
         self._send_application_msg(msg)
 
-    def disconnect(self, message=""):
+    def disconnect(self, message="", reconnect=True):
         """
-        Disconnects from the current IRC connection
+        Disconnects from the current IRC connection.  With `autoreconnect`, the
+        connection is made again afterwards, unless `reconnect` is False
         """
+        self._closing = not reconnect
+
+        if self._closing and self.reconnect_scheduler is not None:
+            self.reconnect_scheduler.cancel(self)
+
         logger.info("Disconnecting from {}:{}...".format(
             self.connection.server, self.connection.port
         ))
@@ -98,15 +531,29 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
     ):
         """
         Instantiates the connection to the server.  Also creates the requisite
-        application instance
-        """
-        scope = {
-            'type': 'irc',
-            'server': server,
-            'port': port,
-            'nickname': nickname,
-        }
-        self.create_application(scope=scope, from_consumer=self.from_consumer)
+        application instance, unless messages are sent to a shared application
+        instance.  An instance still running from a previous connection is cancelled
+        first.  If the connection fails and `autoreconnect` is set, a reconnection
+        attempt is scheduled
+        """
+        self._closing = False
+        self.key = '{}:{}'.format(server, nickname)
+        self.connection_metrics = self.metrics.connection(self.key)
+        self.connection.connection_metrics = self.connection_metrics
+        if self.connection.scheduler is not None:
+            self.connection_metrics.track_scheduler(self.connection.scheduler)
+        self._load_subscriptions()
+
+        if self.application_sender is None:
+            await self.stop_application()
+
+            scope = {
+                'type': 'irc',
+                'server': server,
+                'port': port,
+                'nickname': nickname,
+            }
+            self.create_application(scope=scope, from_consumer=self.from_consumer)
 
         try:
             await self.connection.connect(
@@ -116,16 +563,46 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
             logger.debug('Connection attempt to {} with user {} failed '.format(
               server, nickname
             ))
-        if self.autoreconnect and not is_reconnect:
-            self.loop.call_later(self.reconnect_delay, self.reconnect_checker)
+        except OSError as e:
+            if not self.autoreconnect:
+                raise
+            logger.warning('Connection attempt to {} with user {} failed: {}'.format(
+              server, nickname, e
+            ))
+
+        if self.autoreconnect and not self.connected and not is_reconnect:
+            self.reconnect_scheduler.schedule(self)
+
+    async def reconnect(self):
+        """
+        Reconnects with the settings of the last connection.  Returns whether the
+        connection succeeded
+        """
+        logger.info('Attempting to reconnect to {}:{}'.format(
+            self.connection.server, self.connection.port
+        ))
+        self.connection_metrics.reconnect()
+        await self.connect(
+            self.connection.server,
+            self.connection.port,
+            self.connection.nickname,
+            password=self.connection.password,
+            username=self.connection.username,
+            ircname=self.connection.ircname,
+            is_reconnect=True,
+        )
+        return self.connected
 
     async def from_consumer(self, message):
         """
         Receives message from channels from the consumer.  Message should have the format:
             {
                 'type': 'irc.send',
-                'command': VALID_COMMAND_TYPE
+                'command': VALID_COMMAND_TYPE,
+                'priority': <PRIORITY>,  # Optional, lower is sent first
+                'ttl': <SECONDS>,  # Optional, discarded if not sent in time
             }
+        `priority` and `ttl` only apply when outbound rate limits are set
         """
         if "type" not in message:
             raise ValueError("Message has no type defined")
@@ -134,7 +611,17 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
             command_type = message.get('command', '').lower()
 
             handler = getattr(self, '_handle_{}'.format(command_type))
-            await handler(message)
+
+            started = time.perf_counter()
+            scheduler = self.connection.scheduler
+
+            if scheduler is not None and ('priority' in message or 'ttl' in message):
+                with scheduler.options(priority=message.get('priority'), ttl=message.get('ttl')):
+                    await handler(message)
+            else:
+                await handler(message)
+
+            self.connection_metrics.consumer_message(command_type, time.perf_counter() - started)
 
         else:
             raise ValueError("Cannot handle message type %s!" % message["type"])
@@ -149,6 +636,18 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
             'command': 'status',
             'body': {
                 'connected': self.connected,
+                'queue': (
+                    self.application_queue.stats() if self.application_sender is None else None
+                ),
+                'outbound': (
+                    self.connection.scheduler.stats()
+                    if self.connection.scheduler is not None else None
+                ),
+                'reconnect': (
+                    self.reconnect_scheduler.status(self)
+                    if self.reconnect_scheduler is not None else None
+                ),
+                'groups': self.publisher.stats() if self.publisher is not None else None,
             },
         })
 
@@ -164,7 +663,13 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
         channel = msg.get('channel', '')
 
         if channel:
-            self.connection.join(self.format_channel_name(channel))
+            self.join_coalescer.join(self.format_channel_name(channel))
+
+    def _send_join(self, channels):
+        self.connection.join(','.join(channels))
+
+    def _send_part(self, channels):
+        self.connection.part(channels)
 
     async def _handle_message(self, msg):
         """
@@ -196,6 +701,37 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
         if channel:
             self.connection.names(self.format_channel_name(channel))
 
+    async def _handle_members(self, msg):
+        """
+        Replies with the members of a channel, from the membership cache, as
+        `{nick: mode prefixes}`.  The body is None if the channel isn't tracked.
+        Channel msg should be in the format:
+            {
+                'type': 'irc.send',
+                'command': 'members',
+                'channel': <CHANNEL_NAME>,
+            }
+        """
+        channel = msg.get('channel', '')
+        if channel:
+            channel = self.format_channel_name(channel)
+
+        self._send_application_msg({
+            'type': 'irc.receive',
+            'command': 'members',
+            'channel': channel,
+            'body': self.get_members(channel),
+        })
+
+    def get_members(self, channel):
+        """
+        The cached members of a channel, or None if members aren't tracked
+        """
+        if self.membership is None or not channel:
+            return None
+
+        return self.membership.members(self.format_channel_name(channel))
+
     async def _handle_part(self, msg):
         """
         Handles PART commands
@@ -203,7 +739,41 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
         channel = msg.get('channel', '')
 
         if channel:
-            self.connection.part(self.format_channel_name(channel))
+            self.join_coalescer.part(self.format_channel_name(channel))
+
+    async def _handle_kick(self, msg):
+        """
+        Kicks a user from the passed channel.  Channel msg should be in the format:
+            {
+                'type': 'irc.send',
+                'command': 'kick',
+                'channel': <CHANNEL_NAME>,
+                'body': <NICKNAME>,
+                'reason': <KICK_REASON>,  # optional
+            }
+        """
+        channel = msg.get('channel', '')
+        nickname = msg.get('body', '')
+
+        if channel and nickname:
+            self.connection.kick(self.format_channel_name(channel), nickname, msg.get('reason', ''))
+
+    async def _handle_mode(self, msg):
+        """
+        Sets modes on the passed channel, e.g. `+b nick!*@*` to ban a user.  Channel msg
+        should be in the format:
+            {
+                'type': 'irc.send',
+                'command': 'mode',
+                'channel': <CHANNEL_NAME>,
+                'body': <MODES_AND_ARGUMENTS>,
+            }
+        """
+        channel = msg.get('channel', '')
+        modes = msg.get('body', '')
+
+        if channel and modes:
+            self.connection.mode(self.format_channel_name(channel), modes)
 
     async def _handle_disconnect(self, msg):
         """
@@ -216,7 +786,7 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
             }
         """
         message = msg.get('body', '')
-        self.disconnect(message=message)
+        self.disconnect(message=message, reconnect=False)
 
     async def _handle_cap(self, msg):
         """
@@ -234,30 +804,6 @@ class ChannelsIRCClient(AioSimpleIRCClient, BaseServer):
         if subcommand is not None:
             self.connection.cap(subcommand, *msg.get('args', []))
 
-    def reconnect_checker(self):
-        """
-        Checks at a regular interval as to whether the connection to IRC has been
-        disconnected, and re-starts the connection if it has
-        """
-        if not self.connected and self.autoreconnect:
-            logger.info('Attempting to reconnect to {}:{}'.format(
-                self.connection.server, self.connection.port
-            ))
-            asyncio.ensure_future(
-                self.connect(
-                    self.connection.server,
-                    self.connection.port,
-                    self.connection.nickname,
-                    password=self.connection.password,
-                    username=self.connection.username,
-                    ircname=self.connection.ircname,
-                    is_reconnect=True,
-                ),
-                loop=self.loop
-            )
-
-        self.loop.call_later(self.reconnect_delay, self.reconnect_checker)
-
     def start(self):
         super().start()
 
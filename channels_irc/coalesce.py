@@ -0,0 +1,160 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum length of an IRC line in bytes, including the trailing CR LF
+MAX_LINE_LENGTH = 512
+
+# Seconds to wait for a JOIN to be confirmed before it can be requested again
+REQUEST_TIMEOUT = 30
+
+
+def pack_channels(command, channels, max_length=MAX_LINE_LENGTH):
+    """
+    Groups channel names into comma-separated lists, each of which fits in a single
+    `COMMAND #a,#b,#c` line of at most `max_length` bytes
+    """
+    # `COMMAND ` prefix and the trailing CR LF
+    overhead = len(command) + 3
+    batch = []
+    length = overhead
+
+    for channel in channels:
+        size = len(channel.encode('utf-8')) + (1 if batch else 0)
+
+        if batch and length + size > max_length:
+            yield batch
+            batch = []
+            length = overhead
+            size -= 1
+
+        batch.append(channel)
+        length += size
+
+    if batch:
+        yield batch
+
+
+class JoinCoalescer:
+    """
+    Collects JOIN and PART requests for `window` seconds and sends them as packed,
+    comma-separated lines.  Channels that are already joined, or that have a JOIN in
+    flight, are not requested again.  With a `window` of 0, requests are sent
+    immediately
+    """
+    def __init__(self, loop, join, part, window=0):
+        self.loop = loop
+        self.send_join = join
+        self.send_part = part
+        self.window = window
+
+        self.joined = set()
+        self.requested = {}
+        self.pending_joins = {}
+        self.pending_parts = {}
+        self._handle = None
+
+    def join(self, channel):
+        if self._add_join(channel):
+            self._schedule()
+
+    def join_many(self, channels):
+        """
+        Requests a JOIN of every channel, sent straight away in as few lines as fit
+        """
+        added = [self._add_join(channel) for channel in channels]
+
+        if any(added):
+            if self._handle is not None:
+                self._handle.cancel()
+            self.flush()
+
+    def _add_join(self, channel):
+        """
+        Adds a pending JOIN for `channel`.  Returns False if it isn't needed
+        """
+        key = channel.lower()
+
+        if key in self.pending_parts:
+            del self.pending_parts[key]
+            if key in self.joined:
+                return False
+
+        if key in self.joined or key in self.pending_joins:
+            return False
+
+        requested_at = self.requested.get(key)
+        if requested_at is not None and self.loop.time() - requested_at < REQUEST_TIMEOUT:
+            return False
+
+        self.pending_joins[key] = channel
+        return True
+
+    def part(self, channel):
+        key = channel.lower()
+
+        if key in self.pending_joins:
+            del self.pending_joins[key]
+            return
+
+        self.pending_parts[key] = channel
+        self._schedule()
+
+    def _schedule(self):
+        if not self.window:
+            self.flush()
+        elif self._handle is None:
+            self._handle = self.loop.call_later(self.window, self.flush)
+
+    def flush(self):
+        """
+        Sends every pending PART, then every pending JOIN
+        """
+        self._handle = None
+        parts, self.pending_parts = self.pending_parts, {}
+        joins, self.pending_joins = self.pending_joins, {}
+
+        for batch in pack_channels('PART', parts.values()):
+            self.send_part(batch)
+
+        for key in parts:
+            self.requested.pop(key, None)
+
+        now = self.loop.time()
+        for batch in pack_channels('JOIN', joins.values()):
+            self.send_join(batch)
+
+        for key in joins:
+            self.requested[key] = now
+
+        if parts or joins:
+            logger.debug('Sent {} JOIN(s) and {} PART(s)'.format(len(joins), len(parts)))
+
+    def joined_channel(self, channel):
+        """
+        Records that the server confirmed our JOIN to `channel`
+        """
+        key = channel.lower()
+        self.requested.pop(key, None)
+        self.joined.add(key)
+
+    def left_channel(self, channel):
+        """
+        Records that we are no longer in `channel`
+        """
+        key = channel.lower()
+        self.requested.pop(key, None)
+        self.joined.discard(key)
+
+    def reset(self):
+        """
+        Forgets all channel state, e.g. after a disconnect
+        """
+        self.joined = set()
+        self.requested = {}
+        self.pending_joins = {}
+        self.pending_parts = {}
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
@@ -0,0 +1,95 @@
+from irc.client_aio import AioConnection, AioReactor
+from jaraco.stream.buffer import LineBuffer
+
+from .metrics import NULL_CONNECTION_METRICS
+from .tags import MessageTags
+
+
+class IrcConnection(AioConnection):
+    """
+    `AioConnection` with hooks for the interface server.  If an outbound `scheduler`
+    is set, every raw line sent to the server is paced through it.
+
+    If `message_tags` is set, IRCv3 tags are split off each line before it is parsed,
+    and are available as `tags` (a lazily decoded `MessageTags`) while the line's
+    events are dispatched.  Events themselves have no tags in that case.
+
+    If a `raw_handler` is set, once the connection is `registered` incoming data is
+    no longer parsed into events: the handler is called with the list of complete
+    lines (as bytes) from each read, and PINGs are answered directly
+    """
+    scheduler = None
+    message_tags = False
+    tag_whitelist = None
+    tags = None
+    raw_handler = None
+    registered = False
+    connection_metrics = NULL_CONNECTION_METRICS
+
+    async def connect(self, *args, **kwargs):
+        self.registered = False
+        self.raw_buffer = LineBuffer()
+        return await super().connect(*args, **kwargs)
+
+    def process_data(self, new_data):
+        if self.raw_handler is None:
+            return super().process_data(new_data)
+
+        self.raw_buffer.feed(new_data)
+        lines = []
+
+        for line in self.raw_buffer:
+            if not line:
+                continue
+            if not self.registered:
+                # Lines are parsed until the welcome; the rest of the read, and any
+                # partial line left in the buffer, is raw
+                super().process_data(line + b'\r\n')
+                continue
+            if line.startswith(b'PING'):
+                self.send_raw('PONG' + line[4:].decode('utf-8', 'replace'))
+            lines.append(line)
+
+        if lines:
+            self.raw_handler(lines)
+
+    def _process_line(self, line):
+        if self.message_tags:
+            if line.startswith('@'):
+                raw_tags, _, line = line[1:].partition(' ')
+                self.tags = MessageTags(raw_tags, self.tag_whitelist)
+            else:
+                self.tags = None
+
+        super()._process_line(line)
+
+    def send_raw(self, string):
+        """
+        Sends a raw line to the server, through the outbound scheduler if there is one
+        """
+        if self.scheduler is None:
+            self.send_now(string)
+        else:
+            # Raise for invalid lines now, rather than when they are sent
+            self._prep_message(string)
+            self.scheduler.submit(string)
+
+    def send_now(self, string):
+        """
+        Writes a raw line to the transport immediately, bypassing the scheduler
+        """
+        super().send_raw(string)
+        self.connection_metrics.line_sent()
+
+    def disconnect(self, message=""):
+        if self.scheduler is not None:
+            self.scheduler.clear()
+
+        super().disconnect(message=message)
+
+
+class IrcReactor(AioReactor):
+    """
+    `AioReactor` that creates `IrcConnection` instances
+    """
+    connection_class = IrcConnection
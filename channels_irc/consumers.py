@@ -1,13 +1,75 @@
+import inspect
+import random
+import time
+
 from channels.consumer import AsyncConsumer
 from channels.exceptions import InvalidChannelLayerError, StopConsumer
 
 
+# Optional `irc.receive` keys passed to handlers that accept them as keyword arguments
+HANDLER_EXTRAS = ('tags',)
+
+
+def _handler_extras(handler):
+    """
+    Which of `HANDLER_EXTRAS` a handler accepts
+    """
+    try:
+        parameters = inspect.signature(handler).parameters
+    except (TypeError, ValueError):
+        return ()
+
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values()):
+        return HANDLER_EXTRAS
+
+    return tuple(name for name in HANDLER_EXTRAS if name in parameters)
+
+
 class AsyncIrcConsumer(AsyncConsumer):
     """
     Base IRC consumer; Implements basic hooks for interfacing with the IRC Interface Server
     """
     groups = []
 
+    # Commands to handle.  If set, any other `irc.receive` command is ignored, even if
+    # the consumer has a handler for it.  `welcome` is always handled
+    irc_commands = None
+
+    # `on_<name>` methods that are hooks rather than `irc.receive` command handlers.
+    # Subclasses adding hooks should extend this
+    irc_hooks = frozenset(['disconnect', 'batch', 'raw'])
+
+    # `channels_irc.tracing.Tracer` given the timings of a `trace_sample_rate` fraction
+    # of messages, when the interface server stamps them (`--trace-messages`)
+    tracer = None
+    trace_sample_rate = 1.0
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._build_irc_handlers()
+
+    @classmethod
+    def _build_irc_handlers(cls):
+        """
+        Resolves the `on_<command>` handlers for the class once, so `irc_receive`
+        doesn't need to look them up for every message.  `irc_hooks` are left out
+        """
+        handlers = {}
+
+        for name in dir(cls):
+            if name.startswith('on_') and name[3:] not in cls.irc_hooks:
+                handler = getattr(cls, name)
+                handlers[name[3:]] = (handler, _handler_extras(handler))
+
+        if cls.irc_commands is not None:
+            handlers = {
+                command: handler for command, handler in handlers.items()
+                if command in cls.irc_commands or command == 'welcome'
+            }
+
+        cls._irc_handlers = handlers
+        cls._irc_message_handler = handlers.get('message')
+
     async def on_welcome(self, channel, user=None, body=None):
         """
         Called when the IRC Interface Server connects to the IRC Server
@@ -52,25 +114,66 @@ class AsyncIrcConsumer(AsyncConsumer):
         """
         command_type = message.get('command', None)
 
-        if command_type is None:
+        if command_type == 'message':
+            handler = self._irc_message_handler
+        elif command_type is None:
             raise ValueError('An `irc.receive` message must specify a `command` key')
-
-        handler = getattr(self, 'on_{}'.format(command_type), None)
+        else:
+            handler = self._irc_handlers.get(command_type)
 
         if handler is not None:
-            await handler(
+            handler, extras = handler
+            handled = handler(
+                self,
                 channel=message.get('channel', None),
                 user=message.get('user', None),
                 body=message.get('body', None),
+                **{key: message.get(key) for key in extras}
             )
 
-    async def send_message(self, channel, text):
+            received_at = message.get('received_at') if self.tracer is not None else None
+
+            if received_at is None or random.random() >= self.trace_sample_rate:
+                await handled
+            else:
+                started = time.monotonic()
+                await handled
+                self.tracer.record(message, started - received_at, time.monotonic() - started)
+
+    async def irc_receive_batch(self, message):
+        """
+        Called with a batch of `irc.receive` messages, when the IRC Interface Server
+        batches incoming messages
+        """
+        await self.on_batch(message['messages'])
+
+    async def on_batch(self, messages):
+        """
+        Handles a list of `irc.receive` messages.  By default, each message is passed
+        to `irc_receive` in order.  Override to process a batch in one go
+        """
+        for message in messages:
+            await self.irc_receive(message)
+
+    async def irc_receive_raw(self, message):
+        """
+        Called with unparsed lines, when the IRC Interface Server is in raw mode
+        """
+        await self.on_raw(message['lines'])
+
+    async def on_raw(self, lines):
+        """
+        Hook for handling a list of raw IRC lines, as bytes without the trailing CR LF
+        """
+        pass
+
+    async def send_message(self, channel, text, **kwargs):
         """
         Sends a PRIVMSG to the IRC Server
         """
-        await self.send_command('message', channel=channel, body=text)
+        await self.send_command('message', channel=channel, body=text, **kwargs)
 
-    async def send_command(self, command, channel=None, body=None):
+    async def send_command(self, command, channel=None, body=None, priority=None, ttl=None):
         """
         Sends a command to the IRC Server.  Message should be of the format:
             {
@@ -78,14 +181,25 @@ class AsyncIrcConsumer(AsyncConsumer):
                 'command': '<IRC_COMMAND>',
                 'channel': '<IRC_CHANNEL>',  # Optional, depending on command
                 'body': '<COMMAND_TEXT>',  # Optional, depending on command
+                'priority': <PRIORITY>,  # Optional, lower is sent first
+                'ttl': <SECONDS>,  # Optional, discarded if not sent in time
             }
         """
-        await self.send({
+        message = {
             'type': 'irc.send',
             'command': command,
             'channel': channel,
             'body': body,
-        })
+        }
+        if priority is not None:
+            message['priority'] = priority
+        if ttl is not None:
+            message['ttl'] = ttl
+
+        await self.send(message)
+
+
+AsyncIrcConsumer._build_irc_handlers()
 
 
 class MultiIrcConsumer(AsyncConsumer):
@@ -104,6 +218,92 @@ class MultiIrcConsumer(AsyncConsumer):
         """
         pass
 
+    async def irc_multi_status(self, message):
+        """
+        Called with the reply to `send_status`
+        """
+        await self.on_status(message['connections'])
+
+    async def on_status(self, connections):
+        """
+        Hook for handling the state of every connection, as a dict of
+        `SERVER:NICKNAME` to connection state
+        """
+        pass
+
+    async def send_status(self):
+        """
+        Requests the state of every connection.  The reply is passed to `on_status`
+        """
+        await self.send({
+            'type': 'irc.multi.status',
+        })
+
+    async def irc_receive(self, message):
+        """
+        Called with `irc.receive` messages from shared connections, which carry the
+        `SERVER:NICKNAME` key of their connection
+        """
+        await self.on_receive(message['connection'], message)
+
+    async def on_receive(self, connection, message):
+        """
+        Hook for handling an `irc.receive` message from a shared connection
+        """
+        pass
+
+    async def irc_receive_batch(self, message):
+        """
+        Passes each message of a batch from a shared connection to `on_receive`
+        """
+        for received in message['messages']:
+            await self.on_receive(message['connection'], received)
+
+    async def irc_receive_raw(self, message):
+        """
+        Called with unparsed lines from a shared connection in raw mode
+        """
+        await self.on_raw(message['connection'], message['lines'])
+
+    async def on_raw(self, connection, lines):
+        """
+        Hook for handling a list of raw IRC lines from a shared connection
+        """
+        pass
+
+    async def irc_on_disconnect(self, message):
+        """
+        Called when a shared connection is closed
+        """
+        await self.on_disconnect(message['connection'], message['server'][0], message['server'][1])
+
+    async def on_disconnect(self, connection, server, port):
+        """
+        Hook for any action(s) to be run when a shared connection is closed
+        """
+        pass
+
+    async def send_command(self, connection, command, channel=None, body=None, **kwargs):
+        """
+        Sends a command to the IRC Server of a shared connection.  Takes the same
+        arguments as `AsyncIrcConsumer.send_command`, after the connection's
+        `SERVER:NICKNAME` key
+        """
+        await self.send({
+            'type': 'irc.send',
+            'connection': connection,
+            'command': command,
+            'channel': channel,
+            'body': body,
+            **kwargs
+        })
+
+    async def send_message(self, connection, channel, text, **kwargs):
+        """
+        Sends a PRIVMSG on a shared connection
+        """
+        await self.send_command(connection, 'message', channel=channel, body=text, **kwargs)
+
     async def send_connect(self, server, port, nickname, **kwargs):
         """
         Creates a new connection, if no connection to that server/nickname
@@ -117,6 +317,60 @@ class MultiIrcConsumer(AsyncConsumer):
             **kwargs
         })
 
+    async def send_connect_bulk(self, connections, concurrency=None):
+        """
+        Creates a connection for each dict of `send_connect` arguments in
+        `connections`, opening up to `concurrency` at once.  The result of each is
+        passed to `on_connect_result`
+        """
+        await self.send({
+            'type': 'irc.multi.connect.bulk',
+            'connections': connections,
+            'concurrency': concurrency,
+        })
+
+    async def irc_multi_connect_result(self, message):
+        """
+        Called with the result of each connection of `send_connect_bulk`
+        """
+        await self.on_connect_result(
+            message['server'], message['nickname'], message['connected'], message['error'],
+        )
+
+    async def on_connect_result(self, server, nickname, connected, error):
+        """
+        Hook for handling the result of a connection from `send_connect_bulk`.  `error`
+        is the reason the connection failed, if it raised an error
+        """
+        pass
+
+    async def send_members(self, server, nickname, channel):
+        """
+        Requests the cached members of a channel of a connection.  The reply is passed
+        to `on_members`
+        """
+        await self.send({
+            'type': 'irc.multi.members',
+            'server': server,
+            'nickname': nickname,
+            'channel': channel,
+        })
+
+    async def irc_multi_members(self, message):
+        """
+        Called with the reply to `send_members`
+        """
+        await self.on_members(
+            message['server'], message['nickname'], message['channel'], message['members'],
+        )
+
+    async def on_members(self, server, nickname, channel, members):
+        """
+        Hook for handling the members of a channel, as `{nick: mode prefixes}`, or None
+        if members of the channel aren't tracked
+        """
+        pass
+
     async def send_disconnect(self, server, nickname):
         """
         Disconnects a connnect and removes it from the stored connections
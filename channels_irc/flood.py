@@ -0,0 +1,255 @@
+import collections
+import contextlib
+import logging
+
+from irc.client import InvalidCharacters, MessageTooLong, ServerNotConnectedError
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers are sent first.  Priority 0 commands skip the queue entirely
+DEFAULT_PRIORITIES = {
+    'PONG': 0,
+    'QUIT': 0,
+    'PASS': 0,
+    'NICK': 0,
+    'USER': 0,
+    'CAP': 0,
+    'PING': 1,
+    'KICK': 1,
+    'MODE': 1,
+    'JOIN': 2,
+    'PART': 2,
+    'NAMES': 2,
+}
+DEFAULT_PRIORITY = 3
+
+# Commands whose first argument is paced by the per-target bucket
+TARGETED_COMMANDS = {'PRIVMSG', 'NOTICE'}
+
+# Once there are this many per-target buckets, refilled ones are discarded
+MAX_IDLE_BUCKETS = 1000
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to `burst` tokens, refilled at `rate` tokens per second
+    """
+    def __init__(self, rate, burst, clock):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """
+        Seconds until a token is available, 0 if one is available now
+        """
+        self._refill()
+
+        if self.tokens >= 1:
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """
+        Removes a token from the bucket.  The bucket may go into debt
+        """
+        self._refill()
+        self.tokens -= 1
+
+    @property
+    def full(self):
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class OutboundScheduler:
+    """
+    Paces raw lines sent to an IRC connection with a token bucket for the whole
+    connection, and optionally one per message target.  Queued lines are sent in
+    priority order (see `DEFAULT_PRIORITIES`).  Within a priority, targets take turns,
+    so a busy channel can't hold back replies to every other one, and each target's
+    lines are sent in the order they were submitted.  Lines submitted with a deadline
+    are discarded if it passes while they are queued
+    """
+    def __init__(
+        self, loop, send, rate=0, burst=1, target_rate=0, target_burst=1, priorities=None,
+    ):
+        self.loop = loop
+        self.send = send
+        self.priorities = priorities if priorities is not None else DEFAULT_PRIORITIES
+
+        self.bucket = TokenBucket(rate, burst, loop.time) if rate else None
+        self.target_rate = target_rate
+        self.target_burst = target_burst
+        self.target_buckets = {}
+
+        # priority: OrderedDict of target: deque of (deadline, line), in turn order
+        self._queues = {}
+        self._queued = 0
+        self._handle = None
+        self._options = (None, None)
+        self.sent = 0
+        self.expired = 0
+
+    @contextlib.contextmanager
+    def options(self, priority=None, ttl=None):
+        """
+        Applies a priority, and a deadline `ttl` seconds from now, to the lines
+        submitted inside the block
+        """
+        deadline = self.loop.time() + ttl if ttl is not None else None
+        previous, self._options = self._options, (priority, deadline)
+        try:
+            yield
+        finally:
+            self._options = previous
+
+    def submit(self, line, priority=None, deadline=None):
+        """
+        Queues a raw line to be sent as soon as the rate limits allow.  `deadline` is
+        a time of the loop's clock after which the line is discarded instead
+        """
+        command, _, rest = line.partition(' ')
+        command = command.upper()
+
+        priority = priority if priority is not None else self._options[0]
+        deadline = deadline if deadline is not None else self._options[1]
+        if priority is None:
+            priority = self.priorities.get(command, DEFAULT_PRIORITY)
+
+        if priority == 0:
+            if self.bucket is not None:
+                self.bucket.take()
+            self._send(line)
+            return
+
+        target = rest.split(' ', 1)[0].lower() if command in TARGETED_COMMANDS else None
+        targets = self._queues.setdefault(priority, collections.OrderedDict())
+        targets.setdefault(target, collections.deque()).append((deadline, line))
+        self._queued += 1
+
+        if self._handle is not None:
+            self._handle.cancel()
+        self._drain()
+
+    def _target_bucket(self, target):
+        if target is None or not self.target_rate:
+            return None
+
+        bucket = self.target_buckets.get(target)
+
+        if bucket is None:
+            if len(self.target_buckets) >= MAX_IDLE_BUCKETS:
+                self.target_buckets = {
+                    key: value for key, value in self.target_buckets.items() if not value.full
+                }
+            bucket = self.target_buckets[target] = TokenBucket(
+                self.target_rate, self.target_burst, self.loop.time
+            )
+
+        return bucket
+
+    def _expire(self, lines, now):
+        """
+        Discards the lines at the front of a target's queue whose deadline has passed
+        """
+        while lines and lines[0][0] is not None and lines[0][0] <= now:
+            lines.popleft()
+            self._queued -= 1
+            self.expired += 1
+
+    def _drain(self):
+        """
+        Sends every queued line the buckets currently allow, and schedules itself
+        for when the next token becomes available
+        """
+        self._handle = None
+        now = self.loop.time()
+        wait = None
+        throttled = False
+
+        for priority in sorted(self._queues):
+            targets = self._queues[priority]
+            blocked = set()
+
+            while len(blocked) < len(targets):
+                delay = self.bucket.delay() if self.bucket is not None else 0
+                if delay:
+                    wait = delay if wait is None else min(wait, delay)
+                    throttled = True
+                    break
+
+                target = next(iter(targets))
+                targets.move_to_end(target)
+                if target in blocked:
+                    continue
+
+                lines = targets[target]
+                self._expire(lines, now)
+                if not lines:
+                    del targets[target]
+                    continue
+
+                target_bucket = self._target_bucket(target)
+                if target_bucket is not None:
+                    delay = target_bucket.delay()
+                    if delay:
+                        wait = delay if wait is None else min(wait, delay)
+                        blocked.add(target)
+                        continue
+                    target_bucket.take()
+
+                if self.bucket is not None:
+                    self.bucket.take()
+                self._queued -= 1
+                self._send(lines.popleft()[1])
+
+                if not lines:
+                    del targets[target]
+
+            if not targets:
+                del self._queues[priority]
+
+            # Out of connection tokens, so lower priorities have to wait too
+            if throttled:
+                break
+
+        if self._queued:
+            self._handle = self.loop.call_later(wait, self._drain)
+
+    def _send(self, line):
+        try:
+            self.send(line)
+        except ServerNotConnectedError:
+            logger.debug('Dropping outbound line, not connected: {}'.format(line))
+        except (InvalidCharacters, MessageTooLong) as e:
+            # Invalid lines (newlines, over 512 bytes) mustn't stop the drain
+            logger.warning('Dropping invalid outbound line {!r}: {}'.format(line, e))
+        else:
+            self.sent += 1
+
+    def clear(self):
+        """
+        Discards every queued line
+        """
+        self._queues = {}
+        self._queued = 0
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def stats(self):
+        return {
+            'queued': self._queued,
+            'sent': self.sent,
+            'expired': self.expired,
+        }
@@ -0,0 +1,121 @@
+import collections
+import logging
+import re
+import zlib
+
+from channels.exceptions import InvalidChannelLayerError
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+# Channel layers only accept group names of these characters, shorter than 100
+INVALID_GROUP_CHARACTERS = re.compile(r'[^a-z0-9\-_.]')
+MAX_GROUP_NAME_LENGTH = 99
+
+DEFAULT_GROUP_PREFIX = 'irc'
+
+
+def get_shard(key, shards):
+    """
+    Which of `shards` a key (such as a nickname) belongs to.  Stable across processes
+    """
+    return zlib.crc32(key.lower().encode('utf-8')) % shards
+
+
+def group_name(channel, prefix=DEFAULT_GROUP_PREFIX, shard=None):
+    """
+    The channel layer group for an IRC channel, e.g. `irc.django` for `#django`, or
+    `irc.django.2` for its shard 2.  Characters groups can't contain are replaced
+    with `_`, and long names are shortened with a checksum of the channel name
+    """
+    name = INVALID_GROUP_CHARACTERS.sub('_', channel.lower().lstrip('#'))
+    suffix = '.{}'.format(shard) if shard is not None else ''
+    group = '{}.{}{}'.format(prefix, name, suffix)
+
+    if len(group) > MAX_GROUP_NAME_LENGTH:
+        checksum = '{:08x}'.format(zlib.crc32(channel.lower().encode('utf-8')))
+        keep = MAX_GROUP_NAME_LENGTH - len(prefix) - len(suffix) - len(checksum) - 2
+        group = '{}.{}_{}{}'.format(prefix, name[:keep], checksum, suffix)
+
+    return group
+
+
+def is_channel(target):
+    return bool(target) and target[0] in '#&+!'
+
+
+class GroupPublisher:
+    """
+    Sends `irc.receive` messages for IRC channels to a channel layer group per channel,
+    so any number of consumers can share the work.  With `shards`, each channel is
+    split into that many groups by the nickname of the sender.  Messages are sent
+    one at a time, so they reach each group in order
+    """
+    def __init__(self, loop, channel_layer=None, prefix=DEFAULT_GROUP_PREFIX, shards=0):
+        self.loop = loop
+        self.channel_layer = channel_layer if channel_layer is not None else get_channel_layer()
+        self.prefix = prefix
+        self.shards = shards
+
+        if self.channel_layer is None:
+            raise InvalidChannelLayerError('Group fan-out requires a configured channel layer')
+
+        self.pending = collections.deque()
+        self.published = 0
+        self._task = None
+
+    def get_group(self, msg):
+        """
+        The group for a message, or None if it isn't for an IRC channel
+        """
+        channel = msg.get('channel')
+
+        if not isinstance(channel, str) or not is_channel(channel):
+            return None
+
+        shard = None
+        if self.shards:
+            shard = get_shard(msg.get('user') or '', self.shards)
+
+        return group_name(channel, prefix=self.prefix, shard=shard)
+
+    def publish(self, msg):
+        """
+        Queues a message to be sent to its group.  Returns False if the message has
+        no group, so it should go to the application instance instead
+        """
+        group = self.get_group(msg)
+
+        if group is None:
+            return False
+
+        # Channel layers serialize messages, so compact messages and lazily decoded
+        # tags become dicts
+        if msg.get('tags') is not None:
+            msg = dict(msg, tags=dict(msg['tags']))
+        elif type(msg) is not dict:
+            msg = dict(msg)
+
+        self.pending.append((group, msg))
+
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._drain())
+
+        return True
+
+    async def _drain(self):
+        while self.pending:
+            group, msg = self.pending.popleft()
+
+            try:
+                await self.channel_layer.group_send(group, msg)
+            except Exception:
+                logger.exception('Failed to send message to group {}'.format(group))
+            else:
+                self.published += 1
+
+    def stats(self):
+        return {
+            'pending': len(self.pending),
+            'published': self.published,
+        }
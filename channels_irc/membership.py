@@ -0,0 +1,122 @@
+# Prefixes of channel members' nicknames in NAMES replies, for their channel modes
+MEMBER_PREFIXES = '~&@%+'
+
+DEFAULT_MAX_MEMBERS = 10000
+
+
+def split_prefix(name):
+    """
+    Splits a name from a NAMES reply into its mode prefixes and nickname
+    """
+    nick = name.lstrip(MEMBER_PREFIXES)
+    return name[:len(name) - len(nick)], nick
+
+
+class MembershipCache:
+    """
+    Members of the channels a connection is in, kept up to date from JOIN, PART, QUIT,
+    KICK, NICK and NAMES replies.  Only joined channels are tracked, and each is
+    limited to `max_members` members, past which new members are ignored and the
+    channel is marked as `truncated`.  Channel names and nicknames are matched
+    case-insensitively
+    """
+    def __init__(self, max_members=DEFAULT_MAX_MEMBERS):
+        self.max_members = max_members
+
+        # channel: {nick key: (nick, prefixes)}
+        self.channels = {}
+        # channel: members collected from NAMES replies so far
+        self.pending_names = {}
+        self.truncated = set()
+
+    def _add(self, channel, members, nick, prefixes=''):
+        key = nick.lower()
+
+        if key not in members and self.max_members and len(members) >= self.max_members:
+            self.truncated.add(channel)
+            return
+
+        members[key] = (nick, prefixes)
+
+    def track(self, channel):
+        """
+        Starts tracking a channel, once joined
+        """
+        self.channels.setdefault(channel.lower(), {})
+
+    def forget(self, channel):
+        """
+        Stops tracking a channel, once left
+        """
+        channel = channel.lower()
+        self.channels.pop(channel, None)
+        self.pending_names.pop(channel, None)
+        self.truncated.discard(channel)
+
+    def joined(self, channel, nick):
+        members = self.channels.get(channel.lower())
+
+        if members is not None:
+            self._add(channel.lower(), members, nick)
+
+    def left(self, channel, nick):
+        members = self.channels.get(channel.lower())
+
+        if members is not None:
+            members.pop(nick.lower(), None)
+
+    def quit(self, nick):
+        key = nick.lower()
+
+        for members in self.channels.values():
+            members.pop(key, None)
+
+    def nick_changed(self, old, new):
+        key = old.lower()
+
+        for members in self.channels.values():
+            member = members.pop(key, None)
+            if member is not None:
+                members[new.lower()] = (new, member[1])
+
+    def add_names(self, channel, names):
+        """
+        Collects the members from a NAMES reply.  They replace the channel's members
+        once the reply ends
+        """
+        channel = channel.lower()
+
+        if channel not in self.channels:
+            return
+
+        if channel not in self.pending_names:
+            self.truncated.discard(channel)
+
+        members = self.pending_names.setdefault(channel, {})
+        for name in names:
+            prefixes, nick = split_prefix(name)
+            if nick:
+                self._add(channel, members, nick, prefixes)
+
+    def end_names(self, channel):
+        channel = channel.lower()
+        members = self.pending_names.pop(channel, None)
+
+        if members is not None and channel in self.channels:
+            self.channels[channel] = members
+
+    def members(self, channel):
+        """
+        `{nick: prefixes}` of the channel's members, or None if it isn't tracked
+        """
+        members = self.channels.get(channel.lower())
+
+        if members is None:
+            return None
+
+        return dict(members.values())
+
+    def reset(self):
+        self.channels = {}
+        self.pending_names = {}
+        self.truncated = set()
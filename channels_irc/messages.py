@@ -0,0 +1,60 @@
+import sys
+from collections.abc import Mapping
+
+RECEIVE = 'irc.receive'
+
+# Keys an `IrcMessage` can hold, besides `type`
+MESSAGE_KEYS = ('command', 'channel', 'user', 'body', 'tags', 'connection', 'received_at', 'seq')
+
+_UNSET = object()
+
+
+class IrcMessage(Mapping):
+    """
+    Compact `irc.receive` message.  Behaves like the equivalent dict for reading,
+    but keeps its values in slots rather than a per-message hash table, and interns
+    the command and channel, which repeat across messages.  Keys that weren't given
+    are missing, as they would be from the dict.  Only `MESSAGE_KEYS` can be set
+    """
+    __slots__ = MESSAGE_KEYS
+
+    def __init__(self, command, channel=_UNSET, user=_UNSET, body=_UNSET, tags=_UNSET):
+        self.command = sys.intern(command)
+        if channel is not _UNSET:
+            self.channel = sys.intern(channel) if type(channel) is str else channel
+        if user is not _UNSET:
+            self.user = user
+        if body is not _UNSET:
+            self.body = body
+        if tags is not _UNSET:
+            self.tags = tags
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return RECEIVE
+
+        if key in MESSAGE_KEYS:
+            value = getattr(self, key, _UNSET)
+            if value is not _UNSET:
+                return value
+
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in MESSAGE_KEYS:
+            raise KeyError(key)
+
+        setattr(self, key, value)
+
+    def __iter__(self):
+        yield 'type'
+
+        for key in MESSAGE_KEYS:
+            if hasattr(self, key):
+                yield key
+
+    def __len__(self):
+        return 1 + sum(1 for key in MESSAGE_KEYS if hasattr(self, key))
+
+    def __repr__(self):
+        return 'IrcMessage({!r})'.format(dict(self))
@@ -0,0 +1,191 @@
+import logging
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+# Consumer messages are usually handled in microseconds, so the default buckets
+# (5ms to 10s) would put almost every observation in the first one
+CONSUMER_MESSAGE_BUCKETS = (
+    .00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .1, 1,
+)
+
+
+class NullConnectionMetrics:
+    """
+    Metrics for a single connection that record nothing.  Used when metrics are off
+    """
+    def event(self, event_type):
+        pass
+
+    def application_message(self):
+        pass
+
+    def consumer_message(self, message_type, duration):
+        pass
+
+    def reconnect(self):
+        pass
+
+    def line_sent(self):
+        pass
+
+    def track_queue(self, queue):
+        pass
+
+    def track_scheduler(self, scheduler):
+        pass
+
+
+NULL_CONNECTION_METRICS = NullConnectionMetrics()
+
+
+class NullMetrics:
+    def connection(self, key):
+        return NULL_CONNECTION_METRICS
+
+
+NULL_METRICS = NullMetrics()
+
+
+class ConnectionMetrics:
+    """
+    Metrics for a single connection.  Labelled children are cached, so recording a
+    value costs a dict lookup and an increment
+    """
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+        self._events = {}
+        self._consumer_messages = {}
+        self._application_messages = metrics.application_messages.labels(key)
+        self._reconnects = metrics.reconnects.labels(key)
+        self._lines_sent = metrics.lines_sent.labels(key)
+
+    def event(self, event_type):
+        try:
+            counter = self._events[event_type]
+        except KeyError:
+            counter = self._events[event_type] = self.metrics.events.labels(self.key, event_type)
+        counter.inc()
+
+    def application_message(self):
+        self._application_messages.inc()
+
+    def consumer_message(self, message_type, duration):
+        try:
+            histogram = self._consumer_messages[message_type]
+        except KeyError:
+            histogram = self._consumer_messages[message_type] = self.metrics.consumer_messages.labels(
+                self.key, message_type
+            )
+        histogram.observe(duration)
+
+    def reconnect(self):
+        self._reconnects.inc()
+
+    def line_sent(self):
+        self._lines_sent.inc()
+
+    def track_queue(self, queue):
+        """
+        Reports the size and overflow counters of an `ApplicationQueue`.  The values
+        are read when metrics are scraped, so this adds nothing to the hot path
+        """
+        self.metrics.queue_depth.labels(self.key).set_function(queue.qsize)
+        self.metrics.queue_dropped.labels(self.key).set_function(lambda: queue.dropped)
+        self.metrics.queue_coalesced.labels(self.key).set_function(lambda: queue.coalesced)
+
+    def track_scheduler(self, scheduler):
+        """
+        Reports the number of lines waiting in an `OutboundScheduler`, read when
+        metrics are scraped
+        """
+        self.metrics.outbound_queue_depth.labels(self.key).set_function(lambda: scheduler.stats()['queued'])
+
+
+class Metrics:
+    """
+    Prometheus metrics for the interface server, labelled by connection key
+    (`SERVER:NICKNAME`).  Requires the `prometheus_client` package
+    """
+    def __init__(self, registry=None, prefix='channels_irc'):
+        if prometheus_client is None:
+            raise ImportError(
+                'Metrics require the prometheus_client package. '
+                'Install it with `pip install channels_irc[metrics]`'
+            )
+
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+
+        def name(metric):
+            return '{}_{}'.format(prefix, metric)
+
+        self.events = prometheus_client.Counter(
+            name('irc_events'), 'IRC events received',
+            ['connection', 'event'], registry=registry,
+        )
+        self.application_messages = prometheus_client.Counter(
+            name('application_messages'), 'Messages sent to the application',
+            ['connection'], registry=registry,
+        )
+        self.consumer_messages = prometheus_client.Histogram(
+            name('consumer_message_seconds'), 'Time spent handling messages from the consumer',
+            ['connection', 'type'], registry=registry, buckets=CONSUMER_MESSAGE_BUCKETS,
+        )
+        self.reconnects = prometheus_client.Counter(
+            name('reconnects'), 'Reconnection attempts',
+            ['connection'], registry=registry,
+        )
+        self.lines_sent = prometheus_client.Counter(
+            name('irc_lines_sent'), 'Lines written to the IRC server',
+            ['connection'], registry=registry,
+        )
+        self.outbound_queue_depth = prometheus_client.Gauge(
+            name('outbound_queue_depth'), 'Lines waiting for the outbound rate limits',
+            ['connection'], registry=registry,
+        )
+        self.queue_depth = prometheus_client.Gauge(
+            name('application_queue_depth'), 'Messages waiting to be received by the application',
+            ['connection'], registry=registry,
+        )
+        self.queue_dropped = prometheus_client.Gauge(
+            name('application_queue_dropped'), 'Messages dropped because the application queue was full',
+            ['connection'], registry=registry,
+        )
+        self.queue_coalesced = prometheus_client.Gauge(
+            name('application_queue_coalesced'), 'Messages coalesced because the application queue was full',
+            ['connection'], registry=registry,
+        )
+
+        self._connections = {}
+
+    def connection(self, key):
+        """
+        Returns the `ConnectionMetrics` for `key`.  Reconnects of the same key share
+        their metrics
+        """
+        metrics = self._connections.get(key)
+
+        if metrics is None:
+            metrics = self._connections[key] = ConnectionMetrics(self, key)
+
+        return metrics
+
+
+def start_metrics_server(port, address=''):
+    """
+    Starts the HTTP exporter for Prometheus on `address`:`port`
+    """
+    if prometheus_client is None:
+        raise ImportError(
+            'Metrics require the prometheus_client package. '
+            'Install it with `pip install channels_irc[metrics]`'
+        )
+
+    logger.info('Serving metrics on {}:{}'.format(address or '0.0.0.0', port))
+    prometheus_client.start_http_server(port, addr=address)
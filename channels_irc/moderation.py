@@ -0,0 +1,314 @@
+import asyncio
+import collections
+import logging
+import re
+
+from .consumers import AsyncIrcConsumer
+
+logger = logging.getLogger(__name__)
+
+
+# Characters that are special outside of a character class
+SPECIAL_CHARACTERS = '.^$*+?{}[]()|'
+QUANTIFIERS = '*+?{'
+INLINE_FLAGS = 'aiLmsux'
+ESCAPES_WITH_ARGUMENTS = 'xuUN'
+
+# `str.casefold` keeps the dotless i, and gives the dotted capital I a combining dot,
+# while `re.IGNORECASE` treats both as `i`
+RE_CASE_FIXES = str.maketrans({'\u0130': 'i', '\u0131': 'i'})
+
+
+def fold_case(text):
+    """
+    Case folds `text` so that characters `re.IGNORECASE` treats as equal fold the
+    same way, and a regex's literal is found in every text it matches
+    """
+    return text.translate(RE_CASE_FIXES).casefold()
+
+
+def required_literal(pattern):
+    """
+    The longest run of literal characters every match of the regex `pattern`
+    contains, or None if one can't be found.  Only characters outside of groups and
+    character classes are considered, and patterns with alternatives, inline flags
+    or escapes taking arguments (octal, hex, unicode, named, backreferences) have
+    none
+    """
+    runs = []
+    run = ''
+    depth = 0
+    index = 0
+
+    while index < len(pattern):
+        char = pattern[index]
+
+        if char == '\\':
+            escaped = pattern[index + 1:index + 2]
+            index += 2
+            if escaped.isdigit() or escaped in ESCAPES_WITH_ARGUMENTS:
+                # Octal, hex, unicode and named escapes (and backreferences) go on
+                # past this character, so the literal text can't be told apart
+                return None
+            if depth or not escaped or escaped.isalnum():
+                runs.append(run)
+                run = ''
+            else:
+                run += escaped
+            continue
+
+        if char == '|':
+            return None
+
+        if char == '(':
+            if pattern[index + 1:index + 2] == '?' and pattern[index + 2:index + 3] in INLINE_FLAGS:
+                return None
+            depth += 1
+            runs.append(run)
+            run = ''
+        elif char == ')':
+            depth -= 1
+            runs.append(run)
+            run = ''
+        elif char == '[':
+            # Skip the class, including a `]` first in it
+            index = pattern.find(']', index + 2 if pattern[index + 1:index + 2] != '^' else index + 3)
+            if index == -1:
+                return None
+            while pattern[index - 1] == '\\':
+                index = pattern.find(']', index + 1)
+                if index == -1:
+                    return None
+            runs.append(run)
+            run = ''
+        elif char in QUANTIFIERS:
+            # The quantified character is optional or repeated
+            runs.append(run[:-1])
+            run = ''
+            if char == '{' and '}' in pattern[index:]:
+                index = pattern.index('}', index)
+        elif depth or char in SPECIAL_CHARACTERS:
+            runs.append(run)
+            run = ''
+        else:
+            run += char
+
+        index += 1
+
+    runs.append(run)
+    return max(runs, key=len) or None
+
+
+class Rule:
+    """
+    A moderation rule: a phrase a message must not contain, or, with `regex`, a
+    regular expression it must not match
+    """
+    __slots__ = ('name', 'pattern', 'regex')
+
+    def __init__(self, name, pattern, regex=False):
+        if not pattern:
+            raise ValueError('Moderation rule {} has an empty pattern'.format(name))
+
+        self.name = name
+        self.pattern = pattern
+        self.regex = regex
+
+    def __repr__(self):
+        return 'Rule({!r}, {!r}, regex={!r})'.format(self.name, self.pattern, self.regex)
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton, finding which of a list of words occur in a text in a
+    single pass over the text, however many words there are
+    """
+    def __init__(self, words):
+        # Per node: its transitions, the node for its longest proper suffix, and the
+        # indexes of the words ending there
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+
+        for index, word in enumerate(words):
+            node = 0
+            for char in word:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][char] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = child
+            self.output[node] += (index,)
+
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+
+                suffix = self.fail[node]
+                while suffix and char not in self.goto[suffix]:
+                    suffix = self.fail[suffix]
+                self.fail[child] = self.goto[suffix].get(char, 0)
+                self.output[child] += self.output[self.fail[child]]
+
+    def search(self, text):
+        """
+        Indexes of the words found in `text`
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+
+        return found
+
+
+class RuleSet:
+    """
+    Compiled moderation rules.  Phrases, and the literal text each regex requires
+    (see `required_literal`), are matched with one `AhoCorasick` automaton, so
+    matching a message costs a single pass over it rather than one per rule.  A
+    regex is only searched for once its literal is found; regexes without one are
+    searched for in every message.  (Python's `re` tries every branch of a combined
+    pattern at each position, which is slower than this for large rule sets)
+    """
+    def __init__(self, rules, ignore_case=True):
+        self.rules = list(rules)
+        self.ignore_case = ignore_case
+
+        # word index: rule, and its compiled regex (or None, for phrases)
+        self.word_rules = []
+        # regexes searched for in every message
+        self.unfiltered = []
+        words = []
+
+        for rule in self.rules:
+            if rule.regex:
+                try:
+                    regex = re.compile(rule.pattern, re.IGNORECASE if ignore_case else 0)
+                except re.error as e:
+                    raise ValueError('Invalid moderation rule {}: {}'.format(rule.name, e))
+
+                word = required_literal(rule.pattern)
+                if word is None:
+                    self.unfiltered.append((rule, regex))
+                    continue
+            else:
+                regex = None
+                word = rule.pattern
+
+            words.append(fold_case(word) if ignore_case else word)
+            self.word_rules.append((rule, regex))
+
+        self.automaton = AhoCorasick(words) if words else None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, text):
+        """
+        Rules matched by `text`, in the order they were given
+        """
+        matched = set()
+
+        if self.automaton is not None:
+            for index in self.automaton.search(fold_case(text) if self.ignore_case else text):
+                rule, regex = self.word_rules[index]
+                if regex is None or regex.search(text):
+                    matched.add(rule)
+
+        for rule, regex in self.unfiltered:
+            if regex.search(text):
+                matched.add(rule)
+
+        if not matched:
+            return []
+
+        return [rule for rule in self.rules if rule in matched]
+
+
+class ModerationIrcConsumer(AsyncIrcConsumer):
+    """
+    IRC consumer matching every message against a set of moderation rules, passing
+    messages that match to `on_violation` and the others to `on_allowed`.  The
+    rules from `get_rules` are compiled into a `RuleSet` on the first message, and
+    again with `reload_rules`, which swaps them in once compiled
+    """
+    moderation_rules = []
+    ignore_case = True
+
+    irc_hooks = AsyncIrcConsumer.irc_hooks | {'violation', 'allowed'}
+
+    rule_set = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # rule name: messages matched, kept across reloads
+        self.rule_hits = collections.Counter()
+
+    async def get_rules(self):
+        """
+        The `Rule`s to moderate with.  Override to load them from elsewhere
+        """
+        return self.moderation_rules
+
+    async def reload_rules(self):
+        """
+        Compiles the rules from `get_rules` in an executor, and swaps them in.
+        Messages are matched against the previous rules until they are ready
+        """
+        rules = await self.get_rules()
+        rule_set = await asyncio.get_event_loop().run_in_executor(
+            None, RuleSet, rules, self.ignore_case,
+        )
+        self.rule_set = rule_set
+        logger.info('Loaded {} moderation rules'.format(len(rule_set)))
+
+    async def irc_moderation_reload(self, message):
+        """
+        Reloads the rules in the background, so messages keep being handled while
+        they compile.  Send an `irc.moderation.reload` message (e.g. to a group of
+        moderation consumers) to trigger it
+        """
+        asyncio.ensure_future(self._reload_in_background())
+
+    async def _reload_in_background(self):
+        try:
+            await self.reload_rules()
+        except Exception:
+            logger.exception('Failed to reload moderation rules, keeping the previous ones')
+
+    async def on_message(self, channel, user, body):
+        if self.rule_set is None:
+            await self.reload_rules()
+
+        rules = self.rule_set.match(body or '')
+
+        if rules:
+            for rule in rules:
+                self.rule_hits[rule.name] += 1
+            await self.on_violation(channel, user, body, rules)
+        else:
+            await self.on_allowed(channel, user, body)
+
+    async def on_violation(self, channel, user, body, rules):
+        """
+        Hook for handling a message that matched `rules`
+        """
+        pass
+
+    async def on_allowed(self, channel, user, body):
+        """
+        Hook for handling a message that matched no rules
+        """
+        pass
@@ -1,25 +1,108 @@
 import asyncio
+import collections
+import logging
+import time
 
 from .client import ChannelsIRCClient
-from .server import BaseServer
+from .connection import IrcReactor
+from .groups import DEFAULT_GROUP_PREFIX
+from .membership import DEFAULT_MAX_MEMBERS
+from .metrics import NULL_METRICS
+from .reconnect import ReconnectScheduler
+from .server import BaseServer, DROP_OLDEST
+
+logger = logging.getLogger(__name__)
+
+# Connections opened at once by an `irc.multi.connect.bulk` message, by default
+DEFAULT_CONNECT_CONCURRENCY = 10
+
+# Keys an `irc.multi.connect.bulk` connection spec must have
+REQUIRED_SPEC_KEYS = ('server', 'port', 'nickname')
 
 
 class MultiConnectionClient(BaseServer):
-    def __init__(self, application, autoreconnect=False, reconnect_delay=60, loop=None):
+    def __init__(
+        self, application, autoreconnect=False, reconnect_delay=60, loop=None,
+        queue_size=0, overflow_policy=DROP_OLDEST, send_rate=0, send_burst=1,
+        target_send_rate=0, target_send_burst=1, join_window=0, forward_events=None,
+        ignore_events=None, reconnect_max_delay=600, max_concurrent_connects=0,
+        message_tags=False, tag_whitelist=None, metrics=None, batch_window=0, batch_size=100,
+        raw=False, group_fanout=False, group_prefix=DEFAULT_GROUP_PREFIX, group_shards=0,
+        pool_idle_time=0, pool_size=0, shared=False, compact_messages=False, trace_messages=False,
+        connect_concurrency=DEFAULT_CONNECT_CONCURRENCY, track_members=False,
+        max_channel_members=DEFAULT_MAX_MEMBERS, rejoin=False, subscription_store=None,
+    ):
         self.application = application
         self.autoreconnect = autoreconnect
         self.reconnect_delay = reconnect_delay
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_rate = send_rate
+        self.send_burst = send_burst
+        self.target_send_rate = target_send_rate
+        self.target_send_burst = target_send_burst
+        self.join_window = join_window
+        self.forward_events = forward_events
+        self.ignore_events = ignore_events
+        self.message_tags = message_tags
+        self.tag_whitelist = tag_whitelist
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.raw = raw
+        self.group_fanout = group_fanout
+        self.group_prefix = group_prefix
+        self.group_shards = group_shards
+        self.pool_idle_time = pool_idle_time
+        self.pool_size = pool_size
+        self.compact_messages = compact_messages
+        self.trace_messages = trace_messages
+        self.connect_concurrency = connect_concurrency
+        self.track_members = track_members
+        self.max_channel_members = max_channel_members
+        self.rejoin = rejoin
+        self.subscription_store = subscription_store
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.connection_metrics = self.metrics.connection('multi')
 
         self.loop = loop if loop is not None else asyncio.get_event_loop()
 
+        # With `shared`, every connection uses this reactor, which routes events to
+        # the connection's client, and sends its messages to the `irc.multi`
+        # application instance, with the connection's key
+        self.shared = shared
+        self.reactor = None
+        self.clients = {}
+        if shared:
+            self.reactor = IrcReactor(loop=self.loop)
+            self.reactor.add_global_handler('all_events', self._dispatcher, -10)
+
+        # Shared by every connection, so reconnects are spread out and capped across
+        # all of them
+        self.reconnect_scheduler = ReconnectScheduler(
+            self.loop, base_delay=reconnect_delay, max_delay=reconnect_max_delay,
+            max_concurrent=max_concurrent_connects,
+        )
+
         # dictionary of 'SERVER:NICKNAME': ChannelsIRCClient
         self.connections = {}
 
+        # Connections kept open after being removed, oldest first, as
+        # 'SERVER:NICKNAME': (ChannelsIRCClient, expiry handle)
+        self.idle = collections.OrderedDict()
+
+        # Background tasks, referenced until done so they aren't garbage collected
+        self._tasks = set()
+
+        self.start_application()
+
+    def start_application(self):
+        """
+        Creates the `irc.multi` application instance, and sends it `irc.multi.init`
+        """
         self.create_application(
             scope={'type': 'irc.multi'}, from_consumer=self.from_consumer
         )
         self.send_init()
-        self.loop.call_later(1, self.futures_checker)
 
     def start(self):
         self.loop.run_forever()
@@ -40,63 +123,341 @@ class MultiConnectionClient(BaseServer):
         if 'type' not in message:
             raise ValueError('Message has no type defined')
 
-        elif message['type'] == 'irc.multi.connect':
+        started = time.perf_counter()
+        await self.handle_consumer_message(message)
+        self.connection_metrics.consumer_message(message['type'], time.perf_counter() - started)
+
+    async def handle_consumer_message(self, message):
+        """
+        Routes a message from the consumer to the method that handles its type
+        """
+        if message['type'] == 'irc.multi.connect':
             await self.create_connection(**message)
 
+        elif message['type'] == 'irc.multi.connect.bulk':
+            # Run in the background, so the consumer isn't held up until every
+            # connection is open
+            self.create_task(
+                self.create_connections(message['connections'], message.get('concurrency'))
+            )
+
         elif message['type'] == 'irc.multi.disconnect':
             await self.remove_connection(message['server'], message['nickname'])
 
+        elif message['type'] == 'irc.multi.status':
+            self.send_status()
+
+        elif message['type'] == 'irc.multi.members':
+            self.send_members(message['server'], message['nickname'], message['channel'])
+
+        elif message['type'] == 'irc.send':
+            connection = self.connections.get(message.get('connection'))
+
+            if connection is None:
+                logger.warning('Dropping command for unknown connection {}'.format(
+                    message.get('connection')
+                ))
+            else:
+                await connection.from_consumer(message)
+
         else:
             raise ValueError("Cannot handle message type %s!" % message["type"])
 
+    def create_task(self, coro):
+        """
+        Runs `coro` in the background, keeping a reference to it until it is done
+        """
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _send_shared_msg(self, msg):
+        return self.application_queue.put_message(msg)
+
+    def pause_reading(self):
+        """
+        With shared connections, every connection feeds the `irc.multi` application
+        queue, so all of them stop reading while it is full
+        """
+        for client in self.clients.values():
+            client.pause_reading()
+
+    def resume_reading(self):
+        for client in self.clients.values():
+            client.resume_reading()
+
+    def _dispatcher(self, connection, event):
+        """
+        Routes events from the shared reactor to the connection's client
+        """
+        client = self.clients.get(connection)
+
+        if client is not None:
+            client._dispatcher(connection, event)
+
+    def get_status(self):
+        """
+        Connection and reconnection state of every connection, including idle ones
+        """
+        status = {
+            key: {
+                'connected': connection.connected,
+                'reconnect': self.reconnect_scheduler.status(connection),
+            }
+            for key, connection in self.connections.items()
+        }
+
+        for key, (connection, _) in self.idle.items():
+            status[key] = {
+                'connected': connection.connected,
+                'reconnect': self.reconnect_scheduler.status(connection),
+                'idle': True,
+            }
+
+        return status
+
+    def send_status(self):
+        """
+        Sends the connection and reconnection state of every connection
+        """
+        self._send_application_msg({
+            'type': 'irc.multi.status',
+            'connections': self.get_status(),
+        })
+
     def get_connection_key(self, server, nickname):
         """
         cretes the key for a connection in `self.connections`
         """
         return '{}:{}'.format(server, nickname)
 
-    async def create_connection(self, server, port, nickname, **kwargs):
+    async def create_connection(self, server, port, nickname, idle=False, **kwargs):
         """
         Create an instance of `ChannelsIRCClient`, and store it in self.connections
         under the key of `SERVER:NICKNAME`.  To ensure idempotency, it first checks
         whether the connection exists and is already connected before attempt to
-        start a new connection
+        start a new connection.  Idle connections from the pool, and connections that
+        were lost, are reused rather than rebuilt.  With `idle`, the connection is
+        created straight into the pool, to be used later
         """
         key = self.get_connection_key(server, nickname)
         connection = self.connections.get(key, None)
 
-        if connection is None or not connection.connected:
-            client = ChannelsIRCClient(
+        if connection is None and key in self.idle:
+            connection, handle = self.idle.pop(key)
+            if handle is not None:
+                handle.cancel()
+
+            if connection.connected:
+                if idle:
+                    # Already warm; keep it in the pool, with a fresh idle timer
+                    self._add_idle(key, connection)
+                else:
+                    self.connections[key] = connection
+                    connection.activate()
+                return
+
+        if connection is not None and connection.connected:
+            return
+
+        if connection is None:
+            connection = ChannelsIRCClient(
                 self.application, autoreconnect=self.autoreconnect,
-                reconnect_delay=self.reconnect_delay, loop=self.loop
+                reconnect_delay=self.reconnect_delay, loop=self.loop,
+                queue_size=self.queue_size, overflow_policy=self.overflow_policy,
+                send_rate=self.send_rate, send_burst=self.send_burst,
+                target_send_rate=self.target_send_rate, target_send_burst=self.target_send_burst,
+                join_window=self.join_window, forward_events=self.forward_events,
+                ignore_events=self.ignore_events, reconnect_scheduler=self.reconnect_scheduler,
+                message_tags=self.message_tags, tag_whitelist=self.tag_whitelist,
+                metrics=self.metrics, batch_window=self.batch_window, batch_size=self.batch_size,
+                raw=self.raw, group_fanout=self.group_fanout, group_prefix=self.group_prefix,
+                group_shards=self.group_shards, reactor=self.reactor,
+                application_sender=self._send_shared_msg if self.shared else None,
+                compact_messages=self.compact_messages, trace_messages=self.trace_messages,
+                track_members=self.track_members, max_channel_members=self.max_channel_members,
+                rejoin=self.rejoin, subscription_store=self.subscription_store,
             )
+            if self.shared:
+                self.clients[connection.connection] = connection
+        else:
+            # Reuse the reactor and connection of a lost connection
+            self.reconnect_scheduler.cancel(connection)
+
+        kwargs.pop('type', None)
+        connection.idle = idle
+        try:
+            await connection.connect(server, port, nickname, **kwargs)
+        except Exception:
+            if key not in self.connections:
+                await self.close_connection(connection)
+            raise
+
+        if self.shared and self.application_queue.paused:
+            connection.pause_reading()
+
+        if idle:
+            self.connections.pop(key, None)
+            self._add_idle(key, connection)
+        else:
+            self.connections[key] = connection
+
+    async def create_connections(self, specs, concurrency=None):
+        """
+        Opens a connection for each spec (the keys of an `irc.multi.connect` message),
+        at most `concurrency` at a time, and sends the result of each to the application
+        as an `irc.multi.connect.result` message
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.connect_concurrency)
+
+        async def connect(spec):
+            async with semaphore:
+                await self._connect_spec(spec)
+
+        await asyncio.gather(*[connect(spec) for spec in self.valid_specs(specs)])
+
+    def valid_specs(self, specs):
+        """
+        The specs of `specs` with every required key.  A failed result is sent for
+        each of the others
+        """
+        valid = []
+
+        for spec in specs:
+            missing = [key for key in REQUIRED_SPEC_KEYS if spec.get(key) is None]
+
+            if missing:
+                error = 'Connection spec is missing {}'.format(', '.join(missing))
+                logger.warning('Bulk connection to {} with user {} failed: {}'.format(
+                    spec.get('server'), spec.get('nickname'), error
+                ))
+                self.send_connect_result(spec.get('server'), spec.get('nickname'), False, error)
+            else:
+                valid.append(spec)
+
+        return valid
+
+    async def _connect_spec(self, spec):
+        spec = dict(spec)
+        spec.pop('type', None)
+        error = None
+
+        # Also count towards the limit on concurrent reconnects
+        semaphore = self.reconnect_scheduler.semaphore
+        if semaphore is not None:
+            await semaphore.acquire()
+
+        try:
+            await self.create_connection(**spec)
+        except Exception as e:
+            logger.warning('Bulk connection to {} with user {} failed: {}'.format(
+                spec.get('server'), spec.get('nickname'), e
+            ))
+            error = str(e) or type(e).__name__
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+        key = self.get_connection_key(spec['server'], spec['nickname'])
+        connection = self.connections.get(key) or self.idle.get(key, (None,))[0]
 
-            kwargs.pop('type')
-            await client.connect(server, port, nickname, **kwargs)
+        self.send_connect_result(
+            spec['server'], spec['nickname'], connection is not None and connection.connected, error,
+        )
+
+    def send_connect_result(self, server, nickname, connected, error=None):
+        self.send_reply({
+            'type': 'irc.multi.connect.result',
+            'server': server,
+            'nickname': nickname,
+            'connected': connected,
+            'error': error,
+        })
 
-            self.connections[key] = client
+    def send_reply(self, msg):
+        """
+        Sends the reply to a request from the consumer (a connection result from
+        `create_connections`, or `members`) to the application
+        """
+        self._send_application_msg(msg)
+
+    def send_members(self, server, nickname, channel):
+        """
+        Sends the cached members of a channel of a connection, or None if the
+        connection doesn't exist or doesn't track the channel
+        """
+        connection = self.connections.get(self.get_connection_key(server, nickname))
+
+        self.send_reply({
+            'type': 'irc.multi.members',
+            'server': server,
+            'nickname': nickname,
+            'channel': channel,
+            'members': connection.get_members(channel) if connection is not None else None,
+        })
 
     async def remove_connection(self, server, nickname):
         """
-        Shuts down the connection, clean up tasks, remove from self.connections
+        Removes the connection from self.connections.  If pooling is enabled, a
+        connected connection is kept open in the pool, otherwise it is shut down
         """
         key = self.get_connection_key(server, nickname)
 
-        connection = self.connections.get(key)
+        connection = self.connections.pop(key, None)
+
+        if connection is None:
+            return
 
-        if connection is not None:
-            connection.disconnect()
+        if self.pool_idle_time and connection.connected:
+            connection.deactivate()
+            self._add_idle(key, connection)
+        else:
+            await self.close_connection(connection)
+
+    def _add_idle(self, key, connection):
+        """
+        Adds a connection to the pool until `pool_idle_time` passes (or until it is
+        used, without a `pool_idle_time`), closing the oldest idle connection if the
+        pool is full
+        """
+        handle = None
+        if self.pool_idle_time:
+            handle = self.loop.call_later(self.pool_idle_time, self._expire_idle, key)
+        self.idle[key] = (connection, handle)
 
-            if not connection.application_instance.done():
-                connection.application_instance.cancel()
-                await asyncio.wait([connection.application_instance])
+        while self.pool_size and len(self.idle) > self.pool_size:
+            oldest = next(iter(self.idle))
+            if self.idle[oldest][1] is not None:
+                self.idle[oldest][1].cancel()
+            self._expire_idle(oldest)
 
-            self.connections.pop(key, None)
-            connection = None
+    def _expire_idle(self, key):
+        connection, _ = self.idle.pop(key)
+        logger.info('Closing idle connection {}'.format(key))
+        self.create_task(self.close_connection(connection))
+
+    async def close_connection(self, connection):
+        """
+        Shuts down a connection, and its application instance
+        """
+        connection.disconnect(reconnect=False)
+        self.clients.pop(connection.connection, None)
+
+        if self.shared:
+            # Otherwise the shared reactor keeps the connection, and its client
+            connection.connection.close()
+
+        await connection.stop_application()
 
     def disconnect(self):
         """
-        Disconnect from all active connections
+        Disconnect from all active and idle connections
         """
         for connection in self.connections.values():
-            connection.disconnect()
+            connection.disconnect(reconnect=False)
+
+        for connection, handle in self.idle.values():
+            if handle is not None:
+                handle.cancel()
+            connection.disconnect(reconnect=False)
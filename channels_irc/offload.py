@@ -0,0 +1,132 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .consumers import AsyncIrcConsumer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OFFLOAD_WORKERS = 4
+DEFAULT_MAX_PENDING = 100
+
+
+class OffloadedHandler:
+    """
+    An `on_<command>` handler run in the consumer's `offload_executor`, rather than
+    on the event loop.  Created with `offload`
+    """
+    def __init__(self, func):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.command = None
+
+    def __set_name__(self, owner, name):
+        if name.startswith('on_'):
+            self.command = name[3:]
+
+    def __call__(self, consumer, **kwargs):
+        if not isinstance(consumer, OffloadIrcConsumer):
+            raise TypeError('Offloaded handlers can only be used on an OffloadIrcConsumer')
+
+        return consumer.offload(self, kwargs)
+
+
+def offload(func):
+    """
+    Makes a plain function the `on_<command>` handler of an `OffloadIrcConsumer`,
+    run in the consumer's executor.  It is called with the same arguments as a
+    handler, without `self`, and its return value is passed to `on_offload_result`.
+    For process pools, the function must be defined at module level:
+
+        def classify(channel, user, body):
+            ...
+
+        class MyConsumer(OffloadIrcConsumer):
+            on_message = offload(classify)
+    """
+    return OffloadedHandler(func)
+
+
+class OffloadIrcConsumer(AsyncIrcConsumer):
+    """
+    IRC consumer whose `offload` handlers run in a thread or process pool, so CPU
+    heavy handlers don't hold up the event loop (and the IRC connection with it).
+    Messages for the same channel are handled, and their results passed to
+    `on_offload_result`, in the order they were received; messages for different
+    channels run in parallel.  Once `offload_max_pending` messages are in flight,
+    the consumer stops taking new messages until one finishes
+    """
+    # `concurrent.futures.Executor` offloaded handlers run in.  If unset, a thread
+    # pool of `offload_workers` threads is created for the class on first use
+    offload_executor = None
+    offload_workers = DEFAULT_OFFLOAD_WORKERS
+    offload_max_pending = DEFAULT_MAX_PENDING
+
+    irc_hooks = AsyncIrcConsumer.irc_hooks | {'offload_result'}
+
+    _offload_slots = None
+    _offload_tails = None
+
+    @classmethod
+    def get_offload_executor(cls):
+        if cls.offload_executor is None:
+            cls.offload_executor = ThreadPoolExecutor(
+                max_workers=cls.offload_workers, thread_name_prefix='channels-irc-offload',
+            )
+
+        return cls.offload_executor
+
+    async def offload(self, handler, kwargs):
+        """
+        Queues a message for an offloaded handler, after the previous message of its
+        channel.  Waits while `offload_max_pending` messages are in flight
+        """
+        if self._offload_slots is None:
+            self._offload_slots = asyncio.Semaphore(self.offload_max_pending)
+            # channel: task of the channel's last message
+            self._offload_tails = {}
+
+        await self._offload_slots.acquire()
+
+        channel = kwargs.get('channel')
+        task = asyncio.ensure_future(
+            self._run_offloaded(handler, kwargs, self._offload_tails.get(channel))
+        )
+        self._offload_tails[channel] = task
+        task.add_done_callback(functools.partial(self._offloaded_done, channel))
+
+    def _offloaded_done(self, channel, task):
+        self._offload_slots.release()
+
+        if self._offload_tails.get(channel) is task:
+            del self._offload_tails[channel]
+
+    async def _run_offloaded(self, handler, kwargs, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        try:
+            result = await asyncio.get_event_loop().run_in_executor(
+                self.get_offload_executor(), functools.partial(handler.func, **kwargs),
+            )
+            await self.on_offload_result(handler.command, result, **kwargs)
+        except Exception:
+            logger.exception('Offloaded {} handler failed'.format(handler.command))
+
+    async def on_offload_result(self, command, result, channel=None, user=None, body=None, **kwargs):
+        """
+        Hook for handling the return value of an offloaded handler, on the event loop
+        """
+        pass
+
+    async def wait_offloaded(self):
+        """
+        Waits until every message in flight has been handled
+        """
+        if self._offload_tails:
+            await asyncio.wait(list(self._offload_tails.values()))
+
+    async def irc_on_disconnect(self, message):
+        await self.wait_offloaded()
+        await super().irc_on_disconnect(message)
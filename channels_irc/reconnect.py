@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+CONNECTED = 'connected'
+WAITING = 'waiting'
+CONNECTING = 'connecting'
+
+
+class ReconnectState:
+    """
+    Reconnection bookkeeping for a single client
+    """
+    def __init__(self):
+        self.state = CONNECTED
+        self.attempts = 0
+        self.next_attempt = None
+        self.handle = None
+
+
+class ReconnectScheduler:
+    """
+    Schedules reconnection attempts for one or more clients.  The delay before each
+    attempt is picked at random between 0 and `base_delay * 2 ** attempts`, capped at
+    `max_delay` ("full jitter"), so that clients dropped at the same time don't all
+    reconnect at once.  `max_concurrent` limits how many connection attempts can be in
+    progress at a time across every client sharing the scheduler
+    """
+    def __init__(self, loop, base_delay=60, max_delay=600, max_concurrent=0):
+        self.loop = loop
+        self.base_delay = base_delay
+        self.max_delay = max(max_delay, base_delay)
+        self.semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+
+        self.states = {}
+
+    def get_delay(self, attempts):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempts))
+
+    def schedule(self, client):
+        """
+        Schedules a reconnection attempt for `client`, unless one is already pending
+        """
+        state = self.states.setdefault(client, ReconnectState())
+
+        if state.handle is not None or state.state == CONNECTING:
+            # An attempt is pending, or in progress and will reschedule itself if it fails
+            return
+
+        delay = self.get_delay(state.attempts)
+        state.state = WAITING
+        state.next_attempt = self.loop.time() + delay
+        state.handle = self.loop.call_later(delay, self._start_attempt, client)
+
+    def _start_attempt(self, client):
+        asyncio.ensure_future(self._attempt(client), loop=self.loop)
+
+    async def _attempt(self, client):
+        state = self.states.get(client)
+
+        if state is None:
+            return
+
+        state.handle = None
+
+        if self.semaphore is not None:
+            await self.semaphore.acquire()
+
+        try:
+            if client not in self.states:
+                # Cancelled while waiting for a slot
+                return
+
+            state.state = CONNECTING
+            state.next_attempt = None
+            state.attempts += 1
+            logger.info('Reconnection attempt {} for {}'.format(state.attempts, client))
+
+            try:
+                connected = await client.reconnect()
+            except OSError as e:
+                logger.debug('Reconnection attempt for {} failed: {}'.format(client, e))
+                connected = False
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+        if client in self.states:
+            state.state = CONNECTED if connected else WAITING
+            if not connected:
+                self.schedule(client)
+
+    def connected(self, client):
+        """
+        Resets the backoff for `client` once it has successfully registered
+        """
+        state = self.states.get(client)
+
+        if state is not None:
+            state.state = CONNECTED
+            state.attempts = 0
+            state.next_attempt = None
+
+    def cancel(self, client):
+        """
+        Stops reconnecting `client`, e.g. after it was disconnected on purpose
+        """
+        state = self.states.pop(client, None)
+
+        if state is not None and state.handle is not None:
+            state.handle.cancel()
+
+    def status(self, client):
+        """
+        Reconnection state for `client`, for reporting through `status` commands
+        """
+        state = self.states.get(client)
+
+        if state is None:
+            return {'state': CONNECTED, 'attempts': 0, 'next_attempt_in': None}
+
+        return {
+            'state': state.state,
+            'attempts': state.attempts,
+            'next_attempt_in': (
+                max(state.next_attempt - self.loop.time(), 0)
+                if state.next_attempt is not None else None
+            ),
+        }
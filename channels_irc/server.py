@@ -2,8 +2,120 @@ import asyncio
 import traceback
 import logging
 
+from .metrics import NULL_CONNECTION_METRICS
+
 logger = logging.getLogger(__name__)
 
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+COALESCE = 'coalesce'
+PAUSE = 'pause'
+
+OVERFLOW_POLICIES = [DROP_OLDEST, DROP_NEWEST, COALESCE, PAUSE]
+
+# Commands the `coalesce` policy may replace.  Others, like joins, parts and names,
+# carry state the application needs, so they are never replaced
+COALESCED_COMMANDS = {'message'}
+
+
+class ApplicationQueue(asyncio.Queue):
+    """
+    Queue of messages waiting to be received by the application instance.  When
+    `max_size` is set, `overflow_policy` decides what happens to messages that arrive
+    while the queue is full:
+
+        * `drop-oldest`: the oldest queued message is discarded
+        * `drop-newest`: the incoming message is discarded
+        * `coalesce`: an incoming chat message replaces the most recent queued chat
+          message for the same channel (falls back to `drop-oldest`)
+        * `pause`: the message is queued, and `on_pause` is called so the server can
+          stop reading from IRC.  `on_resume` is called once the queue drains to half
+          of `max_size`
+    """
+    def __init__(self, max_size=0, overflow_policy=DROP_OLDEST, on_pause=None, on_resume=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy {}'.format(overflow_policy))
+
+        # The size limit is enforced here rather than by `asyncio.Queue`, so the
+        # `pause` policy can accept the messages still in flight
+        super().__init__()
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.on_pause = on_pause
+        self.on_resume = on_resume
+
+        self.paused = False
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put_message(self, msg):
+        """
+        Adds a message to the queue, applying the overflow policy if the queue is full
+        """
+        if not self.max_size or self.qsize() < self.max_size:
+            return self.put_nowait(msg)
+
+        if self.overflow_policy == DROP_NEWEST:
+            self.dropped += 1
+
+        elif self.overflow_policy == PAUSE:
+            self.put_nowait(msg)
+            if not self.paused:
+                self.paused = True
+                if self.on_pause is not None:
+                    self.on_pause()
+
+        elif self.overflow_policy == COALESCE and self._coalesce(msg):
+            self.coalesced += 1
+
+        else:
+            self._queue.popleft()
+            self.dropped += 1
+            self.put_nowait(msg)
+
+    def _coalesce(self, msg):
+        """
+        Replaces the newest queued chat message for the same channel with `msg`.
+        Returns False if there is nothing to coalesce with
+        """
+        channel = msg.get('channel')
+        command = msg.get('command')
+
+        if channel is None or command not in COALESCED_COMMANDS:
+            return False
+
+        for index in range(len(self._queue) - 1, -1, -1):
+            queued = self._queue[index]
+            if (
+                queued.get('channel') == channel and queued.get('command') == command
+                and queued.get('type') == msg.get('type')
+            ):
+                self._queue[index] = msg
+                return True
+
+        return False
+
+    def _get(self):
+        item = super()._get()
+
+        if self.paused and self.qsize() <= self.max_size // 2:
+            self.paused = False
+            if self.on_resume is not None:
+                self.on_resume()
+
+        return item
+
+    def stats(self):
+        """
+        Current size and overflow counters for the queue
+        """
+        return {
+            'size': self.qsize(),
+            'max_size': self.max_size,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+        }
+
 
 class BaseServer:
     """
@@ -11,24 +123,45 @@ class BaseServer:
     creating an application, sending to the consumer, and application_checking/
     error handling
     """
+    queue_size = 0
+    overflow_policy = DROP_OLDEST
+    connection_metrics = NULL_CONNECTION_METRICS
 
     def _send_application_msg(self, msg):
         """
         sends a msg (serializable dict) to the appropriate Django channel
         """
-        return self.application_queue.put_nowait(msg)
+        self.connection_metrics.application_message()
+        return self.application_queue.put_message(msg)
 
     def noop_from_consumer(self, msg):
         """
         empty default for receiving from consumer
         """
 
+    def pause_reading(self):
+        """
+        Called when the application queue is full under the `pause` overflow policy.
+        Servers that read from a socket should stop reading until `resume_reading`
+        """
+
+    def resume_reading(self):
+        """
+        Called when the application queue has drained after a `pause_reading`
+        """
+
     def create_application(self, scope={}, from_consumer=noop_from_consumer):
         """
         Handles creating the ASGI application and instatiating the
         send Queue
         """
-        self.application_queue = asyncio.Queue()
+        self.application_queue = ApplicationQueue(
+            max_size=self.queue_size,
+            overflow_policy=self.overflow_policy,
+            on_pause=self.pause_reading,
+            on_resume=self.resume_reading,
+        )
+        self.connection_metrics.track_queue(self.application_queue)
         application_instance = self.application(
             scope=scope,
             receive=self.application_queue.get,
@@ -37,33 +170,48 @@ class BaseServer:
         self.application_instance = asyncio.ensure_future(
             application_instance, loop=self.loop,
         )
+        self.application_instance.add_done_callback(self.application_checker)
+
+    async def stop_application(self):
+        """
+        Cancels the application instance, if it is still running, and waits for it
+        to finish
+        """
+        instance = getattr(self, 'application_instance', None)
+
+        if instance is not None and not instance.done():
+            instance.cancel()
+            await asyncio.wait([instance])
+
+    def application_checker(self, future):
+        """
+        Done callback for the application instance.  Logs any exception raised in the
+        application, and disconnects from IRC
+        """
+        try:
+            exception = future.exception()
+        except asyncio.CancelledError:
+            # Future cancellation. We can ignore this.
+            exception = None
+
+        if exception:
+            exception_output = "{}\n{}{}".format(
+                exception,
+                "".join(traceback.format_tb(
+                    exception.__traceback__,
+                )),
+                "  {}".format(exception),
+            )
+            logger.error(
+                "Exception inside application: %s",
+                exception_output,
+            )
+
+        if future is not getattr(self, 'application_instance', None):
+            # A newer application instance has replaced this one
+            return
+
+        if exception:
+            self.disconnect()
 
-    def futures_checker(self):
-        """
-        Looks for exeptions raised in the application or irc loops
-        """
-        if getattr(self, 'application_instance', False) and self.application_instance.done():
-            try:
-                exception = self.application_instance.exception()
-            except asyncio.CancelledError:
-                # Future cancellation. We can ignore this.
-                pass
-            else:
-                if exception:
-                    exception_output = "{}\n{}{}".format(
-                        exception,
-                        "".join(traceback.format_tb(
-                            exception.__traceback__,
-                        )),
-                        "  {}".format(exception),
-                    )
-                    logger.error(
-                        "Exception inside application: %s",
-                        exception_output,
-                    )
-                    self.disconnect()
-
-                del self.application_instance
-                self.application_instance = None
-
-        self.loop.call_later(1, self.futures_checker)
+        self.application_instance = None
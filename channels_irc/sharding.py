@@ -0,0 +1,307 @@
+import asyncio
+import bisect
+import collections
+import hashlib
+import logging
+import multiprocessing
+
+from .metrics import Metrics, start_metrics_server
+from .multi import MultiConnectionClient
+from .utils import ASYNCIO, import_application, install_loop_policy
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to nodes.  Each node is placed on the ring
+    `replicas` times, so keys are spread evenly, and adding or removing a node only
+    moves the keys of that node
+    """
+    def __init__(self, nodes, replicas=100):
+        self.ring = []
+
+        for node in nodes:
+            for replica in range(replicas):
+                self.ring.append((self._hash('{}:{}'.format(node, replica)), node))
+
+        self.ring.sort()
+        self.hashes = [hashed for hashed, _ in self.ring]
+
+    def _hash(self, key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def get_node(self, key):
+        index = bisect.bisect(self.hashes, self._hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+class WorkerConnectionClient(MultiConnectionClient):
+    """
+    `MultiConnectionClient` run inside a worker process.  It has no `irc.multi`
+    application of its own; commands are received from the supervisor over `pipe`
+    """
+    def __init__(self, application, pipe, **kwargs):
+        self.pipe = pipe
+        super().__init__(application, **kwargs)
+        self.loop.add_reader(self.pipe.fileno(), self._read_pipe)
+
+    def start_application(self):
+        pass
+
+    def _read_pipe(self):
+        try:
+            while self.pipe.poll():
+                action, message = self.pipe.recv()
+                self.create_task(self.handle_command(action, message))
+        except EOFError:
+            logger.error('Lost connection to the supervisor process, shutting down')
+            self.loop.remove_reader(self.pipe.fileno())
+            self.stop()
+
+    async def handle_command(self, action, message):
+        if action == 'message':
+            await self.from_consumer(message)
+
+        elif action == 'status':
+            self.pipe.send(('status', self.get_status()))
+
+        elif action == 'stop':
+            self.stop()
+
+    def send_reply(self, msg):
+        self.pipe.send(('application', msg))
+
+    def stop(self):
+        self.disconnect()
+        self.loop.call_later(1, self.loop.stop)
+
+
+def run_worker(application_path, pipe, options, metrics_port=0, loop_type=ASYNCIO):
+    """
+    Entrypoint for worker processes
+    """
+    install_loop_policy(loop_type)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if metrics_port:
+        options = dict(options, metrics=Metrics())
+        start_metrics_server(metrics_port)
+
+    client = WorkerConnectionClient(
+        import_application(application_path), pipe, loop=loop, **options
+    )
+
+    try:
+        client.start()
+    except KeyboardInterrupt:
+        client.disconnect()
+    finally:
+        loop.close()
+
+
+class ShardedMultiConnectionClient(MultiConnectionClient):
+    """
+    `MultiConnectionClient` that spreads its connections across `workers` processes.
+    The `irc.multi` application runs in this (supervisor) process; each
+    `SERVER:NICKNAME` key is assigned to a worker by consistent hashing, and
+    `irc.multi.connect` and `irc.multi.disconnect` messages are sent to that worker.
+    Workers import the application themselves from `application_path`, and run a
+    `loop_type` event loop.  If `metrics_port` is set, worker N serves its metrics on
+    `metrics_port + N + 1`
+    """
+    def __init__(
+        self, application, application_path, workers=2, loop=None, metrics_port=0,
+        loop_type=ASYNCIO, **kwargs
+    ):
+        if kwargs.get('shared'):
+            raise ValueError('Shared connections are not supported with workers')
+
+        self.application_path = application_path
+        worker_options = {key: value for key, value in kwargs.items() if key != 'metrics'}
+        self.workers = []
+        self.ring = HashRing(range(workers))
+        # Indexes of workers that have exited.  Their keys aren't moved to other
+        # workers; commands for them are answered with an error instead
+        self.dead_workers = set()
+        self._status_replies = None
+
+        context = multiprocessing.get_context('spawn')
+
+        for index in range(workers):
+            pipe, worker_pipe = context.Pipe()
+            process = context.Process(
+                target=run_worker,
+                args=(
+                    application_path, worker_pipe, worker_options,
+                    metrics_port + index + 1 if metrics_port else 0, loop_type,
+                ),
+                name='channels-irc-worker-{}'.format(index),
+                daemon=True,
+            )
+            process.start()
+            self.workers.append((process, pipe))
+
+        super().__init__(application, loop=loop, **kwargs)
+
+        for index, (_, pipe) in enumerate(self.workers):
+            self.loop.add_reader(pipe.fileno(), self._read_worker, index)
+
+    def get_worker(self, server, nickname):
+        """
+        Returns the pipe to the worker that owns the `server`/`nickname` connection
+        """
+        _, pipe = self.workers[self._worker_index(server, nickname)]
+        return pipe
+
+    def _worker_index(self, server, nickname):
+        return self.ring.get_node(self.get_connection_key(server, nickname))
+
+    def _send_to_worker(self, index, command):
+        """
+        Sends a command to a worker, returning whether it could be sent
+        """
+        if index in self.dead_workers:
+            return False
+
+        try:
+            self.workers[index][1].send(command)
+        except OSError:
+            self._worker_died(index)
+            return False
+
+        return True
+
+    def _worker_died(self, index):
+        if index in self.dead_workers:
+            return
+
+        process, pipe = self.workers[index]
+        logger.error('Worker process {} exited with code {}; its connections are lost'.format(
+            process.name, process.exitcode
+        ))
+        self.dead_workers.add(index)
+        self.loop.remove_reader(pipe.fileno())
+
+        # Don't wait for its status reply
+        self._check_status_replies()
+
+    def _read_worker(self, index):
+        _, pipe = self.workers[index]
+
+        try:
+            while pipe.poll():
+                action, message = pipe.recv()
+
+                if action == 'status' and self._status_replies is not None:
+                    self._status_replies.append(message)
+                    self._check_status_replies()
+
+                elif action == 'application':
+                    self._send_application_msg(message)
+        except (EOFError, OSError):
+            self._worker_died(index)
+
+    async def create_connection(self, server, port, nickname, **kwargs):
+        kwargs.pop('type', None)
+        index = self._worker_index(server, nickname)
+
+        sent = self._send_to_worker(index, ('message', {
+            'type': 'irc.multi.connect',
+            'server': server,
+            'port': port,
+            'nickname': nickname,
+            **kwargs
+        }))
+        if not sent:
+            self._send_failed_result(server, nickname, index)
+
+    async def create_connections(self, specs, concurrency=None):
+        """
+        Sends each worker the specs of its connections, to open with at most
+        `concurrency` at a time per worker.  Results are relayed from the workers,
+        except for connections of a worker that isn't running, which fail straight away
+        """
+        by_worker = collections.defaultdict(list)
+
+        for spec in self.valid_specs(specs):
+            by_worker[self._worker_index(spec['server'], spec['nickname'])].append(spec)
+
+        for index, worker_specs in by_worker.items():
+            sent = self._send_to_worker(index, ('message', {
+                'type': 'irc.multi.connect.bulk',
+                'connections': worker_specs,
+                'concurrency': concurrency,
+            }))
+
+            if not sent:
+                for spec in worker_specs:
+                    self._send_failed_result(spec['server'], spec['nickname'], index)
+
+    def _send_failed_result(self, server, nickname, index):
+        error = 'Worker process {} is not running'.format(self.workers[index][0].name)
+        logger.warning('Connection to {} with user {} failed: {}'.format(server, nickname, error))
+        self.send_connect_result(server, nickname, False, error)
+
+    def send_members(self, server, nickname, channel):
+        sent = self._send_to_worker(self._worker_index(server, nickname), ('message', {
+            'type': 'irc.multi.members',
+            'server': server,
+            'nickname': nickname,
+            'channel': channel,
+        }))
+
+        if not sent:
+            self.send_reply({
+                'type': 'irc.multi.members',
+                'server': server,
+                'nickname': nickname,
+                'channel': channel,
+                'members': None,
+            })
+
+    async def remove_connection(self, server, nickname):
+        # A connection of a worker that isn't running is already gone
+        self._send_to_worker(self._worker_index(server, nickname), ('message', {
+            'type': 'irc.multi.disconnect',
+            'server': server,
+            'nickname': nickname,
+        }))
+
+    def send_status(self):
+        """
+        Requests the status of every worker's connections.  The combined status is
+        sent to the application once every running worker has replied
+        """
+        self._status_replies = []
+
+        for index in range(len(self.workers)):
+            self._send_to_worker(index, ('status', None))
+
+        self._check_status_replies()
+
+    def _check_status_replies(self):
+        replies = self._status_replies
+
+        if replies is not None and len(replies) >= len(self.workers) - len(self.dead_workers):
+            self._status_replies = None
+            self._send_status(replies)
+
+    def _send_status(self, replies):
+        connections = {}
+        for reply in replies:
+            connections.update(reply)
+
+        self._send_application_msg({
+            'type': 'irc.multi.status',
+            'connections': connections,
+        })
+
+    def disconnect(self):
+        """
+        Disconnects every worker's connections, and stops the workers
+        """
+        for index, (process, _) in enumerate(self.workers):
+            if process.is_alive():
+                self._send_to_worker(index, ('stop', None))
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds to collect changes before writing a snapshot
+SAVE_DELAY = 1
+
+
+class SubscriptionStore:
+    """
+    Stores the joined channels of each connection (by `SERVER:NICKNAME` key), so they
+    can be joined again after a restart.  Subclass to keep them somewhere else
+    """
+    def load(self, key):
+        """
+        The stored channels of a connection
+        """
+        raise NotImplementedError()
+
+    def save(self, key, channels):
+        """
+        Called with the channels of a connection whenever they change, on the event
+        loop, so it shouldn't block
+        """
+        raise NotImplementedError()
+
+    def flush(self):
+        """
+        Writes out any saves still pending.  Called on shutdown
+        """
+        pass
+
+
+class MemorySubscriptionStore(SubscriptionStore):
+    """
+    Keeps subscriptions for the life of the process
+    """
+    def __init__(self):
+        self.subscriptions = {}
+
+    def load(self, key):
+        return list(self.subscriptions.get(key, []))
+
+    def save(self, key, channels):
+        self.subscriptions[key] = sorted(channels)
+
+
+class FileSubscriptionStore(MemorySubscriptionStore):
+    """
+    Keeps subscriptions in a JSON snapshot file, which is replaced as a whole, so a
+    crash never leaves it half written.  Saves from every connection are collected
+    for `delay` seconds and written in one go, off the event loop.  Only one process
+    should use a file
+    """
+    def __init__(self, path, delay=SAVE_DELAY, loop=None):
+        super().__init__()
+        self.path = path
+        self.delay = delay
+        self.loop = loop
+
+        # key: channels saved since the last snapshot
+        self._pending = {}
+        self._handle = None
+        self._writing = None
+        # Snapshots are numbered, so an older one never replaces a newer one
+        self._version = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+
+        try:
+            with open(path) as snapshot:
+                self.subscriptions = json.load(snapshot)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logger.warning('Ignoring unreadable subscription snapshot {}'.format(path))
+
+    def load(self, key):
+        if key in self._pending:
+            return sorted(self._pending[key])
+
+        return super().load(key)
+
+    def save(self, key, channels):
+        # Sorted and copied when the snapshot is taken, so saving is cheap however
+        # often the channels change
+        self._pending[key] = channels
+
+        if self._handle is None:
+            if self.loop is None:
+                self.loop = asyncio.get_event_loop()
+            self._handle = self.loop.call_later(self.delay, self._write_pending)
+
+    def _write_pending(self):
+        self._handle = None
+
+        if self._writing is not None and not self._writing.done():
+            # Write again once the current write has finished
+            self._handle = self.loop.call_later(self.delay, self._write_pending)
+            return
+
+        self._writing = self.loop.run_in_executor(None, self._write, *self._snapshot())
+
+    def _snapshot(self):
+        for key, channels in self._pending.items():
+            self.subscriptions[key] = sorted(channels)
+        self._pending = {}
+
+        self._version += 1
+        return dict(self.subscriptions), self._version
+
+    def _write(self, subscriptions, version):
+        with self._write_lock:
+            if version <= self._written:
+                return
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.channels-irc-')
+
+            try:
+                with os.fdopen(descriptor, 'w') as snapshot:
+                    json.dump(subscriptions, snapshot)
+                os.replace(temp_path, self.path)
+                self._written = version
+            except OSError:
+                logger.exception('Failed to save subscription snapshot {}'.format(self.path))
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def flush(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if self._pending or self._version > self._written:
+            self._write(*self._snapshot())
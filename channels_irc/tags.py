@@ -0,0 +1,60 @@
+import re
+from collections.abc import Mapping
+
+_TAG_UNESCAPE_RE = re.compile(r'\\(.?)')
+_TAG_UNESCAPE_MAP = {':': ';', 's': ' ', 'n': '\n', 'r': '\r', '\\': '\\'}
+
+
+def unescape_tag_value(value):
+    """
+    Unescapes an IRCv3 message tag value
+    """
+    if '\\' not in value:
+        return value
+
+    return _TAG_UNESCAPE_RE.sub(
+        lambda match: _TAG_UNESCAPE_MAP.get(match.group(1), match.group(1)), value
+    )
+
+
+class MessageTags(Mapping):
+    """
+    Read-only mapping of the IRCv3 tags of a message.  The raw tag string is only
+    split and unescaped the first time a tag is read, so messages whose tags are never
+    used cost nothing to decode.  If `whitelist` is given, tags with other keys are
+    discarded up front
+    """
+    __slots__ = ('raw', '_tags')
+
+    def __init__(self, raw, whitelist=None):
+        if whitelist is not None:
+            raw = ';'.join(
+                item for item in raw.split(';') if item.partition('=')[0] in whitelist
+            )
+
+        self.raw = raw
+        self._tags = None
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            tags = {}
+            if self.raw:
+                for item in self.raw.split(';'):
+                    key, _, value = item.partition('=')
+                    tags[key] = unescape_tag_value(value)
+            self._tags = tags
+
+        return self._tags
+
+    def __getitem__(self, key):
+        return self.tags[key]
+
+    def __iter__(self):
+        return iter(self.tags)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __repr__(self):
+        return 'MessageTags({!r})'.format(self.raw)
@@ -0,0 +1,37 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from ..batching import MessageBatcher
+from .utils import FakeLoop
+
+
+class MessageBatcherTests(TestCase):
+    def setUp(self):
+        self.loop = FakeLoop()
+        self.send = Mock()
+
+    def test_batch_sent_after_window(self):
+        batcher = MessageBatcher(self.loop, self.send, .1)
+        batcher.add({'command': 'a'})
+        batcher.add({'command': 'b'})
+        self.send.assert_not_called()
+
+        self.loop.advance(.1)
+        self.send.assert_called_once_with({
+            'type': 'irc.receive.batch',
+            'messages': [{'command': 'a'}, {'command': 'b'}],
+        })
+
+    def test_batch_sent_when_full(self):
+        batcher = MessageBatcher(self.loop, self.send, .1, size=2)
+        batcher.add({'command': 'a'})
+        batcher.add({'command': 'b'})
+        batcher.add({'command': 'c'})
+
+        self.assertEqual(self.send.call_count, 1)
+        self.assertEqual(len(self.send.call_args[0][0]['messages']), 2)
+
+    def test_empty_flush_sends_nothing(self):
+        MessageBatcher(self.loop, self.send, .1).flush()
+        self.send.assert_not_called()
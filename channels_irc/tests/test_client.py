@@ -3,9 +3,11 @@ from unittest.mock import patch, Mock
 
 from django.test import TestCase
 from irc.client import NickMask
+from jaraco.stream.buffer import LineBuffer
 
 from ..client import ChannelsIRCClient
 from ..consumers import AsyncIrcConsumer
+from ..messages import IrcMessage
 
 
 class MockEvent(object):
@@ -77,6 +79,288 @@ class ChannelsIRCClientTests(TestCase):
             'body': [''],
         })
 
+    async def test_ignored_events_are_dropped(self):
+        """
+        Events in `ignore_events` shouldn't be sent to the application
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), ignore_events=['motd'])
+        client.create_application()
+
+        client._dispatcher(self.mock_connection, MockEvent(target='advogg', type='motd'))
+        client._dispatcher(self.mock_connection, MockEvent(target='#testchannel', type='join'))
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['command'], 'join')
+        self.assertTrue(client.application_queue.empty())
+
+    async def test_forward_events_allowlist(self):
+        """
+        With `forward_events` set, only those events (plus welcome/disconnect) should be
+        sent to the application, while joins are still tracked
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), forward_events=['pubmsg'])
+        client.create_application()
+        client.connection.real_nickname = 'axiologue'
+
+        client._dispatcher(self.mock_connection, MockEvent(target='#testchannel', type='join'))
+        client._dispatcher(self.mock_connection, MockEvent(target='advogg', type='motd'))
+        client._dispatcher(self.mock_connection, MockEvent(
+            target='#testchannel', type='pubmsg', arguments=['hello'],
+        ))
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['command'], 'message')
+        self.assertTrue(client.application_queue.empty())
+        self.assertIn('#testchannel', client.join_coalescer.joined)
+
+    async def test_message_tags(self):
+        """
+        With `message_tags` set, the tags of an incoming line should be sent along with
+        the message
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), message_tags=True, tag_whitelist=['id'])
+        client.create_application()
+        client.connection.real_server_name = 'test.irc.server'
+        client.connection.real_nickname = 'advogg'
+        client.connection.handlers = {}
+
+        client.connection._process_line(
+            '@id=123;badges=mod/1 :testuser!testuser@test.irc.server PRIVMSG #testchannel :hello'
+        )
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['command'], 'all_raw_messages')
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['body'], 'hello')
+        self.assertEqual(dict(response['tags']), {'id': '123'})
+
+    async def test_compact_messages(self):
+        """
+        With `compact_messages`, messages should be sent as `IrcMessage`s
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), compact_messages=True)
+        client.create_application()
+
+        client._dispatcher(self.mock_connection, MockEvent(
+            source='testuser!testuser@test.irc.server', target='#testchannel',
+            type='pubmsg', arguments=['hello'],
+        ))
+
+        response = await client.application_queue.get()
+        self.assertIsInstance(response, IrcMessage)
+        self.assertEqual(response, {
+            'type': 'irc.receive',
+            'command': 'message',
+            'user': 'testuser',
+            'channel': '#testchannel',
+            'body': 'hello',
+        })
+
+    async def test_batched_messages(self):
+        """
+        With batching enabled, `irc.receive` messages should be grouped, and sent
+        before any other message type
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), batch_window=10)
+        client.create_application()
+
+        client._dispatcher(self.mock_connection, MockEvent(target='#testchannel', type='join'))
+        client._dispatcher(self.mock_connection, MockEvent(target='#testchannel', type='part'))
+        client.on_disconnect(self.mock_connection, MockEvent())
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['type'], 'irc.receive.batch')
+        self.assertEqual([msg['command'] for msg in response['messages']], ['join', 'part'])
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['type'], 'irc.on.disconnect')
+
+    async def test_raw_mode(self):
+        """
+        In raw mode, once registered, each read should be sent to the application as
+        a list of unparsed lines, with PINGs answered directly
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), raw=True)
+        client.create_application()
+        client.connection.raw_buffer = LineBuffer()
+        client.connection.registered = True
+        client.connection.send_now = Mock()
+
+        client.connection.process_data(
+            b':testuser!testuser@test.irc.server PRIVMSG #testchannel :hello\r\nPING :test.irc.server\r\n:te'
+        )
+
+        client.connection.send_now.assert_called_with('PONG :test.irc.server')
+        response = await client.application_queue.get()
+        self.assertEqual(response, {
+            'type': 'irc.receive.raw',
+            'lines': [
+                b':testuser!testuser@test.irc.server PRIVMSG #testchannel :hello',
+                b'PING :test.irc.server',
+            ],
+        })
+
+    async def test_raw_mode_starts_mid_read(self):
+        """
+        Lines after the welcome, including a partial line split across reads, should
+        be raw
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), raw=True)
+        client.create_application()
+        client.connection.raw_buffer = LineBuffer()
+        # What `connect` would have set up
+        client.connection.buffer = client.connection.buffer_class()
+        client.connection.handlers = {}
+        client.connection.real_server_name = ''
+        client.connection.real_nickname = 'testuser'
+        client.connection.server = 'test.irc.server'
+        client.connection.port = 6667
+
+        client.connection.process_data(
+            b':test.irc.server 001 testuser :Welcome\r\n'
+            b':testuser!testuser@test.irc.server PRIVMSG #testchannel :one\r\n'
+            b':testuser!testuser@test.irc.server PRIVMSG #testchannel :hel'
+        )
+        client.connection.process_data(b'lo world\r\n')
+
+        response = await client.application_queue.get()
+        while response.get('command') != 'welcome':
+            response = await client.application_queue.get()
+        response = await client.application_queue.get()
+        self.assertEqual(response['lines'], [b':testuser!testuser@test.irc.server PRIVMSG #testchannel :one'])
+        response = await client.application_queue.get()
+        self.assertEqual(response['lines'], [
+            b':testuser!testuser@test.irc.server PRIVMSG #testchannel :hello world',
+        ])
+
+    async def test_members(self):
+        """
+        With `track_members`, the `members` command should answer from the members
+        seen in JOIN and NAMES replies
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), track_members=True, ignore_events=['join'])
+        client.create_application()
+        client.connection.real_nickname = 'advogg'
+
+        client._dispatcher(self.mock_connection, MockEvent(
+            source='advogg!advogg@test.irc.server', target='#testchannel', type='join',
+        ))
+        client._dispatcher(self.mock_connection, MockEvent(
+            type='namreply', target='advogg', arguments=['=', '#testchannel', '@advogg testuser'],
+        ))
+        client._dispatcher(self.mock_connection, MockEvent(
+            type='endofnames', target='advogg', arguments=['#testchannel', 'End of /NAMES list.'],
+        ))
+        client._dispatcher(self.mock_connection, MockEvent(
+            source='testuser!testuser@test.irc.server', type='nick', target='newuser',
+        ))
+
+        await client._handle_members({'type': 'irc.send', 'command': 'members', 'channel': 'testchannel'})
+
+        response = None
+        while response is None or response['command'] != 'members':
+            response = await client.application_queue.get()
+        self.assertEqual(response['body'], {'advogg': '@', 'newuser': ''})
+
+    async def test_rejoin_subscriptions(self):
+        """
+        With `rejoin`, the channels joined before a disconnect should be joined again,
+        packed, on the next welcome
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), rejoin=True)
+        client.create_application()
+        client.connection.real_nickname = 'advogg'
+        client.connection.server, client.connection.port = 'test.irc.server', 6667
+        client.connection.send_raw = Mock()
+
+        for channel in ['#b', '#a']:
+            client._dispatcher(self.mock_connection, MockEvent(
+                source='advogg!advogg@test.irc.server', target=channel, type='join',
+            ))
+        client.on_disconnect(self.mock_connection, MockEvent())
+        client.on_welcome(client.connection, MockEvent(target='advogg', type='welcome'))
+
+        client.connection.send_raw.assert_called_once_with('JOIN #a,#b')
+
+    async def test_application_crash_reconnects(self):
+        """
+        With `autoreconnect`, a disconnect after the application raised should be
+        followed by a reconnect with a new application instance
+        """
+        scopes = []
+
+        async def application(scope, receive, send):
+            scopes.append(scope)
+            if len(scopes) == 1:
+                raise ValueError('crashed')
+            await receive()
+
+        client = ChannelsIRCClient(application, autoreconnect=True, reconnect_delay=0.01)
+        connection = client.connection
+
+        async def connect(server, port, nickname, password=None, username=None, ircname=None):
+            connection.server, connection.port, connection.nickname = server, port, nickname
+            connection.password, connection.username, connection.ircname = password, username, ircname
+            connection.connected = True
+
+        def disconnect(message=''):
+            connection.connected = False
+            client.on_disconnect(connection, MockEvent())
+
+        connection.connect, connection.disconnect = connect, disconnect
+
+        with self.assertLogs('channels_irc.server', 'ERROR'):
+            await client.connect('test.irc.server', 6667, 'advogg')
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+                if len(scopes) == 2:
+                    break
+
+        self.assertEqual(len(scopes), 2)
+        self.assertTrue(client.connected)
+        self.assertFalse(client.application_instance.done())
+        client.application_instance.cancel()
+
+    async def test_reconnect_replaces_running_application(self):
+        """
+        Connecting again should cancel an application instance still running from the
+        previous connection before creating a new one
+        """
+        async def application(scope, receive, send):
+            await asyncio.Future()
+
+        client = ChannelsIRCClient(application)
+
+        async def connect(*args, **kwargs):
+            pass
+
+        client.connection.connect = connect
+
+        await client.connect('test.irc.server', 6667, 'advogg')
+        first = client.application_instance
+        await client.connect('test.irc.server', 6667, 'advogg')
+
+        self.assertTrue(first.cancelled())
+        self.assertIsNot(client.application_instance, first)
+        self.assertFalse(client.application_instance.done())
+        client.application_instance.cancel()
+
+    def test_register_handler(self):
+        """
+        Handlers added with `register_handler` should be called for their event type
+        """
+        handler = Mock()
+        self.client.register_handler('motd', handler)
+
+        mock_event = MockEvent(target='advogg', type='motd')
+        self.client._dispatcher(self.mock_connection, mock_event)
+        handler.assert_called_with(self.mock_connection, mock_event)
+
+        self.client.unregister_handler('motd')
+        self.client._dispatcher(self.mock_connection, mock_event)
+        self.assertEqual(handler.call_count, 1)
+
     async def test_handle_on_message(self):
         """
         `privmsg`, `pubmg`, and other messgate-related IRC events should be handled
@@ -172,6 +456,22 @@ class ChannelsIRCClientTests(TestCase):
 
         self.client.connection.send_raw.assert_not_called()
 
+    async def test_handle_join_skips_requested_channels(self):
+        """
+        `_handle_join` shouldn't send a second JOIN for a channel that was already
+        requested
+        """
+        join_msg = {
+            'type': 'irc.send',
+            'command': 'join',
+            'channel': '#advogg',
+        }
+
+        await self.client._handle_join(join_msg)
+        await self.client._handle_join(join_msg)
+
+        self.assertEqual(self.client.connection.send_raw.call_count, 1)
+
     async def test_handle_message_calls_send_raw(self):
         """
         `_handle_message` should call `send_raw` with the appropriate PRIVMSG text
@@ -187,6 +487,25 @@ class ChannelsIRCClientTests(TestCase):
 
         self.client.connection.send_raw.assert_called_with('PRIVMSG #advogg :Hello World!')
 
+    async def test_consumer_priority_and_ttl(self):
+        """
+        `priority` and `ttl` from the consumer should apply to the lines a command sends
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), send_rate=1, send_burst=1)
+        client.connection.scheduler.send = Mock()
+
+        for body in ['one', 'two']:
+            await client.from_consumer({
+                'type': 'irc.send', 'command': 'message', 'channel': 'a', 'body': body,
+            })
+        await client.from_consumer({
+            'type': 'irc.send', 'command': 'message', 'channel': 'a', 'body': 'urgent',
+            'priority': 1, 'ttl': 10,
+        })
+
+        self.assertEqual(client.connection.scheduler._queues[1]['#a'][0][1], 'PRIVMSG #a :urgent')
+        self.assertIsNotNone(client.connection.scheduler._queues[1]['#a'][0][0])
+
     async def test_handle_part_calls_send_raw(self):
         """
         `_handle_part` should call `send_raw` with the appropriate PART message
@@ -200,3 +519,53 @@ class ChannelsIRCClientTests(TestCase):
         await self.client._handle_part(part_msg)
 
         self.client.connection.send_raw.assert_called_with('PART #advogg')
+
+    async def test_handle_kick_calls_send_raw(self):
+        """
+        `_handle_kick` should call `send_raw` with the appropriate KICK message
+        """
+        await self.client.from_consumer({
+            'type': 'irc.send',
+            'command': 'kick',
+            'channel': 'advogg',
+            'body': 'spammer',
+        })
+        self.client.connection.send_raw.assert_called_with('KICK #advogg spammer')
+
+        await self.client._handle_kick({
+            'type': 'irc.send',
+            'command': 'kick',
+            'channel': 'advogg',
+            'body': 'spammer',
+            'reason': 'No spam',
+        })
+        self.client.connection.send_raw.assert_called_with('KICK #advogg spammer :No spam')
+
+    async def test_handle_mode_calls_send_raw(self):
+        """
+        `_handle_mode` should call `send_raw` with the appropriate MODE message
+        """
+        await self.client.from_consumer({
+            'type': 'irc.send',
+            'command': 'mode',
+            'channel': 'advogg',
+            'body': '+b spammer!*@*',
+        })
+
+        self.client.connection.send_raw.assert_called_with('MODE #advogg +b spammer!*@*')
+
+    async def test_moderation_commands_are_sent_before_chat(self):
+        """
+        With outbound rate limits, KICK and MODE from the consumer should be queued
+        ahead of messages
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), send_rate=1, send_burst=1)
+        client.connection.scheduler.send = Mock()
+
+        for command, body in [('message', 'one'), ('message', 'two'), ('kick', 'spammer'), ('mode', '+b spammer')]:
+            await client.from_consumer({'type': 'irc.send', 'command': command, 'channel': 'a', 'body': body})
+
+        self.assertEqual(
+            [line for deadline, line in client.connection.scheduler._queues[1][None]],
+            ['KICK #a spammer', 'MODE #a +b spammer'],
+        )
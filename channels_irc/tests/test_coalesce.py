@@ -0,0 +1,83 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from ..coalesce import JoinCoalescer, pack_channels
+from .utils import FakeLoop
+
+
+class PackChannelsTests(TestCase):
+    def test_lines_fit_the_limit(self):
+        """
+        Every packed line, including the command and CR LF, should fit in 512 bytes
+        """
+        channels = ['#channel{}'.format(i) for i in range(500)]
+        batches = list(pack_channels('JOIN', channels))
+
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(sum(len(batch) for batch in batches), 500)
+        for batch in batches:
+            self.assertLessEqual(len('JOIN {}\r\n'.format(','.join(batch))), 512)
+
+    def test_single_batch(self):
+        self.assertEqual(list(pack_channels('JOIN', ['#a', '#b'])), [['#a', '#b']])
+
+
+class JoinCoalescerTests(TestCase):
+    def setUp(self):
+        self.loop = FakeLoop()
+        self.join = Mock()
+        self.part = Mock()
+        self.coalescer = JoinCoalescer(self.loop, self.join, self.part, window=.5)
+
+    def test_joins_are_batched(self):
+        self.coalescer.join('#a')
+        self.coalescer.join('#b')
+        self.join.assert_not_called()
+
+        self.loop.advance(.5)
+        self.join.assert_called_once_with(['#a', '#b'])
+
+    def test_dedupes_joined_and_requested_channels(self):
+        """
+        Channels already joined, or with a JOIN in flight, shouldn't be requested again
+        """
+        self.coalescer.joined_channel('#a')
+        self.coalescer.join('#a')
+        self.coalescer.join('#b')
+        self.coalescer.join('#B')
+        self.loop.advance(.5)
+
+        self.coalescer.join('#b')
+        self.loop.advance(.5)
+
+        self.join.assert_called_once_with(['#b'])
+
+    def test_part_cancels_pending_join(self):
+        self.coalescer.join('#a')
+        self.coalescer.part('#a')
+        self.loop.advance(.5)
+
+        self.join.assert_not_called()
+        self.part.assert_not_called()
+
+    def test_rejoin_after_part(self):
+        self.coalescer.joined_channel('#a')
+        self.coalescer.part('#a')
+        self.loop.advance(.5)
+        self.coalescer.left_channel('#a')
+        self.coalescer.join('#a')
+        self.loop.advance(.5)
+
+        self.part.assert_called_once_with(['#a'])
+        self.join.assert_called_once_with(['#a'])
+
+    def test_join_many_sends_immediately(self):
+        """
+        `join_many` should send every new channel at once, even with a window
+        """
+        coalescer = JoinCoalescer(self.loop, self.join, self.part, window=1)
+        coalescer.joined_channel('#a')
+        coalescer.join_many(['#a', '#b', '#c'])
+
+        self.join.assert_called_once_with(['#b', '#c'])
@@ -5,6 +5,8 @@ from django.test import TestCase
 
 from .utils import AsyncMock
 from ..consumers import AsyncIrcConsumer
+from ..moderation import ModerationIrcConsumer
+from ..offload import OffloadIrcConsumer
 
 
 class AsyncIrcConsumerTests(TestCase):
@@ -69,3 +71,131 @@ class AsyncIrcConsumerTests(TestCase):
             'channel': 'my_channel',
             'body': 'Hello IRC!',
         })
+
+    async def test_irc_receive_routes_to_handler(self):
+        """
+        `irc_receive` should call the `on_<command>` handler resolved for the class
+        """
+        class HandlerConsumer(AsyncIrcConsumer):
+            received = []
+
+            async def on_message(self, channel, user, body):
+                self.received.append(('message', channel, user, body))
+
+            async def on_join(self, channel, user, body):
+                self.received.append(('join', channel, user, body))
+
+        consumer = HandlerConsumer()
+        await consumer.irc_receive({
+            'type': 'irc.receive', 'command': 'message', 'channel': '#a', 'user': 'u', 'body': 'hi',
+        })
+        await consumer.irc_receive({'type': 'irc.receive', 'command': 'join', 'channel': '#a'})
+        await consumer.irc_receive({'type': 'irc.receive', 'command': 'part', 'channel': '#a'})
+
+        self.assertEqual(consumer.received, [
+            ('message', '#a', 'u', 'hi'),
+            ('join', '#a', None, None),
+        ])
+
+    async def test_tags_passed_to_handlers_that_accept_them(self):
+        """
+        `tags` should only be passed to handlers with a `tags` argument
+        """
+        class TagsConsumer(AsyncIrcConsumer):
+            received = []
+
+            async def on_message(self, channel, user, body, tags=None):
+                self.received.append(tags)
+
+            async def on_join(self, channel, user, body):
+                self.received.append('join')
+
+        consumer = TagsConsumer()
+        await consumer.irc_receive({
+            'type': 'irc.receive', 'command': 'message', 'channel': '#a', 'tags': {'id': '1'},
+        })
+        await consumer.irc_receive({
+            'type': 'irc.receive', 'command': 'join', 'channel': '#a', 'tags': {'id': '2'},
+        })
+
+        self.assertEqual(consumer.received, [{'id': '1'}, 'join'])
+
+    async def test_batch_falls_back_to_handlers(self):
+        """
+        By default, each message of an `irc.receive.batch` should go to its handler
+        """
+        class BatchConsumer(AsyncIrcConsumer):
+            received = []
+
+            async def on_message(self, channel, user, body):
+                self.received.append(body)
+
+        consumer = BatchConsumer()
+        await consumer.irc_receive_batch({
+            'type': 'irc.receive.batch',
+            'messages': [
+                {'type': 'irc.receive', 'command': 'message', 'body': 'one'},
+                {'type': 'irc.receive', 'command': 'message', 'body': 'two'},
+            ],
+        })
+
+        self.assertEqual(consumer.received, ['one', 'two'])
+
+    async def test_raw_lines_go_to_on_raw(self):
+        """
+        The lines of an `irc.receive.raw` message should be passed to `on_raw`
+        """
+        class RawConsumer(AsyncIrcConsumer):
+            received = []
+
+            async def on_raw(self, lines):
+                self.received.extend(lines)
+
+        consumer = RawConsumer()
+        await consumer.irc_receive_raw({'type': 'irc.receive.raw', 'lines': [b'PING :a', b'PING :b']})
+
+        self.assertEqual(consumer.received, [b'PING :a', b'PING :b'])
+
+    async def test_irc_commands_limits_handlers(self):
+        """
+        Commands not listed in `irc_commands` should be ignored
+        """
+        class SubscribedConsumer(AsyncIrcConsumer):
+            irc_commands = ['message']
+            received = []
+
+            async def on_message(self, channel, user, body):
+                self.received.append('message')
+
+            async def on_join(self, channel, user, body):
+                self.received.append('join')
+
+        consumer = SubscribedConsumer()
+        await consumer.irc_receive({'type': 'irc.receive', 'command': 'join', 'channel': '#a'})
+        await consumer.irc_receive({'type': 'irc.receive', 'command': 'message', 'channel': '#a'})
+
+        self.assertEqual(consumer.received, ['message'])
+        self.assertIn('welcome', SubscribedConsumer._irc_handlers)
+
+    async def test_hooks_are_not_command_handlers(self):
+        """
+        `irc.receive` commands named like a hook (e.g. an IRCv3 `BATCH`) should be
+        ignored rather than passed to the hook
+        """
+        class HookConsumer(AsyncIrcConsumer):
+            received = []
+
+            async def on_batch(self, messages):
+                self.received.append(messages)
+
+        consumer = HookConsumer()
+        for command in ['batch', 'raw', 'disconnect']:
+            await consumer.irc_receive({'type': 'irc.receive', 'command': command, 'body': ['+ref', 'netsplit']})
+
+        self.assertEqual(consumer.received, [])
+        self.assertNotIn('offload_result', OffloadIrcConsumer._irc_handlers)
+        self.assertNotIn('violation', ModerationIrcConsumer._irc_handlers)
+
+    async def test_irc_receive_requires_command(self):
+        with self.assertRaises(ValueError):
+            await AsyncIrcConsumer().irc_receive({'type': 'irc.receive'})
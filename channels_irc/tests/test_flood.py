@@ -0,0 +1,136 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from irc.client import InvalidCharacters
+
+from ..flood import OutboundScheduler
+from .utils import FakeLoop
+
+
+class OutboundSchedulerTests(TestCase):
+    def setUp(self):
+        self.loop = FakeLoop()
+        self.send = Mock()
+
+    def sent(self):
+        return [call[0][0] for call in self.send.call_args_list]
+
+    def test_no_limits_sends_immediately(self):
+        scheduler = OutboundScheduler(self.loop, self.send)
+        scheduler.submit('PRIVMSG #a :hi')
+
+        self.assertEqual(self.sent(), ['PRIVMSG #a :hi'])
+
+    def test_connection_rate_limit(self):
+        """
+        Lines over the burst should wait for the bucket to refill
+        """
+        scheduler = OutboundScheduler(self.loop, self.send, rate=1, burst=2)
+        for i in range(4):
+            scheduler.submit('PRIVMSG #a :{}'.format(i))
+
+        self.assertEqual(len(self.sent()), 2)
+
+        self.loop.advance(1)
+        self.assertEqual(len(self.sent()), 3)
+
+        self.loop.advance(1)
+        self.assertEqual(self.sent()[-1], 'PRIVMSG #a :3')
+
+    def test_priority_commands_skip_the_queue(self):
+        """
+        PONG and QUIT should be sent even when messages are queued
+        """
+        scheduler = OutboundScheduler(self.loop, self.send, rate=1, burst=1)
+        scheduler.submit('PRIVMSG #a :one')
+        scheduler.submit('PRIVMSG #a :two')
+        scheduler.submit('PONG :server')
+
+        self.assertEqual(self.sent(), ['PRIVMSG #a :one', 'PONG :server'])
+
+    def test_higher_priority_queued_first(self):
+        scheduler = OutboundScheduler(self.loop, self.send, rate=1, burst=1)
+        scheduler.submit('PRIVMSG #a :one')
+        scheduler.submit('PRIVMSG #a :two')
+        scheduler.submit('JOIN #b')
+
+        self.loop.advance(1)
+        self.assertEqual(self.sent()[-1], 'JOIN #b')
+
+    def test_target_rate_limit(self):
+        """
+        A busy target shouldn't hold back messages to other targets
+        """
+        scheduler = OutboundScheduler(self.loop, self.send, target_rate=1, target_burst=1)
+        scheduler.submit('PRIVMSG #a :one')
+        scheduler.submit('PRIVMSG #a :two')
+        scheduler.submit('PRIVMSG #b :three')
+
+        self.assertEqual(self.sent(), ['PRIVMSG #a :one', 'PRIVMSG #b :three'])
+
+        self.loop.advance(1)
+        self.assertEqual(self.sent()[-1], 'PRIVMSG #a :two')
+
+    def test_targets_take_turns(self):
+        """
+        A target with many queued lines shouldn't hold back other targets
+        """
+        scheduler = OutboundScheduler(self.loop, self.send, rate=1, burst=1)
+        scheduler.submit('PRIVMSG #other :first')
+        for i in range(3):
+            scheduler.submit('PRIVMSG #busy :{}'.format(i))
+        scheduler.submit('PRIVMSG #quiet :hello')
+
+        self.loop.advance(1)
+        self.loop.advance(1)
+        self.assertEqual(self.sent()[1:], ['PRIVMSG #busy :0', 'PRIVMSG #quiet :hello'])
+
+        self.loop.advance(1)
+        self.assertEqual(self.sent()[-1], 'PRIVMSG #busy :1')
+
+    def test_options_priority(self):
+        scheduler = OutboundScheduler(self.loop, self.send, rate=1, burst=1)
+        scheduler.submit('PRIVMSG #a :one')
+        scheduler.submit('PRIVMSG #a :two')
+        with scheduler.options(priority=1):
+            scheduler.submit('PRIVMSG #a :urgent')
+
+        self.loop.advance(1)
+        self.assertEqual(self.sent(), ['PRIVMSG #a :one', 'PRIVMSG #a :urgent'])
+
+    def test_stale_lines_are_discarded(self):
+        """
+        Lines whose deadline passes while queued should never be sent
+        """
+        scheduler = OutboundScheduler(self.loop, self.send, rate=1, burst=1)
+        scheduler.submit('PRIVMSG #a :one')
+        with scheduler.options(ttl=.5):
+            scheduler.submit('PRIVMSG #a :stale')
+        scheduler.submit('PRIVMSG #a :two')
+
+        self.loop.advance(1)
+        self.assertEqual(self.sent(), ['PRIVMSG #a :one', 'PRIVMSG #a :two'])
+        self.assertEqual(scheduler.stats(), {'queued': 0, 'sent': 2, 'expired': 1})
+
+    def test_invalid_lines_are_dropped(self):
+        """
+        A line the connection refuses to send should be dropped, and the rest of
+        the queue still drained
+        """
+        def send(line):
+            if '\n' in line:
+                raise InvalidCharacters(line)
+            self.send(line)
+
+        scheduler = OutboundScheduler(self.loop, send, rate=1, burst=1)
+        scheduler.submit('PRIVMSG #a :one')
+        scheduler.submit('PRIVMSG #a :bad\nline')
+        scheduler.submit('PRIVMSG #a :three')
+
+        with self.assertLogs('channels_irc.flood', 'WARNING'):
+            self.loop.advance(1)
+        self.loop.advance(1)
+
+        self.assertEqual(self.sent(), ['PRIVMSG #a :one', 'PRIVMSG #a :three'])
+        self.assertEqual(scheduler.stats()['queued'], 0)
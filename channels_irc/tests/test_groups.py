@@ -0,0 +1,76 @@
+import asyncio
+
+from channels.layers import InMemoryChannelLayer
+from django.test import TestCase
+
+from ..client import ChannelsIRCClient
+from ..consumers import AsyncIrcConsumer
+from ..groups import GroupPublisher, get_shard, group_name
+from ..tags import MessageTags
+
+
+class GroupNameTests(TestCase):
+    def test_group_name(self):
+        self.assertEqual(group_name('#Django'), 'irc.django')
+        self.assertEqual(group_name('#django', prefix='libera', shard=2), 'libera.django.2')
+
+    def test_invalid_characters_are_replaced(self):
+        self.assertEqual(group_name('#c++/ümlaut'), 'irc.c____mlaut')
+
+    def test_long_names_are_shortened(self):
+        name = group_name('#' + 'a' * 200, shard=3)
+
+        self.assertEqual(len(name), 99)
+        self.assertTrue(name.endswith('.3'))
+        self.assertNotEqual(name, group_name('#' + 'a' * 201, shard=3))
+
+    def test_shards_are_stable(self):
+        self.assertEqual(get_shard('Advogg', 8), get_shard('advogg', 8))
+        self.assertLess(get_shard('advogg', 8), 8)
+
+
+class GroupPublisherTests(TestCase):
+    async def test_messages_for_channels_are_sent_to_their_group(self):
+        layer = InMemoryChannelLayer()
+        await layer.group_add('irc.django', 'worker')
+
+        publisher = GroupPublisher(asyncio.get_event_loop(), channel_layer=layer)
+        self.assertTrue(publisher.publish({
+            'type': 'irc.receive',
+            'command': 'message',
+            'channel': '#django',
+            'body': 'hello',
+            'tags': MessageTags('id=1'),
+        }))
+        self.assertFalse(publisher.publish({'type': 'irc.receive', 'channel': 'advogg'}))
+        await publisher._task
+
+        response = await layer.receive('worker')
+        self.assertEqual(response['body'], 'hello')
+        self.assertEqual(response['tags'], {'id': '1'})
+        self.assertEqual(publisher.stats(), {'pending': 0, 'published': 1})
+
+    async def test_client_fanout(self):
+        """
+        With `group_fanout`, channel messages should go to their group, and anything
+        else to the application instance
+        """
+        layer = InMemoryChannelLayer()
+        await layer.group_add('irc.django.{}'.format(get_shard('testuser', 2)), 'worker')
+
+        client = ChannelsIRCClient(
+            AsyncIrcConsumer(), group_fanout=True, group_shards=2, channel_layer=layer,
+        )
+        client.create_application()
+
+        client._send_application_msg({
+            'type': 'irc.receive', 'command': 'message', 'channel': '#django', 'user': 'testuser',
+        })
+        client._send_application_msg({'type': 'irc.on.disconnect', 'channel': '#django'})
+
+        response = await client.application_queue.get()
+        self.assertEqual(response['type'], 'irc.on.disconnect')
+
+        await client.publisher._task
+        response = await layer.receive('worker')
+        self.assertEqual(response['user'], 'testuser')
@@ -0,0 +1,53 @@
+from django.test import TestCase
+
+from ..membership import MembershipCache, split_prefix
+
+
+class MembershipCacheTests(TestCase):
+    def setUp(self):
+        self.cache = MembershipCache()
+        self.cache.track('#Test')
+
+    def test_split_prefix(self):
+        self.assertEqual(split_prefix('@+advogg'), ('@+', 'advogg'))
+        self.assertEqual(split_prefix('advogg'), ('', 'advogg'))
+
+    def test_names_replace_members(self):
+        self.cache.joined('#test', 'stale')
+        self.cache.add_names('#test', ['@op', 'user'])
+        self.cache.add_names('#TEST', ['+voiced'])
+        self.assertEqual(self.cache.members('#test'), {'stale': ''})
+
+        self.cache.end_names('#test')
+        self.assertEqual(self.cache.members('#test'), {'op': '@', 'user': '', 'voiced': '+'})
+
+    def test_join_part_quit_kick_nick(self):
+        self.cache.track('#other')
+        for nick in ['one', 'two', 'three']:
+            self.cache.joined('#test', nick)
+        self.cache.joined('#other', 'One')
+
+        self.cache.left('#test', 'two')
+        self.cache.quit('ONE')
+        self.cache.nick_changed('three', 'Four')
+
+        self.assertEqual(self.cache.members('#test'), {'Four': ''})
+        self.assertEqual(self.cache.members('#other'), {})
+
+    def test_untracked_channels_are_ignored(self):
+        self.cache.joined('#elsewhere', 'one')
+        self.cache.add_names('#elsewhere', ['one'])
+
+        self.assertIsNone(self.cache.members('#elsewhere'))
+
+        self.cache.forget('#test')
+        self.assertIsNone(self.cache.members('#test'))
+
+    def test_max_members(self):
+        cache = MembershipCache(max_members=2)
+        cache.track('#test')
+        for nick in ['one', 'two', 'three']:
+            cache.joined('#test', nick)
+
+        self.assertEqual(len(cache.members('#test')), 2)
+        self.assertIn('#test', cache.truncated)
@@ -0,0 +1,40 @@
+from django.test import TestCase
+
+from ..messages import IrcMessage
+
+
+class IrcMessageTests(TestCase):
+    def test_equal_to_dict(self):
+        message = IrcMessage('message', channel='#testchannel', user='testuser', body='hello')
+
+        self.assertEqual(message, {
+            'type': 'irc.receive',
+            'command': 'message',
+            'channel': '#testchannel',
+            'user': 'testuser',
+            'body': 'hello',
+        })
+        self.assertEqual(len(message), 5)
+
+    def test_missing_keys(self):
+        message = IrcMessage('join', channel=None, body=[])
+
+        self.assertIsNone(message['channel'])
+        self.assertNotIn('user', message)
+        self.assertIsNone(message.get('user'))
+        with self.assertRaises(KeyError):
+            message['user']
+
+    def test_strings_are_interned(self):
+        first = IrcMessage('message', channel=''.join(['#test', 'channel']))
+        second = IrcMessage('message', channel=''.join(['#test', 'channel']))
+
+        self.assertIs(first['channel'], second['channel'])
+
+    def test_only_known_keys_can_be_set(self):
+        message = IrcMessage('message')
+        message['connection'] = 'my.test.server:my_nick'
+
+        self.assertEqual(message['connection'], 'my.test.server:my_nick')
+        with self.assertRaises(KeyError):
+            message['other'] = 1
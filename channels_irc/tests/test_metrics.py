@@ -0,0 +1,85 @@
+from unittest import skipIf
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from ..client import ChannelsIRCClient
+from ..consumers import AsyncIrcConsumer
+from ..metrics import Metrics, prometheus_client
+from .test_client import MockConnection, MockEvent
+
+
+@skipIf(prometheus_client is None, 'prometheus_client is not installed')
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.registry = prometheus_client.CollectorRegistry()
+        self.metrics = Metrics(registry=self.registry)
+
+    def value(self, name, **labels):
+        return self.registry.get_sample_value('channels_irc_{}'.format(name), labels)
+
+    async def test_client_metrics(self):
+        """
+        Events, application messages and queue depth should be recorded under the
+        connection's key
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), metrics=self.metrics)
+        client.connection_metrics = self.metrics.connection('test.irc.server:advogg')
+        client.create_application()
+
+        client._dispatcher(MockConnection(), MockEvent(target='#testchannel', type='join'))
+        client._dispatcher(MockConnection(), MockEvent(target='#testchannel', type='join'))
+
+        labels = {'connection': 'test.irc.server:advogg'}
+        self.assertEqual(self.value('irc_events_total', event='join', **labels), 2)
+        self.assertEqual(self.value('application_messages_total', **labels), 2)
+        self.assertEqual(self.value('application_queue_depth', **labels), 2)
+
+    async def test_consumer_message_latency(self):
+        client = ChannelsIRCClient(AsyncIrcConsumer(), metrics=self.metrics)
+        client.connection_metrics = self.metrics.connection('test.irc.server:advogg')
+        client.create_application()
+
+        await client.from_consumer({'type': 'irc.send', 'command': 'status'})
+
+        self.assertEqual(self.value(
+            'consumer_message_seconds_count', connection='test.irc.server:advogg', type='status',
+        ), 1)
+
+    async def test_outbound_metrics(self):
+        """
+        Lines written to IRC should be counted, whether paced or not, and lines
+        waiting for the rate limits reported
+        """
+        client = ChannelsIRCClient(AsyncIrcConsumer(), metrics=self.metrics, send_rate=1, send_burst=1)
+
+        async def connect(*args, **kwargs):
+            pass
+
+        client.connection.connect = connect
+        await client.connect('test.irc.server', 6667, 'advogg')
+        client.connection.transport = Mock()
+
+        for body in ['one', 'two', 'three']:
+            client.connection.privmsg('#testchannel', body)
+        client.connection.send_now('PONG :test.irc.server')
+
+        labels = {'connection': 'test.irc.server:advogg'}
+        self.assertEqual(self.value('irc_lines_sent_total', **labels), 2)
+        self.assertEqual(self.value('outbound_queue_depth', **labels), 2)
+        client.connection.scheduler.clear()
+        client.application_instance.cancel()
+
+    async def test_consumer_message_buckets(self):
+        """
+        Sub-millisecond handling times should land in their own buckets
+        """
+        metrics = self.metrics.connection('test.irc.server:advogg')
+        metrics.consumer_message('message', .00002)
+
+        self.assertEqual(self.value(
+            'consumer_message_seconds_bucket', connection='test.irc.server:advogg', type='message', le='1e-05',
+        ), 0)
+        self.assertEqual(self.value(
+            'consumer_message_seconds_bucket', connection='test.irc.server:advogg', type='message', le='2.5e-05',
+        ), 1)
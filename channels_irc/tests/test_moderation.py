@@ -0,0 +1,157 @@
+import asyncio
+import re
+
+from django.test import TestCase
+
+from ..moderation import AhoCorasick, ModerationIrcConsumer, Rule, RuleSet, required_literal
+
+
+class AhoCorasickTests(TestCase):
+    def test_finds_overlapping_words(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+
+        self.assertEqual(automaton.search('ushers'), {0, 1, 3})
+        self.assertEqual(automaton.search('this'), {2})
+        self.assertEqual(automaton.search('nothing'), set())
+
+
+class RequiredLiteralTests(TestCase):
+    def test_required_literal(self):
+        self.assertEqual(required_literal(r'\bfree\d+\b'), 'free')
+        self.assertEqual(required_literal('colou?r'), 'colo')
+        self.assertEqual(required_literal('ab{2,3}cdef'), 'cdef')
+        self.assertEqual(required_literal(r'[]x]hello\.world'), 'hello.world')
+        self.assertEqual(required_literal('(abc)de'), 'de')
+
+    def test_no_required_literal(self):
+        self.assertIsNone(required_literal('spam|eggs'))
+        self.assertIsNone(required_literal('(?i)spam'))
+        self.assertIsNone(required_literal(r'!{0,3}'))
+        self.assertIsNone(required_literal(r'\d+'))
+
+    def test_escapes_with_arguments(self):
+        for pattern in [r'\x41bc', r'\101bc', r'\u00e9tude', r'\N{LATIN SMALL LETTER E WITH ACUTE}tude']:
+            self.assertIsNone(required_literal(pattern))
+            self.assertEqual(len(RuleSet([Rule('r', pattern, regex=True)]).match('xAbc \xe9tude')), 1)
+
+
+class RuleSetTests(TestCase):
+    def test_matches_phrases_and_regexes(self):
+        rules = [
+            Rule('spam', 'buy now'),
+            Rule('link', r'https?://\S+', regex=True),
+            Rule('exclaim', r'!{3,}', regex=True),
+            Rule('unused', 'never said'),
+            Rule('unused regex', r'never\d', regex=True),
+        ]
+        rule_set = RuleSet(rules)
+
+        self.assertEqual(
+            rule_set.match('BUY NOW at https://example.com !!!'),
+            [rules[0], rules[1], rules[2]],
+        )
+        self.assertEqual(rule_set.match('hello there'), [])
+
+    def test_case_sensitive(self):
+        rule_set = RuleSet([Rule('spam', 'Spam'), Rule('ham', 'ham', regex=True)], ignore_case=False)
+
+        self.assertEqual([rule.name for rule in rule_set.match('spam HAM')], [])
+        self.assertEqual([rule.name for rule in rule_set.match('Spam ham')], ['spam', 'ham'])
+
+    def test_case_folding(self):
+        """
+        Characters `re.IGNORECASE` treats as equal should get past the literal filter
+        """
+        rule_set = RuleSet([Rule('spam', 'spam'), Rule('spammer', r'spam\w+', regex=True)])
+
+        self.assertEqual([rule.name for rule in rule_set.match('\u017fpammer')], ['spam', 'spammer'])
+
+    def test_case_folding_turkish_i(self):
+        """
+        The dotless and dotted capital I should match `i`, as with `re.IGNORECASE`
+        """
+        rule_set = RuleSet([Rule('xi', r'xi', regex=True), Rule('istanbul', 'istanbul')])
+
+        for text in ['x\u0131', 'X\u0130', '\u0130stanbul xi']:
+            self.assertEqual([rule.name for rule in rule_set.match(text)], [
+                rule.name for rule in rule_set.rules if re.search(rule.pattern, text, re.IGNORECASE)
+            ])
+        self.assertEqual(len(rule_set.match('\u0131stanbul')), 1)
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            RuleSet([Rule('broken', '(unclosed', regex=True)])
+
+        with self.assertRaises(ValueError):
+            Rule('empty', '')
+
+
+class ModerationIrcConsumerTests(TestCase):
+    async def test_violations_and_hit_counters(self):
+        """
+        Messages matching rules should go to `on_violation` and be counted per rule
+        """
+        class ModerationConsumer(ModerationIrcConsumer):
+            moderation_rules = [Rule('spam', 'buy now'), Rule('link', r'https?://', regex=True)]
+            received = []
+
+            async def on_violation(self, channel, user, body, rules):
+                self.received.append(('violation', body, [rule.name for rule in rules]))
+
+            async def on_allowed(self, channel, user, body):
+                self.received.append(('allowed', body))
+
+        consumer = ModerationConsumer()
+        for body in ['buy now', 'hi', 'buy now http://x']:
+            await consumer.irc_receive({
+                'type': 'irc.receive', 'command': 'message', 'channel': '#a', 'body': body,
+            })
+
+        self.assertEqual(consumer.received, [
+            ('violation', 'buy now', ['spam']),
+            ('allowed', 'hi'),
+            ('violation', 'buy now http://x', ['spam', 'link']),
+        ])
+        self.assertEqual(consumer.rule_hits, {'spam': 2, 'link': 1})
+
+    async def test_reload_swaps_rules(self):
+        """
+        `irc.moderation.reload` should swap in the new rules in the background,
+        keeping the hit counters
+        """
+        class ReloadConsumer(ModerationIrcConsumer):
+            rules = [[Rule('old', 'old')], [Rule('new', 'new')]]
+
+            async def get_rules(self):
+                return self.rules.pop(0)
+
+        consumer = ReloadConsumer()
+        message = {'type': 'irc.receive', 'command': 'message', 'channel': '#a', 'body': 'old new'}
+        await consumer.irc_receive(message)
+        self.assertEqual(consumer.rule_hits, {'old': 1})
+
+        await consumer.irc_moderation_reload({'type': 'irc.moderation.reload'})
+        # The previous rules are used until the new ones are compiled
+        self.assertEqual([rule.name for rule in consumer.rule_set.rules], ['old'])
+
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            if consumer.rule_set.rules[0].name == 'new':
+                break
+
+        await consumer.irc_receive(message)
+        self.assertEqual(consumer.rule_hits, {'old': 1, 'new': 1})
+
+    async def test_failed_reload_keeps_rules(self):
+        class BrokenConsumer(ModerationIrcConsumer):
+            moderation_rules = [Rule('spam', 'spam')]
+
+        consumer = BrokenConsumer()
+        await consumer.reload_rules()
+        rule_set = consumer.rule_set
+
+        consumer.moderation_rules = [Rule('broken', '(', regex=True)]
+        with self.assertLogs('channels_irc.moderation', 'ERROR'):
+            await consumer._reload_in_background()
+
+        self.assertIs(consumer.rule_set, rule_set)
@@ -2,6 +2,7 @@ import asyncio
 from unittest.mock import patch, MagicMock
 
 from django.test import TestCase
+from irc.client import Event, NickMask
 
 from ..client import ChannelsIRCClient
 from ..consumers import MultiIrcConsumer
@@ -77,3 +78,212 @@ class MultiConnectionClientTests(TestCase):
         self.assertNotIn('my.test.server:my_nick', client.connections)
 
         self.assertEqual(mock_disconnect.call_count, 1)
+
+    async def test_removed_connections_are_pooled(self):
+        """
+        With `pool_idle_time`, a removed connection should be kept open, and reused
+        by the next connect for the same key
+        """
+        client = MultiConnectionClient(MultiIrcConsumer(), pool_idle_time=60)
+        await client.application_queue.get()
+
+        async def application(scope, receive, send):
+            # Leaves the queue for the test to read
+            await asyncio.Future()
+
+        connection = self.make_fake_client()
+        connection.application = application
+        connection.connection.connected = True
+        connection.connection.registered = True
+        connection.connection.real_nickname = 'my_nick'
+        connection.create_application()
+        client.connections = {'my.test.server:my_nick': connection}
+
+        await client.remove_connection('my.test.server', 'my_nick')
+        self.assertEqual(client.connections, {})
+        self.assertTrue(connection.idle)
+        self.assertTrue(client.get_status()['my.test.server:my_nick']['idle'])
+
+        await client.create_connection('my.test.server', 6667, 'my_nick')
+        self.assertIs(client.connections['my.test.server:my_nick'], connection)
+        self.assertEqual(client.idle, {})
+
+        response = await connection.application_queue.get()
+        self.assertEqual(response, {'type': 'irc.receive', 'command': 'welcome', 'channel': 'my_nick'})
+
+    async def test_repeated_prewarm_stays_pooled(self):
+        """
+        Pre-warming a connection that is already in the pool should keep it there
+        """
+        client = MultiConnectionClient(MultiIrcConsumer(), pool_idle_time=60)
+
+        connection = self.make_fake_client()
+        connection.connection.connected = True
+        client._add_idle('my.test.server:my_nick', connection)
+        first_handle = client.idle['my.test.server:my_nick'][1]
+
+        await client.create_connection('my.test.server', 6667, 'my_nick', idle=True)
+
+        self.assertEqual(client.connections, {})
+        self.assertIs(client.idle['my.test.server:my_nick'][0], connection)
+        self.assertTrue(first_handle.cancelled())
+        self.assertFalse(client.idle['my.test.server:my_nick'][1].cancelled())
+
+    async def test_pool_size(self):
+        """
+        The oldest idle connection should be closed when the pool is full
+        """
+        client = MultiConnectionClient(MultiIrcConsumer(), pool_idle_time=60, pool_size=1)
+
+        first, second = self.make_fake_client(), self.make_fake_client()
+        first.disconnect = MagicMock()
+        client._add_idle('a', first)
+        client._add_idle('b', second)
+        await asyncio.sleep(0)
+
+        self.assertEqual(list(client.idle), ['b'])
+        first.disconnect.assert_called_once_with(reconnect=False)
+
+    async def test_shared_connections(self):
+        """
+        With `shared`, connections should use the client's reactor, and send their
+        messages to the `irc.multi` application with their key
+        """
+        async def connect(connection, server, port, nickname, **kwargs):
+            connection.key = '{}:{}'.format(server, nickname)
+
+        client = MultiConnectionClient(MultiIrcConsumer(), shared=True)
+        await client.application_queue.get()
+
+        with patch.object(ChannelsIRCClient, 'connect', connect):
+            await client.create_connection('my.test.server', 6667, 'my_nick')
+
+        connection = client.connections['my.test.server:my_nick']
+        self.assertIs(connection.reactor, client.reactor)
+        self.assertIsNone(connection.application_instance)
+
+        client.reactor._handle_event(connection.connection, Event(
+            'pubmsg', NickMask('testuser!testuser@test.irc.server'), '#testchannel', ['hello'],
+        ))
+        response = await client.application_queue.get()
+        self.assertEqual(response['connection'], 'my.test.server:my_nick')
+        self.assertEqual(response['body'], 'hello')
+
+        connection.connection.send_raw = MagicMock()
+        await client.from_consumer({
+            'type': 'irc.send', 'connection': 'my.test.server:my_nick', 'command': 'message',
+            'channel': 'testchannel', 'body': 'hi',
+        })
+        connection.connection.send_raw.assert_called_with('PRIVMSG #testchannel :hi')
+
+    async def test_shared_connections_are_released(self):
+        """
+        Removed shared connections, and ones that failed to connect, should be taken
+        off the shared reactor
+        """
+        async def connect(connection, server, port, nickname, **kwargs):
+            connection.key = '{}:{}'.format(server, nickname)
+            connection.connection.server, connection.connection.port = server, port
+            if nickname == 'broken':
+                raise OSError('Connection refused')
+
+        client = MultiConnectionClient(MultiIrcConsumer(), shared=True)
+
+        with patch.object(ChannelsIRCClient, 'connect', connect):
+            for _ in range(5):
+                await client.create_connection('my.test.server', 6667, 'my_nick')
+                await client.remove_connection('my.test.server', 'my_nick')
+
+            with self.assertRaises(OSError):
+                await client.create_connection('my.test.server', 6667, 'broken')
+
+        self.assertEqual(client.reactor.connections, [])
+        self.assertEqual(client.clients, {})
+
+    async def test_shared_connections_pause(self):
+        """
+        With shared connections and the `pause` overflow policy, a full `irc.multi`
+        queue should pause every connection until it drains
+        """
+        client = MultiConnectionClient(
+            MultiIrcConsumer(), shared=True, queue_size=1, overflow_policy='pause',
+        )
+        client.application_instance.cancel()
+        await client.application_queue.get()
+
+        first, second = MagicMock(), MagicMock()
+        client.clients = {'first': first, 'second': second}
+
+        client._send_shared_msg({'type': 'irc.receive', 'command': 'message'})
+        client._send_shared_msg({'type': 'irc.receive', 'command': 'message'})
+        first.pause_reading.assert_called_once_with()
+        second.pause_reading.assert_called_once_with()
+
+        await client.application_queue.get()
+        await client.application_queue.get()
+        first.resume_reading.assert_called_once_with()
+        second.resume_reading.assert_called_once_with()
+
+    async def test_bulk_connect(self):
+        """
+        `create_connections` should open connections concurrently, up to the limit,
+        and send the result of each
+        """
+        running = []
+        peak = []
+
+        async def create_connection(server, port, nickname, **kwargs):
+            running.append(nickname)
+            peak.append(len(running))
+            await asyncio.sleep(0)
+            running.remove(nickname)
+            if nickname == 'broken':
+                raise OSError('Connection refused')
+
+        client = MultiConnectionClient(MultiIrcConsumer())
+        client.create_connection = create_connection
+        results = []
+        client.send_reply = results.append
+
+        await client.create_connections([
+            {'server': 'my.test.server', 'port': 6667, 'nickname': nickname}
+            for nickname in ['one', 'two', 'three', 'broken']
+        ], concurrency=2)
+
+        self.assertEqual(max(peak), 2)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[-1], {
+            'type': 'irc.multi.connect.result',
+            'server': 'my.test.server',
+            'nickname': 'broken',
+            'connected': False,
+            'error': 'Connection refused',
+        })
+
+    async def test_bulk_connect_in_background(self):
+        """
+        `irc.multi.connect.bulk` should run as a referenced background task, and
+        report specs missing a required key as failed
+        """
+        client = MultiConnectionClient(MultiIrcConsumer())
+        client.create_connection = MagicMock()
+        results = []
+        client.send_reply = results.append
+
+        with self.assertLogs('channels_irc.multi', 'WARNING'):
+            await client.from_consumer({'type': 'irc.multi.connect.bulk', 'connections': [
+                {'server': 'my.test.server', 'port': 6667},
+            ]})
+            self.assertEqual(len(client._tasks), 1)
+            await asyncio.wait(client._tasks)
+
+        self.assertEqual(client._tasks, set())
+        self.assertEqual(results, [{
+            'type': 'irc.multi.connect.result',
+            'server': 'my.test.server',
+            'nickname': None,
+            'connected': False,
+            'error': 'Connection spec is missing nickname',
+        }])
+        client.create_connection.assert_not_called()
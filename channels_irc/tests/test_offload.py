@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase
+
+from ..consumers import AsyncIrcConsumer
+from ..offload import OffloadIrcConsumer, offload
+
+
+def slow_upper(channel, user, body):
+    # Earlier messages take longer, so they'd finish last without ordering
+    time.sleep(0.05 if body.startswith('first') else 0)
+    return body.upper()
+
+
+class OffloadIrcConsumerTests(TestCase):
+    async def test_results_keep_channel_order(self):
+        """
+        Results should be passed to `on_offload_result` in the order the messages of
+        each channel were received
+        """
+        class OffloadConsumer(OffloadIrcConsumer):
+            offload_executor = ThreadPoolExecutor(max_workers=4)
+            on_message = offload(slow_upper)
+            received = []
+
+            async def on_offload_result(self, command, result, channel=None, user=None, body=None):
+                self.received.append((command, channel, result))
+
+        consumer = OffloadConsumer()
+        for channel in ['#a', '#b']:
+            await consumer.irc_receive({
+                'type': 'irc.receive', 'command': 'message', 'channel': channel, 'body': 'first',
+            })
+            await consumer.irc_receive({
+                'type': 'irc.receive', 'command': 'message', 'channel': channel, 'body': 'second',
+            })
+
+        await consumer.wait_offloaded()
+
+        for channel in ['#a', '#b']:
+            self.assertEqual(
+                [result for command, target, result in consumer.received if target == channel],
+                ['FIRST', 'SECOND'],
+            )
+        self.assertEqual({command for command, target, result in consumer.received}, {'message'})
+        self.assertEqual(consumer._offload_tails, {})
+
+    async def test_backpressure(self):
+        """
+        New messages should wait once `offload_max_pending` messages are in flight
+        """
+        release = threading.Event()
+
+        def blocked(channel, user, body):
+            release.wait(1)
+
+        class BlockedConsumer(OffloadIrcConsumer):
+            offload_executor = ThreadPoolExecutor(max_workers=2)
+            offload_max_pending = 1
+            on_message = offload(blocked)
+
+        consumer = BlockedConsumer()
+        message = {'type': 'irc.receive', 'command': 'message', 'channel': '#a', 'body': 'x'}
+        await consumer.irc_receive(message)
+
+        second = asyncio.ensure_future(consumer.irc_receive(dict(message, channel='#b')))
+        await asyncio.sleep(0.05)
+        self.assertFalse(second.done())
+
+        release.set()
+        await asyncio.wait_for(second, 1)
+        await consumer.wait_offloaded()
+
+    async def test_failures_dont_stop_the_channel(self):
+        """
+        A handler raising should be logged, and later messages still handled
+        """
+        def fail_first(channel, user, body):
+            if body == 'bad':
+                raise ValueError(body)
+            return body
+
+        class FailingConsumer(OffloadIrcConsumer):
+            on_message = offload(fail_first)
+            received = []
+
+            async def on_offload_result(self, command, result, **kwargs):
+                self.received.append(result)
+
+        consumer = FailingConsumer()
+        with self.assertLogs('channels_irc.offload', 'ERROR'):
+            for body in ['bad', 'good']:
+                await consumer.irc_receive({
+                    'type': 'irc.receive', 'command': 'message', 'channel': '#a', 'body': body,
+                })
+            await consumer.wait_offloaded()
+
+        self.assertEqual(consumer.received, ['good'])
+
+    async def test_requires_offload_consumer(self):
+        class PlainConsumer(AsyncIrcConsumer):
+            on_message = offload(slow_upper)
+
+        with self.assertRaises(TypeError):
+            await PlainConsumer().irc_receive({'type': 'irc.receive', 'command': 'message', 'body': 'x'})
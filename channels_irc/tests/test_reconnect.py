@@ -0,0 +1,60 @@
+import asyncio
+
+from django.test import TestCase
+
+from ..reconnect import ReconnectScheduler, CONNECTED, WAITING
+from .utils import FakeLoop
+
+
+class FakeClient(object):
+    def __init__(self, results):
+        self.results = list(results)
+        self.attempts = 0
+
+    async def reconnect(self):
+        self.attempts += 1
+        return self.results.pop(0)
+
+
+class ReconnectSchedulerTests(TestCase):
+    def test_delay_uses_capped_exponential_backoff(self):
+        scheduler = ReconnectScheduler(FakeLoop(), base_delay=1, max_delay=10)
+
+        for attempts in range(10):
+            delay = scheduler.get_delay(attempts)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(10, 2 ** attempts))
+
+    def test_schedule_and_cancel(self):
+        """
+        Scheduling should report the client as waiting until it is cancelled, and
+        scheduling twice shouldn't create a second attempt
+        """
+        loop = FakeLoop()
+        scheduler = ReconnectScheduler(loop, base_delay=1)
+        client = FakeClient([])
+
+        scheduler.schedule(client)
+        scheduler.schedule(client)
+        self.assertEqual(len(loop.scheduled), 1)
+        self.assertEqual(scheduler.status(client)['state'], WAITING)
+
+        scheduler.cancel(client)
+        self.assertEqual(scheduler.status(client)['state'], CONNECTED)
+
+    async def test_failed_attempts_are_retried(self):
+        client = FakeClient([False, True])
+        scheduler = ReconnectScheduler(
+            asyncio.get_event_loop(), base_delay=.01, max_delay=.01, max_concurrent=1,
+        )
+
+        scheduler.schedule(client)
+        await asyncio.sleep(.1)
+
+        self.assertEqual(client.attempts, 2)
+        self.assertEqual(scheduler.status(client)['attempts'], 2)
+
+        scheduler.connected(client)
+        self.assertEqual(scheduler.status(client), {
+            'state': CONNECTED, 'attempts': 0, 'next_attempt_in': None,
+        })
@@ -0,0 +1,174 @@
+import asyncio
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from ..server import ApplicationQueue, BaseServer, DROP_OLDEST, DROP_NEWEST, COALESCE, PAUSE
+
+
+class ApplicationQueueTests(TestCase):
+    def fill(self, queue, count):
+        for i in range(count):
+            queue.put_message({
+                'type': 'irc.receive', 'command': 'message', 'channel': '#chan{}'.format(i), 'body': i,
+            })
+
+    def test_unbounded_by_default(self):
+        """
+        With no `max_size`, the queue should accept every message
+        """
+        queue = ApplicationQueue()
+        self.fill(queue, 100)
+
+        self.assertEqual(queue.qsize(), 100)
+        self.assertEqual(queue.dropped, 0)
+
+    def test_drop_oldest(self):
+        """
+        The `drop-oldest` policy should discard the head of the queue to make room
+        """
+        queue = ApplicationQueue(max_size=2, overflow_policy=DROP_OLDEST)
+        self.fill(queue, 3)
+
+        self.assertEqual(queue.qsize(), 2)
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.get_nowait()['body'], 1)
+
+    def test_drop_newest(self):
+        """
+        The `drop-newest` policy should discard incoming messages once full
+        """
+        queue = ApplicationQueue(max_size=2, overflow_policy=DROP_NEWEST)
+        self.fill(queue, 3)
+
+        self.assertEqual(queue.qsize(), 2)
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.get_nowait()['body'], 0)
+
+    def test_coalesce(self):
+        """
+        The `coalesce` policy should replace the queued message for the same channel
+        """
+        queue = ApplicationQueue(max_size=2, overflow_policy=COALESCE)
+        self.fill(queue, 2)
+        queue.put_message({'type': 'irc.receive', 'command': 'message', 'channel': '#chan0', 'body': 'new'})
+
+        self.assertEqual(queue.qsize(), 2)
+        self.assertEqual(queue.coalesced, 1)
+        self.assertEqual(queue.dropped, 0)
+        self.assertEqual(queue.get_nowait()['body'], 'new')
+
+    def test_coalesce_keeps_state_events(self):
+        """
+        The `coalesce` policy should only replace chat messages with chat messages,
+        never joins or other state events
+        """
+        queue = ApplicationQueue(max_size=2, overflow_policy=COALESCE)
+        queue.put_message({'type': 'irc.receive', 'command': 'join', 'channel': '#chan0'})
+        queue.put_message({'type': 'irc.receive', 'command': 'namreply', 'channel': '#chan0'})
+        queue.put_message({'type': 'irc.receive', 'command': 'message', 'channel': '#chan0', 'body': 'hi'})
+
+        self.assertEqual(queue.coalesced, 0)
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual([queue.get_nowait()['command'] for _ in range(2)], ['namreply', 'message'])
+
+        queue.put_message({'type': 'irc.receive', 'command': 'part', 'channel': '#chan0'})
+        queue.put_message({'type': 'irc.receive', 'command': 'message', 'channel': '#chan0', 'body': 'one'})
+        queue.put_message({'type': 'irc.receive', 'command': 'part', 'channel': '#chan0'})
+
+        self.assertEqual(queue.coalesced, 0)
+        self.assertEqual(queue.get_nowait()['body'], 'one')
+
+    def test_pause_and_resume(self):
+        """
+        The `pause` policy should keep every message, call `on_pause` once full, and
+        `on_resume` once the queue drains to half its size
+        """
+        on_pause, on_resume = Mock(), Mock()
+        queue = ApplicationQueue(
+            max_size=4, overflow_policy=PAUSE, on_pause=on_pause, on_resume=on_resume
+        )
+        self.fill(queue, 6)
+
+        self.assertEqual(queue.qsize(), 6)
+        self.assertEqual(on_pause.call_count, 1)
+
+        for i in range(3):
+            queue.get_nowait()
+        on_resume.assert_not_called()
+
+        queue.get_nowait()
+        self.assertEqual(on_resume.call_count, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ApplicationQueue(max_size=1, overflow_policy='explode')
+
+
+class FakeServer(BaseServer):
+    def __init__(self, application):
+        self.application = application
+        self.loop = asyncio.get_event_loop()
+        self.disconnect = Mock()
+
+
+class ApplicationCheckerTests(TestCase):
+    async def test_application_exception_disconnects(self):
+        """
+        An exception in the application should be seen as soon as the application
+        finishes, and disconnect the server
+        """
+        async def crashing_application(scope, receive, send):
+            raise RuntimeError('boom')
+
+        server = FakeServer(crashing_application)
+        server.create_application()
+        instance = server.application_instance
+
+        await asyncio.wait([instance])
+        await asyncio.sleep(0)
+
+        self.assertEqual(server.disconnect.call_count, 1)
+        self.assertIsNone(server.application_instance)
+
+    async def test_replaced_application_is_ignored(self):
+        """
+        The callback for an application instance that has since been replaced
+        shouldn't touch the current instance
+        """
+        async def application(scope, receive, send):
+            await receive()
+
+        server = FakeServer(application)
+        server.create_application()
+        old_instance = server.application_instance
+        server.create_application()
+
+        old_instance.cancel()
+        await asyncio.wait([old_instance])
+        await asyncio.sleep(0)
+
+        self.assertIsNotNone(server.application_instance)
+        server.application_instance.cancel()
+
+    async def test_replaced_application_exception_is_logged(self):
+        """
+        An exception in an application instance that has since been replaced should
+        still be logged, without disconnecting
+        """
+        async def crashing_application(scope, receive, send):
+            await asyncio.sleep(0)
+            raise RuntimeError('boom')
+
+        server = FakeServer(crashing_application)
+        server.create_application()
+        old_instance = server.application_instance
+        server.application = lambda scope, receive, send: asyncio.Future()
+        server.create_application()
+
+        with self.assertLogs('channels_irc.server', 'ERROR'):
+            await asyncio.wait([old_instance])
+            await asyncio.sleep(0)
+
+        server.disconnect.assert_not_called()
+        server.application_instance.cancel()
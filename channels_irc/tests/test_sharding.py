@@ -0,0 +1,129 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from ..sharding import HashRing, ShardedMultiConnectionClient
+
+
+class HashRingTests(TestCase):
+    def test_keys_are_spread_across_nodes(self):
+        ring = HashRing(range(4))
+        counts = {node: 0 for node in range(4)}
+
+        for i in range(4000):
+            counts[ring.get_node('irc.server:nick{}'.format(i))] += 1
+
+        for count in counts.values():
+            self.assertGreater(count, 500)
+
+    def test_adding_a_node_only_moves_its_keys(self):
+        """
+        Keys should only move to the new node, never between existing nodes
+        """
+        keys = ['irc.server:nick{}'.format(i) for i in range(1000)]
+        before = HashRing(range(3))
+        after = HashRing(range(4))
+
+        for key in keys:
+            if after.get_node(key) != 3:
+                self.assertEqual(before.get_node(key), after.get_node(key))
+
+
+class ShardedMultiConnectionClientTests(TestCase):
+    def make_client(self, workers):
+        # Skip __init__, so no worker processes are started
+        client = ShardedMultiConnectionClient.__new__(ShardedMultiConnectionClient)
+        client.ring = HashRing(range(workers))
+        client.workers = [(Mock(), Mock()) for _ in range(workers)]
+        client.dead_workers = set()
+        client._status_replies = None
+        client.loop = Mock()
+        client._tasks = set()
+        return client
+
+    async def test_connect_and_disconnect_are_routed_to_the_same_worker(self):
+        client = self.make_client(3)
+
+        await client.from_consumer({
+            'type': 'irc.multi.connect',
+            'server': 'my.test.server',
+            'port': 6667,
+            'nickname': 'my_nick',
+        })
+        await client.from_consumer({
+            'type': 'irc.multi.disconnect',
+            'server': 'my.test.server',
+            'nickname': 'my_nick',
+        })
+
+        owner = client.ring.get_node('my.test.server:my_nick')
+        for index, (_, pipe) in enumerate(client.workers):
+            self.assertEqual(pipe.send.call_count, 2 if index == owner else 0)
+
+        _, pipe = client.workers[owner]
+        self.assertEqual(pipe.send.call_args_list[0][0][0], ('message', {
+            'type': 'irc.multi.connect',
+            'server': 'my.test.server',
+            'port': 6667,
+            'nickname': 'my_nick',
+        }))
+
+    async def test_dead_worker(self):
+        """
+        Connects for the keys of a worker that has exited should fail with an error,
+        rather than raise, and status should only wait for the running workers
+        """
+        client = self.make_client(2)
+        client.send_reply = Mock()
+        client._send_application_msg = Mock()
+
+        owner = client.ring.get_node('my.test.server:my_nick')
+        client.workers[owner][1].send.side_effect = BrokenPipeError()
+
+        with self.assertLogs('channels_irc.sharding', 'WARNING'):
+            await client.from_consumer({
+                'type': 'irc.multi.connect',
+                'server': 'my.test.server',
+                'port': 6667,
+                'nickname': 'my_nick',
+            })
+
+        self.assertEqual(client.dead_workers, {owner})
+        reply = client.send_reply.call_args[0][0]
+        self.assertEqual(reply['type'], 'irc.multi.connect.result')
+        self.assertFalse(reply['connected'])
+        self.assertIn('not running', reply['error'])
+
+        client.send_status()
+        live = 1 - owner
+        client.workers[live][1].poll.side_effect = [True, False]
+        client.workers[live][1].recv.return_value = ('status', {'other.server:nick': {'connected': True}})
+        client._read_worker(live)
+
+        client._send_application_msg.assert_called_once_with({
+            'type': 'irc.multi.status',
+            'connections': {'other.server:nick': {'connected': True}},
+        })
+
+    async def test_bulk_connect_validates_specs(self):
+        """
+        Specs missing a required key should fail with an error, and the others be
+        sent to their workers
+        """
+        client = self.make_client(2)
+        client.send_reply = Mock()
+
+        with self.assertLogs('channels_irc.multi', 'WARNING'):
+            await client.create_connections([
+                {'port': 6667, 'nickname': 'my_nick'},
+                {'server': 'my.test.server', 'port': 6667, 'nickname': 'my_nick'},
+            ])
+
+        reply = client.send_reply.call_args[0][0]
+        self.assertEqual(reply['error'], 'Connection spec is missing server')
+        self.assertFalse(reply['connected'])
+
+        _, pipe = client.workers[client.ring.get_node('my.test.server:my_nick')]
+        self.assertEqual(pipe.send.call_args[0][0][1]['connections'], [
+            {'server': 'my.test.server', 'port': 6667, 'nickname': 'my_nick'},
+        ])
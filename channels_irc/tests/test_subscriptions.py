@@ -0,0 +1,54 @@
+import asyncio
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from ..subscriptions import FileSubscriptionStore
+
+
+class FileSubscriptionStoreTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'state.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_saved_subscriptions_are_loaded(self):
+        store = FileSubscriptionStore(self.path)
+        store.save('test.irc.server:advogg', {'#b', '#a'})
+        store.flush()
+
+        store = FileSubscriptionStore(self.path)
+        self.assertEqual(store.load('test.irc.server:advogg'), ['#a', '#b'])
+        self.assertEqual(store.load('test.irc.server:other'), [])
+        self.assertEqual(os.listdir(self.directory.name), ['state.json'])
+
+    async def test_saves_are_written_together(self):
+        """
+        Saves from every connection within `delay` should be written in a single
+        snapshot, off the event loop
+        """
+        store = FileSubscriptionStore(self.path, delay=0.01)
+        write = store._write
+
+        with patch.object(store, '_write', side_effect=write) as mock_write:
+            for i in range(3):
+                store.save('test.irc.server:nick{}'.format(i), {'#a'})
+            self.assertEqual(store.load('test.irc.server:nick1'), ['#a'])
+
+            await asyncio.sleep(0.05)
+            await store._writing
+
+        self.assertEqual(mock_write.call_count, 1)
+        with open(self.path) as snapshot:
+            self.assertEqual(len(json.load(snapshot)), 3)
+
+    def test_unreadable_snapshot_is_ignored(self):
+        with open(self.path, 'w') as snapshot:
+            snapshot.write('{not json')
+
+        self.assertEqual(FileSubscriptionStore(self.path).load('test.irc.server:advogg'), [])
@@ -0,0 +1,25 @@
+from django.test import TestCase
+
+from ..tags import MessageTags
+
+
+class MessageTagsTests(TestCase):
+    def test_tags_are_decoded_on_first_access(self):
+        tags = MessageTags(r'id=123;display-name=Foo\sBar;flag;note=a\:b\\c')
+
+        self.assertIsNone(tags._tags)
+        self.assertEqual(dict(tags), {
+            'id': '123',
+            'display-name': 'Foo Bar',
+            'flag': '',
+            'note': 'a;b\\c',
+        })
+
+    def test_whitelist(self):
+        tags = MessageTags('id=123;badges=mod/1;emotes=', whitelist={'id', 'emotes'})
+
+        self.assertEqual(tags.raw, 'id=123;emotes=')
+        self.assertEqual(dict(tags), {'id': '123', 'emotes': ''})
+
+    def test_empty(self):
+        self.assertEqual(len(MessageTags('')), 0)
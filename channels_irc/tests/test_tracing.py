@@ -0,0 +1,93 @@
+import time
+from unittest import skipIf
+
+from django.test import TestCase
+
+from ..client import ChannelsIRCClient
+from ..consumers import AsyncIrcConsumer
+from ..tracing import OpenTelemetryTracer, Tracer, otel_trace
+from .test_client import MockConnection, MockEvent
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.records = []
+
+    def record(self, message, queue_wait, duration):
+        self.records.append((message['command'], queue_wait, duration))
+
+
+class TracingTests(TestCase):
+    async def test_client_stamps_dispatched_messages(self):
+        client = ChannelsIRCClient(AsyncIrcConsumer(), trace_messages=True)
+        client.create_application()
+
+        client._dispatcher(MockConnection(), MockEvent(target='#testchannel', type='join'))
+        client._dispatcher(MockConnection(), MockEvent(target='#testchannel', type='part'))
+        await client._handle_status({})
+
+        first = await client.application_queue.get()
+        second = await client.application_queue.get()
+        status = await client.application_queue.get()
+
+        self.assertEqual((first['seq'], second['seq']), (1, 2))
+        self.assertLessEqual(first['received_at'], time.monotonic())
+        self.assertNotIn('received_at', status)
+
+    async def test_consumer_records_timings(self):
+        tracer = RecordingTracer()
+
+        class TracedConsumer(AsyncIrcConsumer):
+            async def on_message(self, channel, user, body):
+                pass
+
+        TracedConsumer.tracer = tracer
+        consumer = TracedConsumer()
+
+        await consumer.irc_receive({
+            'type': 'irc.receive', 'command': 'message', 'received_at': time.monotonic() - 1, 'seq': 1,
+        })
+        await consumer.irc_receive({'type': 'irc.receive', 'command': 'message'})
+
+        self.assertEqual(len(tracer.records), 1)
+        self.assertGreaterEqual(tracer.records[0][1], 1)
+
+    async def test_sample_rate(self):
+        tracer = RecordingTracer()
+
+        class UnsampledConsumer(AsyncIrcConsumer):
+            trace_sample_rate = 0
+
+            async def on_message(self, channel, user, body):
+                pass
+
+        UnsampledConsumer.tracer = tracer
+        await UnsampledConsumer().irc_receive({
+            'type': 'irc.receive', 'command': 'message', 'received_at': time.monotonic(),
+        })
+
+        self.assertEqual(tracer.records, [])
+
+
+@skipIf(otel_trace is None or TracerProvider is None, 'opentelemetry is not installed')
+class OpenTelemetryTracerTests(TestCase):
+    def test_span_covers_queue_and_handler(self):
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+        tracer = OpenTelemetryTracer(provider.get_tracer('test'))
+        tracer.record({'command': 'message', 'channel': '#testchannel', 'seq': 3}, .5, .25)
+
+        span, = exporter.get_finished_spans()
+        self.assertEqual(span.name, 'irc.receive message')
+        self.assertEqual(span.attributes['irc.seq'], 3)
+        self.assertAlmostEqual((span.end_time - span.start_time) / 1e9, .75, places=3)
+        self.assertEqual(span.events[0].name, 'handler.start')
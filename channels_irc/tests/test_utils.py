@@ -0,0 +1,23 @@
+import asyncio
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from ..utils import install_loop_policy
+
+
+class InstallLoopPolicyTests(TestCase):
+    def test_asyncio_keeps_current_policy(self):
+        policy = asyncio.get_event_loop_policy()
+        install_loop_policy('asyncio')
+
+        self.assertIs(asyncio.get_event_loop_policy(), policy)
+
+    def test_missing_uvloop(self):
+        with patch.dict('sys.modules', {'uvloop': None}):
+            with self.assertRaises(ValueError):
+                install_loop_policy('uvloop')
+
+    def test_unknown_loop_type(self):
+        with self.assertRaises(ValueError):
+            install_loop_policy('trio')
@@ -12,3 +12,27 @@ def AsyncMock():
                     side_effect=asyncio.coroutine(coro))
     corofunc.coro = coro
     return corofunc
+
+
+class FakeLoop(object):
+    """
+    Loop stand-in with a manually advanced clock
+    """
+    def __init__(self):
+        self.now = 0
+        self.scheduled = []
+
+    def time(self):
+        return self.now
+
+    def call_later(self, delay, callback, *args):
+        handle = Mock()
+        self.scheduled.append((self.now + delay, callback, args))
+        return handle
+
+    def advance(self, seconds):
+        self.now += seconds
+        due = [entry for entry in self.scheduled if entry[0] <= self.now]
+        self.scheduled = [entry for entry in self.scheduled if entry[0] > self.now]
+        for _, callback, args in due:
+            callback(*args)
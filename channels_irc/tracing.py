@@ -0,0 +1,66 @@
+import logging
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """
+    Receives the timings of traced `irc.receive` messages.  Set an instance as the
+    `tracer` of an `AsyncIrcConsumer` to trace its messages.  Durations are in seconds:
+    `queue_wait` from the event being read off the IRC socket until its handler
+    started, and `duration` for the handler itself
+    """
+    def record(self, message, queue_wait, duration):
+        raise NotImplementedError()
+
+
+class LoggingTracer(Tracer):
+    """
+    Logs the timings of each traced message at DEBUG level
+    """
+    def record(self, message, queue_wait, duration):
+        logger.debug('irc.receive {} #{}: queued {:.3f}ms, handled in {:.3f}ms'.format(
+            message.get('command'), message.get('seq'), queue_wait * 1000, duration * 1000,
+        ))
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Records each traced message as an OpenTelemetry span from the event being read
+    until its handler finished, with a `handler.start` event.  Requires the
+    `opentelemetry-api` package
+    """
+    def __init__(self, tracer=None, name='channels_irc'):
+        if otel_trace is None:
+            raise ImportError(
+                'OpenTelemetry tracing requires the opentelemetry-api package. '
+                'Install it with `pip install channels_irc[tracing]`'
+            )
+
+        self.tracer = tracer if tracer is not None else otel_trace.get_tracer(name)
+
+    def record(self, message, queue_wait, duration):
+        # The timings are monotonic; spans need wall clock times
+        ended = time.time_ns()
+        handler_started = ended - int(duration * 1e9)
+        received = handler_started - int(queue_wait * 1e9)
+
+        attributes = {'irc.command': message.get('command') or ''}
+        if message.get('channel') is not None:
+            attributes['irc.channel'] = message['channel']
+        if message.get('seq') is not None:
+            attributes['irc.seq'] = message['seq']
+
+        span = self.tracer.start_span(
+            'irc.receive {}'.format(message.get('command')),
+            start_time=received,
+            attributes=attributes,
+        )
+        span.add_event('handler.start', timestamp=handler_started)
+        span.end(end_time=ended)
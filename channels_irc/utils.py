@@ -0,0 +1,42 @@
+import asyncio
+import importlib
+
+ASYNCIO = 'asyncio'
+UVLOOP = 'uvloop'
+
+LOOP_TYPES = [ASYNCIO, UVLOOP]
+
+
+def import_application(path):
+    """
+    Imports an ASGI application from an import string in the form of
+    `path.to.module:instance.path`
+    """
+    asgi_module, application_path = path.split(':', 1)
+    application = importlib.import_module(asgi_module)
+
+    for part in application_path.split('.'):
+        application = getattr(application, part)
+
+    return application
+
+
+def install_loop_policy(loop_type):
+    """
+    Installs the event loop policy for `loop_type`, so loops created afterwards are
+    of that type.  For `asyncio`, the current policy is left as it is
+    """
+    if loop_type == ASYNCIO:
+        pass
+
+    elif loop_type == UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            raise ValueError(
+                "The uvloop loop requires the uvloop package (pip install channels-irc[uvloop])"
+            )
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    else:
+        raise ValueError('Unknown loop type {}'.format(loop_type))
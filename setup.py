@@ -22,6 +22,11 @@ setup(
         'channels>=3.0.0',
         'asgiref>=3.0.0',
     ],
+    extras_require={
+        'metrics': ['prometheus_client'],
+        'uvloop': ['uvloop'],
+        'tracing': ['opentelemetry-api'],
+    },
     entry_points={'console_scripts': [
         'channels-irc = channels_irc.cli:CLI.entrypoint'
     ]},